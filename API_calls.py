@@ -1,97 +1,132 @@
-import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime as dt
 from datetime import timedelta
+import logging
 import re
-from pandas import json_normalize
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache
+from catalogue import RoomCatalogue
+from schedule_store import ScheduleStore
+from occupancy import OccupancyIndex, seconds_of_day, to_seconds
+from distances import DistanceMatrix
+from free_slots import FreeSlotSnapshot
+from room_filters import LECTURE_ROOMS, RoomFilterIndex
+from http_client import HTTPClient
+from metrics import timed
+
+logger = logging.getLogger(__name__)
 
 
 class API:
 
+    # Upstream API endpoints
+    MAZEMAP_URL = "http://api.mazemap.com/api/pois/?campusid=710&srid=900913"
+    EVENT_API_URL = "https://integration.preprod.unisg.ch/eventapi"
+    TOOL_API_URL = "https://integration.preprod.unisg.ch/toolapi"
+
     # API-KEY
-    def __init__(self, api_token):
+    def __init__(self, api_token, rooms_ttl=6*60*60, rooms_stale_ttl=24*60*60, schedule_ttl=15*60, schedule_stale_ttl=60*60, schedule_db_path=None, http=None, fetch_workers=8,
+                 schedule_max_days=64, schedule_refresh_days=7, schedule_retention_days=30):
         self.api_token = api_token
-    
-    # Define method to call on-campus rooms
-    def get_rooms(self):
-        """Returns a pandas dataframe containing all lecture rooms, including their capacity and system IDs. Note that some rooms have multiple IDs."""
-        url = "http://api.mazemap.com/api/pois/?campusid=710&srid=900913"
-
-        response = requests.get(url)
-
-        if response.ok:
-            json_response = response.json()
-
-            # Extract the 'pois' list
-            pois_data = json_response.get('pois', [])
-
-            # Flatten the data and create DataFrame
-            df = json_normalize(pois_data)
-        else:
-            print("Error calling the API: ", response.status_code)
-
-
-        # Normalize JSON data excluding 'infos' and 'types'
-        df = json_normalize(
-            json_response['pois'],
-            meta=[
-                'poiId', 'kind', ['point', 'type'], ['point', 'coordinates'],
-                ['geometry', 'type'], ['geometry', 'coordinates'],
-                'campusId', 'floorId', 'floorName', 'buildingId', 'buildingName',
-                'identifierId', 'identifier', 'title', 'deleted',
-                'z', 'infoUrl', 'infoUrlText', 'description', 'peopleCapacity',
-                'images', 'types'
-            ],
-            errors='ignore'
-        )
-
-        # Extract only the first entry from each 'types' list
-        def extract_first_type(types_list):
-            return types_list[0] if types_list else {}
-
-        df['first_type'] = df['types'].apply(extract_first_type)
-
-        # Normalize the first type data
-        df_first_type = df['first_type'].apply(pd.Series)
-
-        # Concatenate the first type data back to the main DataFrame
-        df_final = pd.concat([df.drop(columns=['types', 'first_type']), df_first_type], axis=1)
 
-        # Drop and rename columns
-        df_final.drop(columns=['identifierId', 'identifier', 'images', 'nodeId', 'kind', 'deleted', 'campusId'], inplace=True)
-        df_final.rename({'peopleCapacity':'seats'}, axis=1,inplace=True)
+        # Pooled HTTP session shared by all calls (timeouts, retries and circuit breaking, see http_client.py)
+        self.http = http if http is not None else HTTPClient()
 
-        # Define pattern to extract for room_nr
-        pattern = r"(?<!\w)(\d{2}-\d{3,4})\b"
+        # Thread pool used to issue independent upstream calls concurrently (see fan_out())
+        self.executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='api-fetch')
 
-        # Boolean mask based on specified RegEx pattern
-        df_final['room_nr'] = df_final['title'].str.extract(pattern)
-
-        # Exclude rooms that don't fit room_nr pattern
-        df_final = df_final.loc[~df_final['room_nr'].isna()]
+        # Process-wide cache for the room catalogue (changes rarely, but is expensive to download and normalize)
+        self.rooms_cache = TTLCache(self.fetch_rooms, ttl=rooms_ttl, stale_ttl=rooms_stale_ttl, name='rooms')
+        self._catalogue_derived = {} # name -> (catalogue version, value)
+        self._catalogue_lock = threading.RLock() # Builders may memoize other derived data of the same catalogue (e.g., filter masks)
 
-        return df_final
+        # Per-date store for the event schedule (bounded to schedule_max_days in memory), optionally persisted to SQLite
+        self.schedule = ScheduleStore(self.fetch_events, ttl=schedule_ttl, stale_ttl=schedule_stale_ttl, db_path=schedule_db_path,
+                                      max_days=schedule_max_days, refresh_days=schedule_refresh_days,
+                                      retention_days=schedule_retention_days)
     
-    def get_courses(self, date=None):
-        """Takes in date as a string in the format '%Y-%m-%d'. Returns the schedule for the specified day, i.e., a timetable of all courses and their locations."""
-        # Insert current date as default
-        if date is None:
-            date_obj = dt.now()
-        else:
-            # Convert string to datetime object
-            date_obj = dt.strptime(date, '%Y-%m-%d')
-
-        # Calculate the end date (next day)
-        end_date = date_obj + timedelta(days=1)
+    # Define method to call on-campus rooms
+    @timed()
+    def get_rooms(self):
+        """Returns a pandas dataframe containing all lecture rooms, including their capacity and system IDs. Note that some rooms have multiple IDs.
+        The dataframe is served from the room catalogue cache and shared between requests, so it must not be modified in place."""
+        return self.get_catalogue().frame()
+
+    @timed()
+    def get_catalogue(self):
+        """Returns the cached RoomCatalogue (see catalogue.py), e.g., to look up a single room or its heavy fields."""
+        return self.rooms_cache.get()
+
+    @timed()
+    def room_details(self, room_nr):
+        """Returns a dict with all fields of the specified room, including description and geometry, or None for unknown rooms."""
+        return self.get_catalogue().details(room_nr)
+
+    def fan_out(self, **calls):
+        """Runs the given zero-argument callables concurrently and returns a dict with their results under the same names.
+        Latency is the maximum of the individual calls rather than their sum. Exceptions are re-raised once all calls have finished.
+        Calls must not themselves call fan_out(), as they run on the same thread pool."""
+        futures = {name: self.executor.submit(call) for name, call in calls.items()}
+        results, error = {}, None
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    @timed()
+    def prefetch(self, date=None):
+        """Loads the room catalogue and the schedule for the specified date concurrently, so subsequent calls are served from the caches."""
+        return self.fan_out(rooms=self.get_rooms, day=lambda: self.get_day(date))
+
+    @timed()
+    def warm_up(self, date=None):
+        """Loads the room catalogue and the schedule of a date (defaults to today) and builds the derived data used by the landing page, e.g., right after startup."""
+        date = date or dt.now().strftime('%Y-%m-%d')
+        self.prefetch(date)
+        self.get_free_slots(date)
+        self.get_distances()
+
+    def catalogue_memo(self, name, builder):
+        """Returns derived data `name` for the current room catalogue, building it with `builder(rooms_df)` once per catalogue version."""
+        rooms = self.get_rooms()
+        version = self.rooms_cache.version
+        entry = self._catalogue_derived.get(name)
+        if entry is None or entry[0] != version:
+            with self._catalogue_lock:
+                entry = self._catalogue_derived.get(name)
+                if entry is None or entry[0] != version:
+                    entry = (version, builder(rooms))
+                    self._catalogue_derived[name] = entry
+        return entry[1]
+
+    @timed()
+    def fetch_rooms(self):
+        """Downloads and normalizes the room catalogue from the MazeMap API, bypassing the cache."""
+        # Raises an APIError if the call fails
+        json_response = self.http.get_json(self.MAZEMAP_URL, endpoint='mazemap')
+
+        return normalize_rooms(json_response.get('pois', []))
+    
+    @timed()
+    def fetch_events(self, date):
+        """Takes in date as a string in the format '%Y-%m-%d'. Downloads all events for the specified day from the event API, bypassing the schedule store."""
+        return self.fetch_event_range(date, date)
 
-        # Format the start and end dates to strings
-        start_date_str = date_obj.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
+    @timed()
+    def fetch_event_range(self, start_date, end_date):
+        """Takes in start and end date (inclusive) as strings in the format '%Y-%m-%d'. Downloads all events of the date range in a single request, bypassing the schedule store."""
+        # The event API expects the day after the last date as end date
+        end_date = (dt.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
 
         # Assign corresponding url for API-call
-        url = f"https://integration.preprod.unisg.ch/eventapi/EventDates/byStartDate/{start_date_str}/byEndDate/{end_date_str}"
+        url = f"{self.EVENT_API_URL}/EventDates/byStartDate/{start_date}/byEndDate/{end_date}"
         
         headers = {
             "X-ApplicationId": self.api_token,
@@ -99,85 +134,131 @@ class API:
             "X-RequestedLanguage": "en"
         }
 
-        response = requests.get(url, headers=headers)
-
-        if response.ok:
-            json_response = response.json()
-            print(json_response)
-            courses = pd.DataFrame(json_response)
-        else:
-            print("Error encountered: ", response.status_code)
-
-        room_nr = courses['location']
-        size = courses['room'].str['seats']
-        start_time = courses['startTime']
-        end_time = courses['endTime']
-        subject = courses['description']
+        # Raises an APIError if the call fails
+        return self.http.get_json(url, endpoint='events', headers=headers)
 
-        rooms_df = pd.DataFrame({'room_nr':room_nr, 'size':size, 'start_time':start_time, 'end_time':end_time, 'subject':subject})
-
-        # Transform start and end time to datetime format to enable filtering by time
-        rooms_df['start_time'] = pd.to_datetime(rooms_df['start_time'], format='%Y-%m-%dT%H:%M:%S')
-        rooms_df['end_time'] = pd.to_datetime(rooms_df['end_time'], format='%Y-%m-%dT%H:%M:%S')
-
-        # Create separate columns only containing times for filtering
-        rooms_df['start_time_only'] = rooms_df['start_time'].dt.time
-        rooms_df['end_time_only'] = rooms_df['end_time'].dt.time
-        rooms_df['date'] = rooms_df['start_time'].dt.date
-        rooms_df['date'] = pd.to_datetime(rooms_df['date'])
-
-        return rooms_df
+    @timed()
+    def get_day(self, date=None):
+        """Takes in date as a string in the format '%Y-%m-%d' (defaults to current date). Returns the cached DaySchedule for that date."""
+        if date is None:
+            date = dt.now().strftime('%Y-%m-%d')
+        return self.schedule.get_day(date)
+
+    @timed()
+    def get_days(self, dates, bulk_days=31):
+        """Returns a dict mapping each of the given dates (strings with format '%Y-%m-%d') to its DaySchedule.
+        Dates that aren't cached (or expired) are fetched in bulk: one request per run of up to `bulk_days` days, issued concurrently, instead of one request per day.
+        The fetched days are added to the schedule store, so later single-day calls are served from it."""
+        dates = sorted(set(dates))
+        missing = [date for date in dates if not self.schedule.cache.is_fresh(date)]
+
+        # Split the missing dates into runs of at most bulk_days days
+        runs = []
+        for date in missing:
+            if runs and (dt.strptime(date, '%Y-%m-%d') - dt.strptime(runs[-1][0], '%Y-%m-%d')).days < bulk_days:
+                runs[-1][1] = date
+            else:
+                runs.append([date, date])
+
+        if len(runs) > 1 or (runs and runs[0][0] != runs[0][1]):
+            try:
+                payloads = self.fan_out(**{start: (lambda start=start, end=end: self.fetch_event_range(start, end)) for start, end in runs})
+            except Exception as e:
+                # Fall back to the per-day path of the store (which may serve persisted schedules)
+                logger.warning("Bulk event fetch failed: %s", e)
+                payloads = {}
+
+            for start, end in runs:
+                if start not in payloads:
+                    continue
+                events_by_date = {}
+                for event in payloads[start]:
+                    events_by_date.setdefault((event.get('startTime') or '')[:10], []).append(event)
+                day = dt.strptime(start, '%Y-%m-%d')
+                while day <= dt.strptime(end, '%Y-%m-%d'):
+                    date = day.strftime('%Y-%m-%d')
+                    self.schedule.put_day(date, events_by_date.get(date, []))
+                    day += timedelta(days=1)
+
+        return {date: self.get_day(date) for date in dates}
+
+    @timed()
+    def get_courses(self, date=None, day=None):
+        """Takes in date as a string in the format '%Y-%m-%d'. Returns the schedule for the specified day, i.e., a timetable of all courses and their locations.
+        The dataframe is built once per version of the day's schedule and shared between requests, so it must not be modified in place.
+        Pass `day` (a DaySchedule returned by get_day()) instead of a date to derive it from that version of the schedule."""
+        return (day or self.get_day(date)).memo('courses', build_courses)
     
-    # def next_event(self, df, room_nr, filter_end, room_info):
-    def next_event(self, df, room_nr, filter_end):
-        """Returns a dataframe containing the next event for a specified room given the day's schedule.
-        Args: df -> dataframe returned by get_courses(); room_nr -> str; filter_end -> dt.strptime(filter_end_str, '%H:%M')"""
-        room_events = df.query("room_nr == @room_nr and start_time.dt.time > @filter_end")
-        if not room_events.empty:
-            return room_events.sort_values(by='start_time').head(1)
-        else:
-            # Create a row for rooms with no more events
-            room_details = df.loc[df['room_nr'] == room_nr].head(1).copy()
-            room_details['start_time'] = None
-            room_details['end_time'] = None
-            room_details['start_time_only'] = None
-            room_details['end_time_only'] = None
-
-            no_event_row = pd.DataFrame(room_details)
-            no_event_row['subject'] = ['No more events planned for today']
-            return no_event_row
-
-    def get_free_rooms(self, filter_start, filter_end=None, date=None):
+    @timed()
+    def next_events(self, df, room_nrs, filter_end):
+        """Returns a dataframe containing the next event for each of the specified rooms (in the given order) in a single vectorized pass.
+        Rooms with no more events keep their first row, without event times. Rooms that don't appear in df are left out.
+        Args: df -> dataframe returned by get_courses() (or merged with get_rooms()); room_nrs -> list of str; filter_end -> datetime.time"""
+        room_nrs = pd.Index(room_nrs)
+        in_rooms = df['room_nr'].isin(room_nrs)
+
+        # First upcoming event per room: sort by start time and keep the first row of each room
+        upcoming = df.loc[in_rooms & (seconds_of_day(df['start_time']) > to_seconds(filter_end))]
+        upcoming = upcoming.sort_values(by='start_time', kind='stable').drop_duplicates(subset='room_nr')
+
+        # Rooms with no more events keep their first row, but without event times
+        no_events = df.loc[in_rooms & ~df['room_nr'].isin(upcoming['room_nr'])].drop_duplicates(subset='room_nr').copy()
+        no_events[['start_time', 'end_time', 'start_time_only', 'end_time_only']] = None
+        no_events['subject'] = 'No more events planned for today'
+
+        result = pd.concat([upcoming, no_events]).set_index('room_nr', drop=False)
+        return result.loc[room_nrs.intersection(result.index, sort=False)].reset_index(drop=True)
+
+    @timed()
+    def get_occupancy(self, date=None, day=None):
+        """Returns the OccupancyIndex for the specified date (string with format '%Y-%m-%d') or DaySchedule `day`, built once per version of the day's schedule."""
+        return (day or self.get_day(date)).memo('occupancy', lambda day: OccupancyIndex(day.memo('courses', build_courses)))
+
+    @timed()
+    def get_free_slots(self, date=None, day=None):
+        """Returns the FreeSlotSnapshot (per-slot bitsets of occupied rooms) of the room catalogue for the specified date or DaySchedule `day`.
+        It is built once per version of the day's schedule and of the room catalogue."""
+        day = day or self.get_day(date)
+        rooms = self.get_rooms()
+        version = self.rooms_cache.version
+        snapshot = day.derived.get('free_slots')
+        if snapshot is None or snapshot.catalogue_version != version:
+            snapshot = FreeSlotSnapshot(rooms, self.get_occupancy(day=day), catalogue_version=version)
+            day.derived['free_slots'] = snapshot
+        return snapshot
+
+    @timed()
+    def get_free_rooms(self, filter_start, filter_end=None, date=None, day=None):
         """
         Input: Filter_start & filter_end as strings with format '%H:%M'; date as string with format '%Y-%m-%d'. Defaults to current date if none is specified.
+        Pass `day` (a DaySchedule returned by get_day()) instead of a date to answer from that version of the schedule.
         Returns a dataframe of free rooms that match the filter.
         """
         # Convert filter times to time objects
         filter_start = dt.strptime(filter_start, '%H:%M').time()
-        courses = self.get_courses(date)
-        rooms = self.get_rooms()
-        merged_df = rooms.merge(courses, on='room_nr', how='left')
+
+        # Courses, occupancy index and snapshot are all derived from the same version of the day's schedule (it may be swapped by a refresh meanwhile)
+        day = day or self.get_day(date)
+        courses = self.get_courses(day=day)
+        occupancy = self.get_occupancy(day=day)
+
+        # Occupied rooms are looked up in the day's per-slot snapshot of the catalogue
+        snapshot = self.get_free_slots(day=day)
+        rooms = snapshot.rooms
 
         if filter_end != None:
             filter_end = dt.strptime(filter_end, '%H:%M').time()
-            occupied = merged_df.query("(start_time.dt.time < @filter_end) and (end_time.dt.time > @filter_start)").room_nr.unique()
-            free_rooms = list(filter(lambda x: x not in occupied, rooms['room_nr']))
-            filtered_dfs = []
-            for room in free_rooms:
-                filtered_df = self.next_event(merged_df, room, filter_end) # removed kwarg: , rooms
-                filtered_dfs.append(filtered_df)
-
-            result_df = pd.concat(filtered_dfs)
-        
+            occupied = snapshot.occupied_mask(filter_start, filter_end)
+            next_after = filter_end
         else:
-            occupied = merged_df.query("(start_time.dt.time <= @filter_start) and (end_time.dt.time > @filter_start)").room_nr.unique()
-            free_rooms = list(filter(lambda x: x not in occupied, rooms['room_nr']))
-            filtered_dfs = []
-            for room in free_rooms:
-                filtered_df = self.next_event(merged_df, room, filter_start)  # removed kwarg: , rooms
-                filtered_dfs.append(filtered_df)
+            occupied = snapshot.occupied_mask(filter_start)
+            next_after = filter_start
 
-            result_df = pd.concat(filtered_dfs)
+        free_rooms = rooms.loc[~occupied].reset_index(drop=True)
+
+        # Look up the next event of all free rooms in the index at once and attach it to the rooms
+        positions = occupancy.next_events(free_rooms['room_nr'], next_after)
+        result_df = attach_events(free_rooms, courses, positions)
 
         # Define placeholders for NaT entries
         placeholder_datetime = pd.to_datetime('1970-01-01 00:00:00')
@@ -190,51 +271,105 @@ class API:
 
         return result_df
     
-    def filter_rooms(self, rooms_df):
-        """Excludes certain buildings and types of rooms"""
-        included_name = ['Unterrichtsraum']
-        excluded_infoUrlText = ['Dozierenden Lounge', 'theCo', 'theStage']
-        # No visibility on individual rooms within square from hsg api
-        excluded_buildingName = ['A 10 Sporthalle', 'D 14 WBZ Holzweid', 'D 15 Hans Ulrich Auditorium', 'A 11 Square']
-        result_df = rooms_df.query("name in @included_name and not (infoUrlText in @excluded_infoUrlText or buildingName in @excluded_buildingName)").copy()
-        return result_df
+    @timed()
+    def get_free_rooms_range(self, dates, filter_start, filter_end=None):
+        """Returns a dataframe of the rooms (see get_rooms()) that are free within the same time window on every one of the given dates,
+        e.g., every Tuesday 14:00-16:00 for the next 4 weeks (see weekly_dates()). Filter times are strings with format '%H:%M'.
+        Schedules are loaded in bulk (see get_days()) and each day's occupancy snapshot is built once."""
+        filter_start = dt.strptime(filter_start, '%H:%M').time()
+        if filter_end is not None:
+            filter_end = dt.strptime(filter_end, '%H:%M').time()
+
+        days = self.get_days(dates)
+        snapshots = [self.get_free_slots(day=days[date]) for date in dates]
+        rooms = snapshots[-1].rooms if snapshots else self.get_rooms()
+
+        occupied = np.zeros(len(rooms), dtype=bool)
+        for date, snapshot in zip(dates, snapshots):
+            if snapshot.rooms is not rooms:
+                # The room catalogue was refreshed in between
+                snapshot = self.get_free_slots(day=days[date])
+            occupied |= snapshot.occupied_mask(filter_start, filter_end)
+        return rooms.loc[~occupied].reset_index(drop=True)
+
+    @timed()
+    def first_free_slot(self, room_nr, duration=60, start_date=None, days=7, earliest='08:00', latest='22:00'):
+        """Returns the first free period of `duration` minutes in the specified room between `earliest` and `latest` (strings with format '%H:%M')
+        on one of the `days` days from start_date (datetime, defaults to now; on that day, periods start no earlier than now).
+        Returns a dict with 'date', 'start' and 'end' (strings), or None if the room is booked out."""
+        if start_date == None:
+            start_date = dt.now()
+        earliest = dt.strptime(earliest, '%H:%M').time()
+        latest = dt.strptime(latest, '%H:%M').time()
+
+        dates = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        schedules = self.get_days(dates)
+        for i, date in enumerate(dates):
+            first = max(earliest, start_date.time().replace(second=0, microsecond=0)) if i == 0 else earliest
+            start = self.get_occupancy(day=schedules[date]).first_gap(room_nr, duration*60, first, latest)
+            if start is not None:
+                begin = dt.strptime(date, '%Y-%m-%d') + timedelta(seconds=start)
+                return {'date': date, 'start': begin.strftime('%H:%M'), 'end': (begin + timedelta(minutes=duration)).strftime('%H:%M')}
+        return None
+
+    @timed()
+    def filter_rooms(self, rooms_df, room_filter=LECTURE_ROOMS):
+        """Returns the rows of rooms_df (the room catalogue or a dataframe derived from it, e.g., free rooms) that match `room_filter` (see room_filters.py).
+        Excludes certain buildings and types of rooms by default; combine filters to restrict further, e.g., LECTURE_ROOMS.with_seats(max_seats=40)."""
+        return rooms_df.loc[self.room_mask(rooms_df, room_filter)].copy()
+
+    def room_mask(self, rooms_df, room_filter=LECTURE_ROOMS):
+        """Returns a boolean array over the rows of rooms_df indicating which rooms match `room_filter`."""
+        return self.get_room_filters().mask_for(rooms_df, room_filter)
+
+    def get_room_filters(self):
+        """Returns the RoomFilterIndex of the current room catalogue (categorical codes and sorted seats), built once per catalogue version."""
+        return self.catalogue_memo('room_filters', RoomFilterIndex)
     
+    @timed()
+    def get_week_schedule(self, room_nr, start_date=None, days=7):
+        """Returns a pandas dataframe containing all events taking place in the specified room from start_date (datetime, defaults to current date) on for the given number of days.
+        Pass the result to timetable.build_week_timetable() for a slot view of the week."""
+        if start_date == None:
+            start_date = dt.now()
+
+        dates = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        days = self.get_days(dates)
+        return pd.concat([days[date].room_events(room_nr) for date in dates], ignore_index=True)
+
+    @timed()
+    def get_distances(self):
+        """Returns the DistanceMatrix over the filtered room catalogue (see filter_rooms()), built once per catalogue version."""
+        return self.catalogue_memo('distances', lambda rooms: DistanceMatrix(self.filter_rooms(rooms)))
+
+    @timed()
+    def sort_by_distance(self, rooms_df, room_nr):
+        """Returns rooms_df with an additional 'distance' column, sorted by distance from the specified room."""
+        return self.get_distances().sort_by_distance(rooms_df, room_nr)
+
+    @timed()
+    def nearest_free_rooms(self, room_nr, k, filter_start, filter_end=None, date=None):
+        """Returns the k free (filtered) rooms closest to the specified room, sorted by distance. Takes the same filter arguments as get_free_rooms()."""
+        free_rooms = self.filter_rooms(self.get_free_rooms(filter_start, filter_end, date))
+        nearest = self.get_distances().nearest(room_nr, k, candidates=free_rooms['room_nr'])
+        result_df = free_rooms.drop_duplicates(subset='room_nr').set_index('room_nr', drop=False).loc[[r for r, _ in nearest]]
+        result_df['distance'] = [d for _, d in nearest]
+        return result_df.reset_index(drop=True)
+
+    @timed()
     def get_schedule(self, room_nr, start_date=None):
         """Returns a pandas dataframe containing all events taking place in the specified room for a given date."""
         if start_date == None:
             start_date = dt.now()
-        
-        end_date = start_date + timedelta(days=1)
-        start_date = start_date.strftime('%Y-%m-%d')
-        end_date = end_date.strftime('%Y-%m-%d')
-
-
-        url = f"https://integration.preprod.unisg.ch/eventapi/EventDates/permitted/byStartDate/{start_date}/byEndDate/{end_date}?page=1&limit=1000000&hal=false&envelope=false"
-
-        headers = {
-            "X-ApplicationId": self.api_token,
-            "API-Version": "3",
-            "X-RequestedLanguage": "en"
-        }
-
-        response = requests.get(url, headers=headers)
-
-        if response.ok:
-            json_response = response.json()
-            print(json_response)
-            df = pd.DataFrame(json_response)
-        else:
-            print("Error encountered: ", response.status_code)
 
-        schedule = df[['location', 'startTime', 'endTime', 'description']].query('location == @room_nr')
-
-        return schedule
+        return self.get_day(start_date.strftime('%Y-%m-%d')).room_events(room_nr)
 
     
+    @timed()
     def old_rooms(self):
         """Returns a pandas dataframe containing all campus rooms of format xx-(U)xxx, including their capacity and system IDs. Note that some rooms have multiple IDs."""
         # API URL for Rooms
-        url = "https://integration.preprod.unisg.ch/toolapi/Rooms"
+        url = f"{self.TOOL_API_URL}/Rooms"
 
         # Headers for API call
         headers = {
@@ -243,16 +378,9 @@ class API:
             "X-RequestedLanguage": "en"
         }
 
-        # Get response from API
-        response = requests.get(url, headers=headers)
-
-        # Error handling for API call
-        if response.ok:
-            json_response = response.json()
-            print(json_response)
-            df = pd.DataFrame(json_response)
-        else:
-            print("Error: ", response.status_code)
+        # Get response from API (raises an APIError if the call fails)
+        json_response = self.http.get_json(url, endpoint='rooms', headers=headers)
+        df = pd.DataFrame(json_response)
 
         # Define RegEx pattern to look for on-campus rooms (pattern: xx-(U)xxx)
         pattern = r"\b\d{2}-[U]?\d{3}\b"
@@ -279,6 +407,56 @@ class API:
 
         return campus_rooms_clean
     
+def weekly_dates(weekday, weeks=4, start_date=None):
+    """Returns the dates (strings with format '%Y-%m-%d') of the next `weeks` occurrences of a weekday (0 = Monday) from start_date (datetime, defaults to today, inclusive)."""
+    if start_date == None:
+        start_date = dt.now()
+    first = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+    return [(first + timedelta(weeks=i)).strftime('%Y-%m-%d') for i in range(weeks)]
+
+@timed()
+def normalize_rooms(pois):
+    """Returns the RoomCatalogue given the list of POIs returned by the MazeMap API (only POIs with a room number of the pattern xx-xxx(x) are kept)."""
+    return RoomCatalogue(pois)
+
+@timed()
+def build_courses(day):
+    """Returns a timetable of all courses and their locations given a DaySchedule."""
+    courses = day.events
+
+    room_nr = courses['location']
+    size = courses['room'].str['seats']
+    start_time = courses['startTime']
+    end_time = courses['endTime']
+    subject = courses['description']
+
+    rooms_df = pd.DataFrame({'room_nr':room_nr, 'size':size, 'start_time':start_time, 'end_time':end_time, 'subject':subject})
+
+    # Transform start and end time to datetime format to enable filtering by time
+    rooms_df['start_time'] = pd.to_datetime(rooms_df['start_time'], format='%Y-%m-%dT%H:%M:%S')
+    rooms_df['end_time'] = pd.to_datetime(rooms_df['end_time'], format='%Y-%m-%dT%H:%M:%S')
+
+    # Create separate columns only containing times for filtering
+    rooms_df['start_time_only'] = rooms_df['start_time'].dt.time
+    rooms_df['end_time_only'] = rooms_df['end_time'].dt.time
+    rooms_df['date'] = rooms_df['start_time'].dt.date
+    rooms_df['date'] = pd.to_datetime(rooms_df['date'])
+
+    return rooms_df
+
+@timed()
+def attach_events(rooms, courses, positions):
+    """Joins each room with the event at the corresponding row position in courses (-1 for rooms with no more events)."""
+    has_event = positions >= 0
+    events = courses.drop(columns=['room_nr']).iloc[positions[has_event]]
+    events = events.set_axis(np.flatnonzero(has_event)).reindex(range(len(rooms)))
+
+    # Rooms without any further event
+    events.loc[~has_event, ['start_time', 'end_time', 'start_time_only', 'end_time_only']] = None
+    events.loc[~has_event, 'subject'] = 'No more events planned for today'
+
+    return pd.concat([rooms, events], axis=1)
+
 def euclidean_distance(start_coordinates, end_coordinates):
     x1, y1, z1 = start_coordinates
     x2, y2, z2 = end_coordinates
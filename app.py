@@ -1,360 +1,650 @@
-from flask import Flask, flash, render_template, request, session, redirect, url_for
+from flask import Flask, Response, flash, g, template_rendered, before_render_template, jsonify, render_template, request, session, redirect, url_for, stream_with_context
+import atexit
+import os
+import threading
 import requests
 import numpy as np
 import pandas as pd
 from datetime import datetime as dt
 from datetime import timedelta
-from API_calls import API, euclidean_distance
-from scraper import seatfinder
+from API_calls import API
+from http_client import HTTPClient, APIError
+from scraper import SeatfinderPoller, URL as SEATFINDER_URL
+from occupancy_history import OccupancyHistory, RESOLUTIONS, MAX_HISTORY_HOURS
+from timetable import build_timetable, slot_grid
+from bookings import BookingRepository, configure_sqlite
+from response_cache import ResponseCache, conditional_json
+from live import LiveFeed
+from room_filters import LECTURE_ROOMS, RoomFilter
+from view_models import room_page, start_location_options
+from warm_start import WarmStartSnapshot
+from metrics import REGISTRY, SPANS, instrument_engine, register_cache
+import time
 from flask_sqlalchemy import SQLAlchemy
 
-##### SET-UP ##############################################################################
+##### DATABASE ############################################################################
 
-# Set up application
-app = Flask(__name__)
-
-# Read API_token from config.py file
-app.config.from_pyfile("config.py")
-
-# Initialize instance of API with api_token
-api = API(app.config['API_TOKEN'])
-
-# Set secret key for session variables
-app.secret_key = app.config['SECRET_KEY']
-
-# Intitialize sqlite database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///schedule.db'
-db = SQLAlchemy(app)
+# Sqlite database for room bookings, bound to the app in create_app()
+db = SQLAlchemy()
 
 # Create database schema for room booking (see route: /book_room)
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     room_nr = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.String(10), nullable=False) # Date of the booked slot ('%Y-%m-%d')
     time_slot = db.Column(db.String(10), nullable=False)
-    booking_count = db.Column(db.Integer, default=0) # Counter of number of bookings for a given room_nr and time_slot
+    booking_count = db.Column(db.Integer, nullable=False, default=0) # Counter of number of bookings for a given room_nr, date and time_slot
+
+    # One counter row per room, date and slot (target of the atomic upsert in BookingRepository.increment); also serves lookups by room and date
+    # The date index serves the bulk delete of expired days (see BookingRepository.compact)
+    __table_args__ = (db.UniqueConstraint('room_nr', 'date', 'time_slot', name='uq_booking_room_nr_date_time_slot'),
+                      db.Index('ix_booking_date', 'date'))
 
     def __repr__(self):
-        return f'<Booking {self.room_nr} {self.time_slot}>'
-
-# Set up database in the application context
-with app.app_context():
-    db.create_all() # Create all tables outlined above
-
-##### ROUTES ###############################################################################
-
-# Landing page with overview of room occupancy and filtering options
-@app.route("/", methods=['GET', 'POST'])
-def home():
-    # Initialize variables for filter settings
-    current_time = dt.now()
-    current_date = dt.now()
-    max_date = current_date + timedelta(days=30)
-    min_date = current_date - timedelta(days=30)
-    
-    # Format dates as strings
-    current_date = current_date.strftime("%Y-%m-%d")
-    max_date = max_date.strftime("%Y-%m-%d")
-    min_date = min_date.strftime("%Y-%m-%d")
-
-    # Default filtering timeframe set to at least 30min: current time until ((current time + 30min) rounded to next full hour)
-    rounded_up_time = current_time + timedelta(minutes=30) # Add 30min to current time
-    rounded_up_time = rounded_up_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1) # Round to next full hour
-    rounded_up_time_str = rounded_up_time.strftime("%H:%M")
+        return f'<Booking {self.room_nr} {self.date} {self.time_slot}>'
+
+##### JSON API HELPERS ####################################################################
+
+def parse_time_arg(name, default):
+    """Returns the request argument `name` normalized to '%H:%M', or `default` if it is missing. Raises ValueError for invalid times."""
+    value = request.args.get(name)
+    if not value:
+        return default
+    return dt.strptime(value, '%H:%M').strftime('%H:%M')
+
+def parse_date_arg(name='date', window=None):
+    """Returns the request argument `name` normalized to '%Y-%m-%d' (defaults to today). Raises ValueError for invalid dates.
+    window -> (first, last) date strings; dates outside of it are rejected as well, so arbitrary dates are neither fetched nor cached."""
+    value = request.args.get(name)
+    if not value:
+        return dt.now().strftime('%Y-%m-%d')
+    date = dt.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    if window is not None and not window[0] <= date <= window[1]:
+        raise ValueError(f"{name} outside of {window[0]} - {window[1]}")
+    return date
+
+def time_or_none(value):
+    """Formats an event time for JSON; placeholders and missing times become None."""
+    if value is None or pd.isna(value) or value.year == 1970:
+        return None
+    return value.strftime('%H:%M')
+
+def number_or_none(value):
+    return None if value is None or pd.isna(value) else int(value)
+
+##### APPLICATION FACTORY #################################################################
+
+def create_app(config=None, preload=None, instance_path=None, background=True):
+    """Creates and configures the app: reads config.py (overridden by the `config` dict, e.g., for tests), sets up caches, background workers and the database, and registers all routes.
+    Heavy dependencies (Selenium, BeautifulSoup) are only imported when the seatfinder is first scraped. Set `preload` (or PRELOAD in config.py) to warm the caches in the background right after startup.
+    `instance_path` (absolute) overrides the instance folder holding the sqlite database and the warm-start snapshot, e.g., for load tests.
+    With `background` set to False, no background threads are started at all (seat poller, cache refreshers, warm-start and compaction timers, preloading),
+    e.g., in the watcher process of the reloader, which never serves requests."""
+
+    ##### SET-UP ##############################################################################
+
+    # Set up application
+    app = Flask(__name__, instance_path=instance_path)
+
+    # Read API_token from config.py file (optional if the settings are passed in `config`)
+    app.config.from_pyfile("config.py", silent=config is not None)
+    app.config.from_mapping(config or {})
+
+    # Initialize instance of API with api_token
+    # Room catalogue and daily schedules are cached process-wide; TTLs (in seconds) can be overridden in config.py
+    # Schedules are additionally persisted to the sqlite database in the instance folder
+    # Upstream calls share a pooled HTTP session; pool size, retries and timeouts can be overridden in config.py
+    os.makedirs(app.instance_path, exist_ok=True)
+    http = HTTPClient(pool_size=app.config.get('HTTP_POOL_SIZE', 10),
+                      retries=app.config.get('HTTP_RETRIES', 3),
+                      backoff_factor=app.config.get('HTTP_BACKOFF_FACTOR', 0.5),
+                      timeouts=app.config.get('HTTP_TIMEOUTS'),
+                      deadline=app.config.get('HTTP_DEADLINE', 10))
+    api = API(app.config['API_TOKEN'],
+              rooms_ttl=app.config.get('ROOMS_TTL', 6*60*60),
+              rooms_stale_ttl=app.config.get('ROOMS_STALE_TTL', 24*60*60),
+              schedule_ttl=app.config.get('SCHEDULE_TTL', 15*60),
+              schedule_stale_ttl=app.config.get('SCHEDULE_STALE_TTL', 60*60),
+              schedule_db_path=os.path.join(app.instance_path, 'schedule.db'),
+              http=http,
+              fetch_workers=app.config.get('FETCH_WORKERS', 8),
+              schedule_max_days=app.config.get('SCHEDULE_MAX_DAYS', 64),
+              schedule_refresh_days=app.config.get('SCHEDULE_REFRESH_DAYS', 7),
+              schedule_retention_days=app.config.get('SCHEDULE_RETENTION_DAYS', 30))
+
+    # Upstream endpoints can be pointed elsewhere, e.g., at the stub server of the load test (benchmarks/load_test.py)
+    api.MAZEMAP_URL = app.config.get('MAZEMAP_URL', API.MAZEMAP_URL)
+    api.EVENT_API_URL = app.config.get('EVENT_API_URL', API.EVENT_API_URL)
+
+    # Start warm: prime the caches with the catalogue and recent schedules from the last snapshot (revalidated in the background), then keep the snapshot up to date
+    warm_start = WarmStartSnapshot(api, os.path.join(app.instance_path, 'warm_start.pickle'),
+                                   days=app.config.get('WARM_START_DAYS', 14),
+                                   max_age=app.config.get('WARM_START_MAX_AGE', 7*24*60*60))
+    if app.config.get('WARM_START', True):
+        warm_start.load(revalidate=background)
+        if background:
+            warm_start.start(interval=app.config.get('WARM_START_INTERVAL', 10*60))
+            atexit.register(warm_start.save)
+
+    # Keep the room catalogue and the loaded schedules of the coming days warm in the background so requests don't wait for the upstream APIs
+    # Set BACKGROUND_REFRESH = False (e.g., in tests and scripts) to load them on demand only
+    if background and app.config.get('BACKGROUND_REFRESH', True):
+        api.rooms_cache.start_background_refresh()
+        api.schedule.start_background_refresh()
+
+    # Scrape seatfinder in the background and serve the latest snapshot to /seatfinder
+    # Set SEATFINDER_POLL = False in config.py for workers that should only read the snapshot shared via sqlite
+    seat_poller = SeatfinderPoller(interval=app.config.get('SEATFINDER_INTERVAL', 120),
+                                   db_path=os.path.join(app.instance_path, 'schedule.db'),
+                                   driver_path=app.config.get('DRIVER_PATH'),
+                                   url=app.config.get('SEATFINDER_URL', SEATFINDER_URL))
+
+    # Append every scraped snapshot to the seat occupancy time series
+    seat_history = OccupancyHistory(os.path.join(app.instance_path, 'schedule.db'),
+                                    raw_retention_days=app.config.get('SEAT_HISTORY_RAW_DAYS', 7),
+                                    rollup_retention_days=app.config.get('SEAT_HISTORY_ROLLUP_DAYS'))
+    seat_poller.listeners.append(seat_history.append)
+
+    if background and app.config.get('SEATFINDER_POLL', True):
+        seat_poller.start()
+
+    # Shared producer of the live stream (see route: /stream): seat changes and rooms becoming free or occupied
+    live_feed = LiveFeed(api, seat_poller, heartbeat=app.config.get('STREAM_HEARTBEAT', 15), max_queue=app.config.get('STREAM_MAX_QUEUE', 100))
+
+    # Slot grid of the room timetable on /map (45min blocks from 08:15 to 22:00 unless configured otherwise in config.py)
+    timetable_slots = slot_grid(**app.config.get('TIMETABLE_GRID', {}))
+
+    # Serialized responses of the JSON API, keyed by normalized parameters and data versions
+    json_cache = ResponseCache(max_entries=app.config.get('JSON_CACHE_ENTRIES', 256))
+
+    # Set secret key for session variables
+    app.secret_key = app.config['SECRET_KEY']
+
+    # Intitialize sqlite database
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///schedule.db')
+    db.init_app(app)
+
+    # Booking counts are read with one grouped query per page and cached (write-through) for a few seconds
+    # Bookings can be made for the same 30-day window around today as the date filter of home(); older days are expired
+    bookings = BookingRepository(db, Booking, ttl=app.config.get('BOOKINGS_CACHE_TTL', 30),
+                                 retention_days=app.config.get('BOOKINGS_RETENTION_DAYS', 30))
+
+    # Set up database in the application context
+    with app.app_context():
+        # WAL mode and a busy timeout let several workers book concurrently without 'database is locked' errors
+        configure_sqlite(db.engine, busy_timeout=app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+        bookings.migrate() # Move a booking table without dates (earlier versions) aside
+        db.create_all() # Create all tables outlined above
+
+        # create_all() doesn't add indexes to existing tables
+        for index in Booking.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+        # Time every SQL statement (see route: /metrics)
+        instrument_engine(db.engine)
+
+    # Move expired bookings to the archive table and compact the database once a day
+    if background and app.config.get('BOOKINGS_COMPACTION', True):
+        bookings.start_compaction(app, interval=app.config.get('BOOKINGS_COMPACTION_INTERVAL', 24*60*60),
+                                  archive=app.config.get('BOOKINGS_ARCHIVE', True))
+
+    # Free rooms on the landing page are listed in pages of ROOMS_PER_PAGE cards
+    rooms_per_page = app.config.get('ROOMS_PER_PAGE', 20)
+
+    def start_locations():
+        """Options of the "My location" dropdown (filtered room catalogue), rendered once per catalogue version."""
+        return api.catalogue_memo('start_location_options', lambda rooms: start_location_options(api.filter_rooms(rooms)['room_nr']))
+
+    ##### METRICS ##############################################################################
+    # Request latencies, spans of API methods, DB queries and template rendering, upstream calls and cache hit rates are exported on /metrics
+
+    request_seconds = REGISTRY.histogram('http_request_seconds', 'Duration of handled requests (excluding streamed response bodies).', labels=('endpoint', 'method', 'status'))
+    REGISTRY.collect('live_subscribers', 'Open connections to the live stream.', 'gauge', (), lambda: [((), len(live_feed.subscribers))])
+    register_cache('rooms', api.rooms_cache)
+    register_cache('schedule', api.schedule.cache)
+    register_cache('bookings', bookings.cache)
+    register_cache('json', json_cache)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' in g:
+            request_seconds.observe(time.perf_counter() - g.request_start,
+                                    endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code)
+        return response
+
+    @before_render_template.connect_via(app)
+    def start_render(sender, template, context, **extra):
+        g.render_start = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def record_render(sender, template, context, **extra):
+        if 'render_start' in g:
+            SPANS.observe(time.perf_counter() - g.pop('render_start'), span=f'template.{template.name}')
+
+    ##### ROUTES ###############################################################################
+
+    # Landing page with overview of room occupancy and filtering options
+    @app.route("/", methods=['GET', 'POST'])
+    def home():
+        # Initialize variables for filter settings
+        current_time = dt.now()
+        current_date = dt.now()
+        max_date = current_date + timedelta(days=30)
+        min_date = current_date - timedelta(days=30)
+
+        # Format dates as strings
+        current_date = current_date.strftime("%Y-%m-%d")
+        max_date = max_date.strftime("%Y-%m-%d")
+        min_date = min_date.strftime("%Y-%m-%d")
+
+        # Default filtering timeframe set to at least 30min: current time until ((current time + 30min) rounded to next full hour)
+        rounded_up_time = current_time + timedelta(minutes=30) # Add 30min to current time
+        rounded_up_time = rounded_up_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1) # Round to next full hour
+        rounded_up_time_str = rounded_up_time.strftime("%H:%M")
+
+        # Filte to not display any rooms if no filter is applied 
+        filter_applied = session.get('filter_applied') # Check if filter_applied is in session, if not, set it to False
+        if filter_applied is None:
+            filter_applied = False  
+
+        session.setdefault('filter_applied', False)
+
+        # Display landing page for current time with no filters applied
+        if request.method == 'GET':
+
+            # Set default session values
+            session.setdefault('filter_time', current_time.strftime("%H:%M"))
+            session.setdefault('filter_end_time', rounded_up_time_str)
+            session.setdefault('filter_date', current_date)
+            session.setdefault('filter_size', np.inf)
+            session.setdefault('current_loc', None)
+
+            # Create mask for handling filter size in HTML and Jinja2 (np.inf not available in Jinja2)
+            filter_size = session.get('filter_size')
+            filter_size_is_inf = filter_size == np.inf
+
+            # Rooms are only listed once a filter was applied (e.g., when paging through the results of the session's filters)
+            rooms = None
+            if session['filter_applied']:
+                # Fetch room catalogue and schedule concurrently, then retrieve specified data from API
+                api.prefetch(session['filter_date'])
+                rooms_df = api.get_free_rooms(session['filter_time'], session['filter_end_time'], session['filter_date'])
+
+                # Filter lecture rooms to exclude unwanted buildings and room types, and apply size filter (precomputed masks)
+                rooms_df = api.filter_rooms(rooms_df, LECTURE_ROOMS.with_seats(max_seats=filter_size))
+
+                # Applying distance filter in case there is a current_loc in session
+                current_loc = session['current_loc']
+                if current_loc != None:
+                    # Sort by euclidean distance (precomputed distance matrix) to show closest rooms
+                    rooms_df = api.sort_by_distance(rooms_df, current_loc)
+
+                # Only the requested page of rooms is projected for the template
+                rooms = room_page(rooms_df, request.args.get('page', 1, type=int), per_page=rooms_per_page)
+
+            return render_template('home.html', rooms=rooms, filter_date=session['filter_date'], 
+                                   filter_time=session['filter_time'], filter_end_time=session['filter_end_time'], 
+                                   filter_size=session['filter_size'], max_date=max_date, min_date=min_date, 
+                                   filter_size_is_inf=filter_size_is_inf, rounded_up_time_str=rounded_up_time_str, 
+                                   start_location_options=start_locations(), filter_applied=session['filter_applied'],
+                                   current_loc=session['current_loc'])
     
-    # Filte to not display any rooms if no filter is applied 
-    filter_applied = session.get('filter_applied') # Check if filter_applied is in session, if not, set it to False
-    if filter_applied is None:
-        filter_applied = False  
+        # Apply filters and re-render template
+        else:
 
-    session.setdefault('filter_applied', False)
-    
-    # Display landing page for current time with no filters applied
-    if request.method == 'GET':
+            # Filter by size
+            filter_size_input = request.form.get("filter_size", np.inf).strip()
+            filter_size = int(filter_size_input) if filter_size_input.isdigit() else np.inf
+
+            # Handle start-time user input
+            filter_time_input = request.form.get('filter_time', current_time)
+            if filter_time_input == 'Now':
+                filter_time = current_time.strftime("%H:%M")
+            elif len(filter_time_input.split(":")) == 2 and all(part.isdigit() for part in filter_time_input.split(":")):
+                filter_time = filter_time_input
+            else:
+                filter_time = current_time.strftime("%H:%M")
+
+            # Handle end-time user input
+            filter_end_time_input = request.form.get('filter_end_time', None)
+            if not (len(filter_end_time_input.split(":")) == 2 and all(part.isdigit() for part in filter_end_time_input.split(":"))):
+                filter_end_time = None
+            else:
+                filter_end_time = filter_end_time_input
+
+            # Filter by date
+            filter_date_input = request.form.get('filter_date', None)
+            if filter_date_input != None:
+                try:
+                    # Validate the date format and range (same as the date picker)
+                    filter_date = dt.strptime(filter_date_input, '%Y-%m-%d').strftime('%Y-%m-%d')
+                    if not min_date <= filter_date <= max_date:
+                        filter_date = current_date
+                except ValueError:
+                    # Handle the case where the date format is incorrect
+                    app.logger.info("Incorrect date format provided.")
+                    filter_date = current_date
+            else:
+                filter_date = current_date
+
+            # Get free rooms for user-specified time-window (room catalogue and schedule are fetched concurrently)
+            api.prefetch(filter_date)
+            rooms_df = api.get_free_rooms(filter_time, filter_end_time, filter_date)
+
+            # Filter lecture rooms and apply size filter (precomputed masks)
+            rooms_df = api.filter_rooms(rooms_df, LECTURE_ROOMS.with_seats(max_seats=filter_size))
+
+            # Get current location
+            try:
+                current_loc = request.form['start_location']
+            except:
+                current_loc = None
+
+            if current_loc != None:
+                # Sort by euclidean distance (precomputed distance matrix) to show closest rooms
+                rooms_df = api.sort_by_distance(rooms_df, current_loc)
+            # Set session variables to store filter configuration
+            session['filter_time'] = filter_time
+            session['filter_end_time'] = filter_end_time
+            session['filter_date'] = filter_date
+            session['filter_size'] = filter_size
+            session['current_loc'] = current_loc
+
+            # Create mask for handling variables in HTML and Jinja2 (np.inf not available in Jinja2)
+            filter_size_is_inf = filter_size == np.inf
+
+
+            # Set filter_applied to True in the session
+            session['filter_applied'] = True
+
+            # First page of the results (further pages are requested with GET /?page=n, using the filters stored in the session)
+            rooms = room_page(rooms_df, 1, per_page=rooms_per_page)
+
+            return render_template('home.html', rooms=rooms, filter_date=session['filter_date'], 
+                                   filter_time=session['filter_time'], filter_end_time=session['filter_end_time'], 
+                                   filter_size=session['filter_size'], max_date=max_date, min_date=min_date, 
+                                   filter_size_is_inf=filter_size_is_inf, rounded_up_time_str=rounded_up_time_str, 
+                                   start_location_options=start_locations(), filter_applied=session['filter_applied'],
+                                   current_loc=session['current_loc'])
+
+    # Route to clear filter session variables
+    @app.route('/clear_filters', methods=['POST'])
+    def clear_filters():
+        session.pop('filter_time', None)
+        session.pop('filter_end_time', None)
+        session.pop('filter_date', None)
+        session.pop('filter_size', None)
+        session.pop('current_loc', None)
+        session['filter_applied'] = False  # Set filter_applied to False in the session
+        return redirect(url_for('home'))
+
+    # Display detailed information and directions for a selected room  
+    @app.route('/map', methods=['GET'])
+    def map():
+        rooms = api.get_rooms()
+        start_room_nr = session.get('current_loc')
+
+        # Get destination room_nr from form or session variable in case of redirect (from /book_room)
+        dest_room_nr = request.args.get('room_nr')
+        if dest_room_nr is not None:
+            session['dest_room_nr'] = dest_room_nr
+        else:
+            dest_room_nr = session.get('dest_room_nr')
+
+        # Get equipment information from the room catalogue (the description is only decoded for this room)
+        equipment = api.room_details(dest_room_nr)['description']
+        if equipment != None:
+            equipment = equipment.split("\n")
+
+        # Get all courses taking place in the specified room on a given date
+        date = session.get('filter_date')
+        courses_today = api.get_schedule(dest_room_nr, start_date=dt.strptime(date, '%Y-%m-%d'))
+
+        # Assign courses to the slots of the day's timetable and aggregate consecutive blocks
+        schedule = build_timetable(courses_today, slots=timetable_slots)
+
+        # Query database for booking entries of the room on the date (single query) and assign to booking_count; where empty, assign 0
+        booking_counts = bookings.counts_for_room(dest_room_nr, date)
+        schedule['booking_count'] = [booking_counts.get(start.strftime('%H:%M'), 0) for start in schedule['startTime']]
+
+        # Display map by passing key-word args (start and destination poiId)
+        if start_room_nr is not None and dest_room_nr is not None:
+            start_poiId = rooms.query('room_nr == @start_room_nr')['poiId'].iloc[0]
+            dest_poiId = rooms.query('room_nr == @dest_room_nr')['poiId'].iloc[0]
+
+            # Specify map configuration
+            iframe_url = f"http://use.mazemap.com/embed.html?campusid=710&typepois=36317&desttype=poi&dest={dest_poiId}&starttype=poi&start={start_poiId}"
+
+            # Pass the iframe URL to the template
+            return render_template('map.html', iframe_url=iframe_url, start_poiId=start_poiId, dest_poiId=dest_poiId, room_nr=dest_room_nr, room_schedule_df=schedule, equipment=equipment, date=date)
+        else:
+            dest_poiId = rooms.query('room_nr == @dest_room_nr')['poiId'].iloc[0]
+            # Specify map configuration
+            iframe_url = f"http://use.mazemap.com/embed.html?campusid=710&typepois=36317&desttype=poi&dest={dest_poiId}"
+            # Provide more information for debugging
+            return render_template('map.html', iframe_url=iframe_url, dest_poiId=dest_poiId, room_nr=dest_room_nr, room_schedule_df=schedule, equipment=equipment, date=date)
+
+    # Navbar routing to apology
+    @app.route('/apology')
+    def apology():
+        return render_template('apology.html')
+
+    # Display apology if one of the upstream APIs is unavailable
+    @app.errorhandler(APIError)
+    def upstream_error(e):
+        app.logger.warning("Upstream API error: %s", e)
+        if request.path.startswith('/api/'):
+            return jsonify(error="The university's room data is currently unavailable. Please try again later."), 503
+        return render_template('apology.html', message="The university's room data is currently unavailable. Please try again later."), 503
+
+    @app.route('/seatfinder', methods=['GET'])
+    def studyspots():
+        # Initialize variables
+        current_time = dt.now()
+        current_date = dt.now()
+        max_date = current_date + timedelta(days=30)
+        min_date = current_date - timedelta(days=30)
+
+        # Format dates as strings
+        current_date = current_date.strftime("%Y-%m-%d")
+        max_date = max_date.strftime("%Y-%m-%d")
+        min_date = min_date.strftime("%Y-%m-%d")
+
+        # Round up to the next full hour
+        rounded_up_time = current_time + timedelta(minutes=30)
+        rounded_up_time = rounded_up_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        rounded_up_time_str = rounded_up_time.strftime("%H:%M")
+
+        # Check if filter_applied is in session, if not, set it to False
+        filter_applied = session.get('filter_applied')
+        if filter_applied is None:
+            filter_applied = False  
+
+        # Latest seat occupancy snapshot from the background poller
+        seatfinder_df = seat_poller.latest()
 
         # Set default session values
         session.setdefault('filter_time', current_time.strftime("%H:%M"))
         session.setdefault('filter_end_time', rounded_up_time_str)
         session.setdefault('filter_date', current_date)
         session.setdefault('filter_size', np.inf)
-        session.setdefault('current_loc', None)
-        
-        # Create mask for handling filter size in HTML and Jinja2 (np.inf not available in Jinja2)
+        session.setdefault('filter_applied', False)
+
+        # Set filter_applied to False in the session
+        session['filter_applied'] = False
+
+        # Create mask for handling variables in HTML and Jinja2 (np.inf not available in Jinja2)
         filter_size = session.get('filter_size')
         filter_size_is_inf = filter_size == np.inf
 
-        # Retrieve specified data from API
-        rooms_df = api.get_free_rooms(session['filter_time'], session['filter_end_time'])
-
-        # Filter lecture rooms to exclude unwanted buildings and room types
-        rooms_df = api.filter_rooms(rooms_df)
-
-        # Starting locations to select for routing
-        start_locations = api.get_rooms()
-        
-        # Applying distance filter in case there is a current_loc in session
-        current_loc = session['current_loc']
-        if current_loc != None:
-            current_coordinates = start_locations.query('room_nr == @current_loc')['point.coordinates'].values[0]
-            current_height = start_locations.query('room_nr == @current_loc')['z'].values[0]
-
-            # Calculate euclidean distances to show closest rooms
-            rooms_df['distance'] = rooms_df.apply(lambda row: euclidean_distance([*row['point.coordinates'], row['z']*5], [*current_coordinates, current_height*5]), axis=1)
-            rooms_df = rooms_df.sort_values(by='distance')
-
-        start_locations = api.filter_rooms(start_locations)
-        return render_template('home.html', rooms_df=rooms_df, filter_date=session['filter_date'], 
-                               filter_time=session['filter_time'], filter_end_time=session['filter_end_time'], 
-                               filter_size=session['filter_size'], max_date=max_date, min_date=min_date, 
-                               filter_size_is_inf=filter_size_is_inf, rounded_up_time_str=rounded_up_time_str, 
-                               start_locations=start_locations, filter_applied=session['filter_applied'],
-                               current_loc=session['current_loc'])
-    
-    # Apply filters and re-render template
-    else:
-
-        # Filter by size
-        filter_size_input = request.form.get("filter_size", np.inf).strip()
-        filter_size = int(filter_size_input) if filter_size_input.isdigit() else np.inf
-        
-        # Handle start-time user input
-        filter_time_input = request.form.get('filter_time', current_time)
-        if filter_time_input == 'Now':
-            filter_time = current_time.strftime("%H:%M")
-        elif len(filter_time_input.split(":")) == 2 and all(part.isdigit() for part in filter_time_input.split(":")):
-            filter_time = filter_time_input
-        else:
-            filter_time = current_time.strftime("%H:%M")
-        
-        # Handle end-time user input
-        filter_end_time_input = request.form.get('filter_end_time', None)
-        if not (len(filter_end_time_input.split(":")) == 2 and all(part.isdigit() for part in filter_end_time_input.split(":"))):
-            filter_end_time = None
-        else:
-            filter_end_time = filter_end_time_input
+        return render_template('seatfinder.html', seatfinder_df=seatfinder_df, filter_date=session['filter_date'], filter_time=session['filter_time'], filter_end_time=session['filter_end_time'], 
+                               filter_size=session['filter_size'], max_date=max_date, min_date=min_date, filter_size_is_inf=filter_size_is_inf, rounded_up_time_str=rounded_up_time_str, 
+                               start_location_options=start_locations(), filter_applied=session['filter_applied'])
 
-        # Filter by date
-        filter_date_input = request.form.get('filter_date', None)
-        if filter_date_input != None:
-            try:
-                # Validate the date format
-                dt.strptime(filter_date_input, '%Y-%m-%d')
-                filter_date = filter_date_input
-            except ValueError:
-                # Handle the case where the date format is incorrect
-                print("Incorrect date format provided.")
-                filter_date = current_date
-        else:
-            filter_date = current_date
-
-        # Get free rooms for user-specified time-window    
-        rooms_df = api.get_free_rooms(filter_time, filter_end_time, filter_date)
-        
-        # Filter lecture rooms
-        rooms_df = api.filter_rooms(rooms_df)
-        
-        # Apply size filter
-        if filter_size != np.inf:
-            rooms_df = rooms_df.query(f'seats <= {filter_size}')
-
-        # Starting locations to select for directions
-        start_locations = api.get_rooms()
-        start_locations = api.filter_rooms(start_locations)
-
-        # Get current location
+    # Route to handle room booking
+    @app.route('/book_room', methods=['POST'])
+    def book_room():
+        # Retrieve information on booked room from form
+        room_nr = request.form['room_nr']
+        time_slot = request.form['time_slot']
+
+        # Date of the timetable the slot was booked on (falls back to the filter date of the session)
+        date = request.form.get('date') or session.get('filter_date')
+        try:
+            dt.strptime(date, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            date = dt.now().strftime('%Y-%m-%d')
+
+        # Only days within the booking window are counted (older days are removed by the compaction)
+        first_date, last_date = bookings.window()
+        if not first_date <= date <= last_date:
+            return redirect(url_for('map'))
+
+        # Increment the counter of room_nr, date and time-slot (atomic upsert)
+        bookings.increment(room_nr, date, time_slot)
+
+        return redirect(url_for('map')) 
+
+    # Server-sent events with live seat occupancy and room availability (one shared producer for all clients)
+    # Every open stream occupies a worker thread, so run the app with a threaded (or async) server
+    @app.route('/stream', methods=['GET'])
+    def stream():
+        subscription = live_feed.subscribe()
+        response = Response(stream_with_context(live_feed.stream(subscription)), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no' # Disable response buffering in nginx
+        return response
+
+    # Metrics in the Prometheus text format
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    ##### JSON API #############################################################################
+    # Responses carry an ETag derived from the parameters and the versions of the cached data, so polling clients get a 304 while nothing changed
+    # Free rooms for a time window (same defaults as the landing page)
+    @app.route('/api/free_rooms', methods=['GET'])
+    def api_free_rooms():
+        current_time = dt.now()
+        rounded_up_time = (current_time + timedelta(minutes=30)).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        # Dates are limited to the booking window (30 days around today by default)
+        first_date, last_date = bookings.window()
+        try:
+            date = parse_date_arg(window=(first_date, last_date))
+            start = parse_time_arg('start', current_time.strftime('%H:%M'))
+            end = parse_time_arg('end', rounded_up_time.strftime('%H:%M'))
+            size = int(request.args['size']) if request.args.get('size') else None
+        except ValueError:
+            return jsonify(error=f"Invalid parameters: use date=YYYY-MM-DD (from {first_date} to {last_date}), start=HH:MM, end=HH:MM and size=<seats>."), 400
+        filtered = request.args.get('filtered', '1') != '0'
+        near = request.args.get('near') or None
+
+        catalogue, day = api.get_catalogue(), api.get_day(date)
+        key = ('free_rooms', catalogue.digest, day.digest, date, start, end, size, filtered, near)
+
+        def build():
+            # Answer from the same version of the schedule as the key (it may be swapped by a refresh meanwhile)
+            rooms_df = api.get_free_rooms(start, end, day=day)
+            room_filter = LECTURE_ROOMS if filtered else RoomFilter()
+            if filtered or size is not None:
+                rooms_df = api.filter_rooms(rooms_df, room_filter.with_seats(max_seats=size))
+            if near is not None:
+                rooms_df = api.sort_by_distance(rooms_df, near)
+            rooms = [{'room_nr': row['room_nr'], 'poiId': int(row['poiId']), 'name': row['name'], 'building': row['buildingName'],
+                      'floor': row['floorName'], 'type': row['infoUrlText'], 'seats': number_or_none(row['seats']),
+                      'free_until': time_or_none(row['start_time']),
+                      'next_event': row['subject'] if time_or_none(row['start_time']) is not None else None,
+                      'next_event_end': time_or_none(row['end_time']),
+                      **({'distance': None if pd.isna(row['distance']) else round(float(row['distance']), 1)} if near is not None else {})}
+                     for _, row in rooms_df.iterrows()]
+            return {'date': date, 'start': start, 'end': end, 'rooms': rooms}
+
+        return conditional_json(json_cache, key, build)
+
+    # Events and timetable of a room on a date
+    @app.route('/api/rooms/<room_nr>/schedule', methods=['GET'])
+    def api_room_schedule(room_nr):
+        first_date, last_date = bookings.window()
         try:
-            current_loc = request.form['start_location']
-        except:
-            current_loc = None
-        
-        if current_loc != None:
-            current_coordinates = start_locations.query('room_nr == @current_loc')['point.coordinates'].values[0]
-            current_height = start_locations.query('room_nr == @current_loc')['z'].values[0]
-        
-            # Calculate euclidean distances to show closest rooms
-            rooms_df['distance'] = rooms_df.apply(lambda row: euclidean_distance([*row['point.coordinates'], row['z']*5], [*current_coordinates, current_height*5]), axis=1)
-            rooms_df = rooms_df.sort_values(by='distance')
-        # Set session variables to store filter configuration
-        session['filter_time'] = filter_time
-        session['filter_end_time'] = filter_end_time
-        session['filter_date'] = filter_date
-        session['filter_size'] = filter_size
-        session['current_loc'] = current_loc
+            date = parse_date_arg(window=(first_date, last_date))
+        except ValueError:
+            return jsonify(error=f"Invalid date: use date=YYYY-MM-DD (from {first_date} to {last_date})."), 400
+
+        day = api.get_day(date)
+        key = ('room_schedule', day.digest, room_nr, date, tuple(timetable_slots))
+
+        def build():
+            events = day.room_events(room_nr)
+            schedule = build_timetable(events, slots=timetable_slots)
+            return {'room_nr': room_nr, 'date': date,
+                    'events': [{'subject': row['description'], 'start': row['startTime'][11:16], 'end': row['endTime'][11:16]} for _, row in events.iterrows()],
+                    'timetable': [{'course': row['course'], 'start': row['startTime'].strftime('%H:%M'), 'end': row['endTime'].strftime('%H:%M')}
+                                  for _, row in schedule.iterrows()]}
+
+        return conditional_json(json_cache, key, build)
+
+    # Latest seat occupancy of the study zones
+    @app.route('/api/seats', methods=['GET'])
+    def api_seats():
+        seatfinder_df, scraped_at = seat_poller.latest_snapshot()
+        key = ('seats', scraped_at)
+
+        def build():
+            # scraped_at is None until the website was scraped successfully; the placeholder counts are never served as seat data
+            if scraped_at is None:
+                return {'scraped_at': None, 'stale': True,
+                        'zones': [{'zone': zone, 'free': None, 'occupied': None, 'total': None, 'occupancy': None} for zone in seatfinder_df.index]}
+            zones = [{'zone': zone, 'free': number_or_none(row['free']) if row['free'] != '-' else None,
+                      'occupied': number_or_none(row['occupied']) if row['occupied'] != '-' else None,
+                      'total': number_or_none(row['total']) if row['total'] != '-' else None,
+                      'occupancy': None if pd.isna(row.get('occupancy', np.nan)) else round(float(row['occupancy']), 3)}
+                     for zone, row in seatfinder_df.iterrows()]
+            return {'scraped_at': dt.fromtimestamp(scraped_at).isoformat(timespec='seconds'), 'stale': False, 'zones': zones}
+
+        return conditional_json(json_cache, key, build)
+
+    # Seat occupancy history of a study zone (UTC)
+    @app.route('/api/seats/<zone>/history', methods=['GET'])
+    def api_seat_history(zone):
+        try:
+            hours = float(request.args.get('hours', 24))
+        except ValueError:
+            hours = None
+        if hours is None or not 0 < hours <= MAX_HISTORY_HOURS: # Also rejects nan (inf is above the limit)
+            return jsonify(error=f"Invalid hours: use 0 < hours <= {MAX_HISTORY_HOURS}."), 400
+        resolution = request.args.get('resolution') or None
+        if resolution is not None and resolution not in RESOLUTIONS:
+            return jsonify(error=f"Invalid resolution: use one of {', '.join(RESOLUTIONS)}."), 400
+
+        # New samples are appended with every scrape
+        _, scraped_at = seat_poller.latest_snapshot()
+        key = ('seat_history', scraped_at, zone, hours, resolution)
+
+        def build():
+            history_df = seat_history.history(zone, hours=hours, resolution=resolution)
+            return {'zone': zone, 'history': [{'time': row['time'].isoformat(), 'free': round(row['free'], 1), 'occupied': round(row['occupied'], 1),
+                                               'occupancy': None if pd.isna(row['occupancy']) else round(row['occupancy'], 3)}
+                                              for _, row in history_df.iterrows()]}
+
+        return conditional_json(json_cache, key, build)
+
+    # Optionally load the room catalogue and today's schedule (including derived data) before the first request arrives
+    def warm_up():
+        try:
+            api.warm_up()
+        except Exception as e:
+            app.logger.warning("Preloading caches failed: %s", e)
 
-        # Create mask for handling variables in HTML and Jinja2 (np.inf not available in Jinja2)
-        filter_size_is_inf = filter_size == np.inf
-        
-
-        # Set filter_applied to True in the session
-        session['filter_applied'] = True
-
-        # DELETE THIS: this is just for testing
-        print("Filter Applied:", session['filter_applied'])
-
-        return render_template('home.html', rooms_df=rooms_df, filter_date=session['filter_date'], 
-                               filter_time=session['filter_time'], filter_end_time=session['filter_end_time'], 
-                               filter_size=session['filter_size'], max_date=max_date, min_date=min_date, 
-                               filter_size_is_inf=filter_size_is_inf, rounded_up_time_str=rounded_up_time_str, 
-                               start_locations=start_locations, filter_applied=session['filter_applied'],
-                               current_loc=session['current_loc'])
-
-# Route to clear filter session variables
-@app.route('/clear_filters', methods=['POST'])
-def clear_filters():
-    session.pop('filter_time', None)
-    session.pop('filter_end_time', None)
-    session.pop('filter_date', None)
-    session.pop('filter_size', None)
-    session.pop('current_loc', None)
-    session['filter_applied'] = False  # Set filter_applied to False in the session
-    return redirect(url_for('home'))
-
-# Display detailed information and directions for a selected room  
-@app.route('/map', methods=['GET'])
-def map():
-    rooms = api.get_rooms()
-    start_room_nr = session.get('current_loc')
-    
-    # Get destination room_nr from form or session variable in case of redirect (from /book_room)
-    dest_room_nr = request.args.get('room_nr')
-    if dest_room_nr is not None:
-        session['dest_room_nr'] = dest_room_nr
-    else:
-        dest_room_nr = session.get('dest_room_nr')
-    
-    # Get equipment information from rooms dataframe
-    equipment = rooms.query('room_nr == @dest_room_nr')['description'].values[0]
-    if equipment != None:
-        equipment = equipment.split("\n")
-
-    # Get all courses taking place in the specified room on a given date
-    date = session.get('filter_date')
-    courses_today = api.get_schedule(dest_room_nr, start_date=dt.strptime(date, '%Y-%m-%d'))
-    
-    # Create base schedule of 45min blocks throughout the day
-    schedule = pd.DataFrame({'endTime':['09:00', '10:00', '11:00', '12:00','13:00', '14:00','15:00', '16:00','17:00', '18:00', '19:00', '20:00', '21:00', '22:00'], 
-                             'course':['-' for i in range(14)], 
-                             'startTime':['08:15', '09:15', '10:15', '11:15', '12:15', '13:15', '14:15', '15:15', '16:15', '17:15', '18:15', '19:15', '20:15', '21:15']}, 
-                             columns=['startTime', 'endTime', 'course']
-                             )
-    schedule['endTime'] = schedule['endTime'].apply(lambda x: dt.strptime(x, '%H:%M').time())
-    schedule['startTime'] = schedule['startTime'].apply(lambda x: dt.strptime(x, '%H:%M').time())
-    
-    courses_today['startTime'] = courses_today['startTime'].apply(lambda x: dt.strptime(x, '%Y-%m-%dT%H:%M:%S').time()) 
-    courses_today['endTime'] = courses_today['endTime'].apply(lambda x: dt.strptime(x, '%Y-%m-%dT%H:%M:%S').time()) 
-
-    # Assign courses to pre-defined time-slots of the schedule dataframe by comparing start- and end-times
-    for i in range(len(schedule)):
-        for k in range(len(courses_today)):
-            if courses_today['endTime'].iloc[k] > schedule['startTime'].iloc[i] and courses_today['startTime'].iloc[k] < schedule['endTime'].iloc[i]:
-                schedule['course'].iloc[i] = courses_today['description'].iloc[k]
-
-    # Create a column to help identify consecutive blocks with the same course
-    schedule['group'] = ((schedule['course'] != schedule['course'].shift()) | (schedule['course'] == '-')).cumsum()
-
-    # Aggregate the blocks by grouping according to the same course to simplify table
-    # but maintain hourly slots where rooms are empty for easier booking (by the hour)
-    aggregated_schedule = schedule.groupby(['group', 'course'], as_index=False).agg({'startTime': 'first', 'endTime': 'last'}).reset_index(drop=True)
-    schedule = aggregated_schedule.drop(columns=['group'])
-
-    # Query database for booking entries and assign to booking_count; where empty, assign 0
-    for index, row in schedule.iterrows():
-        time_slot = row['startTime'].strftime('%H:%M')
-        booking = Booking.query.filter_by(room_nr=dest_room_nr, time_slot=time_slot).first()
-        if booking:
-            schedule.at[index, 'booking_count'] = booking.booking_count
-        else:
-            schedule.at[index, 'booking_count'] = 0
-
-    # Display map by passing key-word args (start and destination poiId)
-    if start_room_nr is not None and dest_room_nr is not None:
-        start_poiId = rooms.query('room_nr == @start_room_nr')['poiId'].iloc[0]
-        dest_poiId = rooms.query('room_nr == @dest_room_nr')['poiId'].iloc[0]
-
-        # Specify map configuration
-        iframe_url = f"http://use.mazemap.com/embed.html?campusid=710&typepois=36317&desttype=poi&dest={dest_poiId}&starttype=poi&start={start_poiId}"
-
-        # Pass the iframe URL to the template
-        return render_template('map.html', iframe_url=iframe_url, start_poiId=start_poiId, dest_poiId=dest_poiId, room_nr=dest_room_nr, room_schedule_df=schedule, equipment=equipment, date=date)
-    else:
-        dest_poiId = rooms.query('room_nr == @dest_room_nr')['poiId'].iloc[0]
-        # Specify map configuration
-        iframe_url = f"http://use.mazemap.com/embed.html?campusid=710&typepois=36317&desttype=poi&dest={dest_poiId}"
-        # Provide more information for debugging
-        return render_template('map.html', iframe_url=iframe_url, dest_poiId=dest_poiId, room_nr=dest_room_nr, room_schedule_df=schedule, equipment=equipment, date=date)
-
-# Navbar routing to apology
-@app.route('/apology')
-def apology():
-    return render_template('apology.html')
-
-@app.route('/seatfinder', methods=['GET'])
-def studyspots():
-    # Initialize variables
-    current_time = dt.now()
-    current_date = dt.now()
-    max_date = current_date + timedelta(days=30)
-    min_date = current_date - timedelta(days=30)
-    
-    # Format dates as strings
-    current_date = current_date.strftime("%Y-%m-%d")
-    max_date = max_date.strftime("%Y-%m-%d")
-    min_date = min_date.strftime("%Y-%m-%d")
-
-    # Round up to the next full hour
-    rounded_up_time = current_time + timedelta(minutes=30)
-    rounded_up_time = rounded_up_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-    rounded_up_time_str = rounded_up_time.strftime("%H:%M")
-    
-    # Check if filter_applied is in session, if not, set it to False
-    filter_applied = session.get('filter_applied')
-    if filter_applied is None:
-        filter_applied = False  
-    
-    # Retrieve specified data from API
-    rooms_df = api.get_free_rooms(current_time.strftime(format="%H:%M"), rounded_up_time_str)
-
-    # Filter lecture rooms
-    rooms_df = api.filter_rooms(rooms_df)
-
-    seatfinder_df = seatfinder()
-    # Set default session values
-    session.setdefault('filter_time', current_time.strftime("%H:%M"))
-    session.setdefault('filter_end_time', rounded_up_time_str)
-    session.setdefault('filter_date', current_date)
-    session.setdefault('filter_size', np.inf)
-    session.setdefault('filter_applied', False)
-
-    # Set filter_applied to False in the session
-    session['filter_applied'] = False
-    
-    # Create mask for handling variables in HTML and Jinja2 (np.inf not available in Jinja2)
-    filter_size = session.get('filter_size')
-    filter_size_is_inf = filter_size == np.inf
-
-    # Starting locations to select for routing
-    start_locations = api.get_rooms()
-
-    return render_template('seatfinder.html', seatfinder_df=seatfinder_df, rooms_df=rooms_df, filter_date=session['filter_date'], filter_time=session['filter_time'], filter_end_time=session['filter_end_time'], 
-                           filter_size=session['filter_size'], max_date=max_date, min_date=min_date, filter_size_is_inf=filter_size_is_inf, rounded_up_time_str=rounded_up_time_str, 
-                           start_locations=start_locations, filter_applied=session['filter_applied'])
-
-# Route to handle room booking
-@app.route('/book_room', methods=['POST'])
-def book_room():
-    # Retrieve information on booked room from form
-    room_nr = request.form['room_nr']
-    time_slot = request.form['time_slot']
-
-    # Add database-entry using time-slot and room_nr
-    booking = Booking.query.filter_by(room_nr=room_nr, time_slot=time_slot).first()
-    if booking:
-        booking.booking_count += 1
-    else:
-        new_booking = Booking(room_nr=room_nr, time_slot=time_slot, booking_count=1)
-        db.session.add(new_booking)
-    db.session.commit()
-    
-    return redirect(url_for('map')) 
+    if background and (app.config.get('PRELOAD', False) if preload is None else preload):
+        threading.Thread(target=warm_up, name='preload', daemon=True).start()
+
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # The reloader runs this module in a watcher process and again in the serving child (WERKZEUG_RUN_MAIN='true');
+    # only the child starts the background workers, otherwise the seat poller (and its headless Chrome) and all timers would run twice
+    create_app(background=os.environ.get('WERKZEUG_RUN_MAIN') == 'true').run(debug=True)
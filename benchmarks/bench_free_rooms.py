@@ -0,0 +1,185 @@
+"""Benchmark for the free-room pipeline.
+
+Replays recorded (or synthetic) MazeMap and EventDates payloads through a local stub server and times each stage
+of the pipeline at several scales of the campus. Results are written as JSON and can be compared across revisions.
+
+Usage (from the repository root):
+    python benchmarks/bench_free_rooms.py --scales 1,10,100 --repeat 5 --output bench.json
+    python benchmarks/bench_free_rooms.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime as dt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from flask import Flask, render_template
+from API_calls import API, normalize_rooms, build_courses, attach_events
+from distances import DistanceMatrix
+from free_slots import FreeSlotSnapshot
+from http_client import HTTPClient
+from occupancy import OccupancyIndex
+from room_filters import LECTURE_ROOMS
+from schedule_store import DaySchedule
+from timetable import build_timetable
+from view_models import room_page, start_location_options
+from fixtures import load_fixtures, scale_fixtures
+from stub_upstream import StubUpstream
+
+# Time window used for all queries
+FILTER_START, FILTER_END = '10:00', '12:00'
+
+
+def measure(stages, name, fn, repeat):
+    """Runs fn `repeat` times, records timing statistics (ms) under `name` and returns the last result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start)*1000)
+    timings.sort()
+    stages[name] = {
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(round(0.95*(len(timings) - 1))))], 3),
+    }
+    return result
+
+
+def render_app():
+    """Minimal Flask app able to render the real templates (which link to the 'home' and 'clear_filters' endpoints)."""
+    app = Flask('benchmark', template_folder=os.path.join(ROOT, 'templates'), static_folder=os.path.join(ROOT, 'static'))
+    app.add_url_rule('/', 'home', lambda: '')
+    app.add_url_rule('/clear_filters', 'clear_filters', lambda: '')
+    return app
+
+
+def run_scale(pois, events, factor, repeat, date):
+    pois, events = scale_fixtures(pois, events, factor)
+    stub = StubUpstream(pois, events).start()
+    try:
+        api = stub.configure(API('benchmark', http=HTTPClient(retries=0)))
+        stages = {}
+        filter_start = dt.strptime(FILTER_START, '%H:%M').time()
+        filter_end = dt.strptime(FILTER_END, '%H:%M').time()
+
+        # Fetch and normalize
+        raw_pois = measure(stages, 'fetch_rooms', lambda: api.http.get_json(api.MAZEMAP_URL, endpoint='mazemap'), repeat)
+        catalogue = measure(stages, 'normalize_rooms', lambda: normalize_rooms(raw_pois.get('pois', [])), repeat)
+        # The dataframe view is built once per catalogue
+        rooms = measure(stages, 'rooms_frame', catalogue.frame, 1)
+        payload = measure(stages, 'fetch_events', lambda: api.fetch_events(date), repeat)
+        day = measure(stages, 'normalize_events', lambda: DaySchedule(date, payload), repeat)
+        courses = measure(stages, 'build_courses', lambda: build_courses(day), repeat)
+
+        # Occupancy and next events
+        index = measure(stages, 'occupancy_index', lambda: OccupancyIndex(courses), repeat)
+        occupied = measure(stages, 'occupancy', lambda: index.occupied_mask(rooms['room_nr'], filter_start, filter_end), repeat)
+        free_rooms = rooms.loc[~occupied].reset_index(drop=True)
+        snapshot = measure(stages, 'free_slots', lambda: FreeSlotSnapshot(rooms, index), repeat)
+        measure(stages, 'slot_occupancy', lambda: snapshot.occupied_mask(filter_start, filter_end), repeat)
+        positions = measure(stages, 'next_event', lambda: index.next_events(free_rooms['room_nr'], filter_end), repeat)
+        measure(stages, 'merge', lambda: attach_events(free_rooms, courses, positions), repeat)
+
+        # End-to-end with warm caches
+        api.rooms_cache.set(value=catalogue)
+        api.schedule.cache.set(date, value=day)
+        result = measure(stages, 'get_free_rooms', lambda: api.get_free_rooms(FILTER_START, FILTER_END, date), repeat)
+        measure(stages, 'filter_rooms_size', lambda: api.filter_rooms(result, LECTURE_ROOMS.with_seats(max_seats=60)), repeat)
+        result = measure(stages, 'filter_rooms', lambda: api.filter_rooms(result), repeat)
+
+        # Distance sort
+        start_locations = api.filter_rooms(rooms)
+        distances = measure(stages, 'distance_matrix', lambda: DistanceMatrix(start_locations), repeat)
+        origin = start_locations['room_nr'].iloc[0]
+        result = measure(stages, 'distance_sort', lambda: distances.sort_by_distance(result, origin), repeat)
+
+        # Room schedule and timetable for /map (for the room with the most events)
+        busiest = courses['room_nr'].value_counts().index[0]
+        room_events = measure(stages, 'room_schedule', lambda: api.get_schedule(busiest, dt.strptime(date, '%Y-%m-%d')), repeat)
+        measure(stages, 'room_timetable', lambda: build_timetable(room_events), repeat)
+
+        # Render the first page of the home page (the location dropdown is rendered once per catalogue in the app)
+        page = measure(stages, 'room_cards', lambda: room_page(result, 1), repeat)
+        options = start_location_options(start_locations['room_nr'])
+        app = render_app()
+        with app.test_request_context('/'):
+            measure(stages, 'render', lambda: render_template('home.html', rooms=page, filter_date=date, filter_time=FILTER_START,
+                                                                filter_end_time=FILTER_END, filter_size=float('inf'), max_date=date, min_date=date,
+                                                                filter_size_is_inf=True, rounded_up_time_str=FILTER_END, start_location_options=options,
+                                                                filter_applied=True, current_loc=origin), repeat)
+
+        counts = {'pois': len(pois['pois']), 'rooms': len(rooms), 'events': len(courses), 'free_rooms': len(result)}
+        return {'counts': counts, 'stages': stages}
+    finally:
+        stub.stop()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report):
+    """Prints the median time of each stage in the baseline and the current report, and their ratio."""
+    print(f"{'scale':>6} {'stage':<18} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for scale, result in report['results'].items():
+        base_stages = baseline['results'].get(scale, {}).get('stages', {})
+        for stage, stats in result['stages'].items():
+            base = base_stages.get(stage)
+            if base is None:
+                print(f"{scale:>6} {stage:<18} {'-':>12} {stats['median_ms']:>12.3f} {'-':>7}")
+            else:
+                ratio = stats['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+                print(f"{scale:>6} {stage:<18} {base['median_ms']:>12.3f} {stats['median_ms']:>12.3f} {ratio:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1,10,100', help="comma-separated multiples of the campus size (default: 1,10,100)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per stage (default: 5)")
+    parser.add_argument('--date', default='2024-10-14', help="date of the replayed schedule (default: 2024-10-14)")
+    parser.add_argument('--output', help="path of the JSON report (default: print to stdout)")
+    parser.add_argument('--compare', help="JSON report of a previous run to compare against")
+    args = parser.parse_args()
+
+    # pandas deprecation warnings would be repeated for every run
+    warnings.simplefilter('ignore', FutureWarning)
+
+    pois, events, source = load_fixtures()
+    report = {
+        'meta': {'revision': git_revision(), 'timestamp': dt.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'fixtures': source, 'repeat': args.repeat, 'window': [FILTER_START, FILTER_END]},
+        'results': {},
+    }
+    for factor in (int(s) for s in args.scales.split(',')):
+        print(f"Running scale {factor}x ...", file=sys.stderr)
+        report['results'][str(factor)] = run_scale(pois, events, factor, args.repeat, args.date)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import json
+import os
+import random
+import re
+
+# Recorded payloads (see record_fixtures.py); a synthetic campus of the same shape is generated if they are missing
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+POIS_FILE = os.path.join(FIXTURES_DIR, 'pois.json')
+EVENTS_FILE = os.path.join(FIXTURES_DIR, 'events.json')
+
+ROOM_NR_PATTERN = re.compile(r"(?<!\w)(\d{2}-\d{3,4})\b")
+
+BUILDINGS = ['01 Hauptgebäude', '09 Bibliothek', '10 Forschung', '20 Executive Campus', '23 Tellstrasse', '52 Rosenbergstrasse',
+             '61 Müller-Friedberg-Strasse', 'A 10 Sporthalle', 'A 11 Square', 'D 14 WBZ Holzweid']
+ROOM_TYPES = [('Unterrichtsraum', 'Hörsaal', 0.55), ('Unterrichtsraum', 'Group meeting room', 0.15), ('Büro', 'Büro', 0.25), ('Unterrichtsraum', 'Dozierenden Lounge', 0.05)]
+SLOTS = [('08:15', '10:00'), ('10:15', '12:00'), ('12:15', '14:00'), ('14:15', '16:00'), ('16:15', '18:00'), ('18:15', '20:00'), ('20:15', '22:00')]
+
+
+def synthetic_pois(n_rooms=700, seed=710):
+    """Returns a synthetic MazeMap POI payload ({'pois': [...]}) with the same structure as campus 710."""
+    rng = random.Random(seed)
+    pois = []
+    for i in range(n_rooms):
+        building = BUILDINGS[i % len(BUILDINGS)]
+        room_nr = f"{int(building[:2]) if building[:2].isdigit() else 70 + i % len(BUILDINGS):02d}-{100 + i // len(BUILDINGS):03d}"
+        name, info, _ = rng.choices(ROOM_TYPES, weights=[t[2] for t in ROOM_TYPES])[0]
+        x, y = 1046000 + rng.random()*800, 5995000 + rng.random()*800
+        pois.append({
+            'poiId': 100000 + i, 'kind': 'room',
+            'point': {'type': 'Point', 'coordinates': [x, y]},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[x, y], [x + 8, y], [x + 8, y + 6], [x, y + 6], [x, y]]]},
+            'campusId': 710, 'floorId': 1000 + i % 7, 'floorName': str(i % 5), 'buildingId': 200 + i % len(BUILDINGS),
+            'buildingName': building, 'identifierId': None, 'identifier': None, 'title': f"Raum {room_nr}", 'deleted': False,
+            'z': i % 5, 'infoUrl': f"https://www.unisg.ch/rooms/{room_nr}", 'infoUrlText': info,
+            'description': "Beamer\nWhiteboard\nMikrofon" if rng.random() < 0.6 else None,
+            'peopleCapacity': rng.choice([None, 12, 24, 40, 60, 120, 300]), 'images': [], 'nodeId': 500000 + i,
+            'types': [{'poiTypeId': 36317, 'name': name, 'icon': None}],
+        })
+    # POIs without a room number (e.g., toilets, entrances) are part of the real payload as well
+    for i in range(n_rooms // 5):
+        pois.append({'poiId': 900000 + i, 'kind': 'poi', 'point': {'type': 'Point', 'coordinates': [1046000, 5995000]},
+                     'title': 'WC', 'z': 0, 'types': [], 'nodeId': 0})
+    return {'pois': pois}
+
+
+def synthetic_events(pois, occupancy=0.45, seed=710):
+    """Returns a synthetic EventDates payload for the lecture rooms in `pois`, with dates as '{date}' placeholders."""
+    rng = random.Random(seed)
+    events = []
+    for poi in pois['pois']:
+        match = ROOM_NR_PATTERN.search(poi.get('title') or '')
+        if match is None or not poi.get('types') or poi['types'][0]['name'] != 'Unterrichtsraum':
+            continue
+        for start, end in SLOTS:
+            if rng.random() < occupancy:
+                events.append({'location': match.group(1), 'room': {'seats': poi.get('peopleCapacity')},
+                               'startTime': f"{{date}}T{start}:00", 'endTime': f"{{date}}T{end}:00",
+                               'description': f"Course {rng.randint(1000, 9999)}"})
+    return events
+
+
+def load_fixtures():
+    """Returns (pois, events, source). Events are templates whose dates are replaced by '{date}'."""
+    if os.path.exists(POIS_FILE) and os.path.exists(EVENTS_FILE):
+        with open(POIS_FILE) as f:
+            pois = json.load(f)
+        with open(EVENTS_FILE) as f:
+            events = json.load(f)
+        return pois, events, 'recorded'
+    pois = synthetic_pois()
+    return pois, synthetic_events(pois), 'synthetic'
+
+
+def scale_fixtures(pois, events, factor):
+    """Returns copies of pois and events with `factor` times as many rooms and events. Copies get new, unique room numbers."""
+    if factor == 1:
+        return pois, events
+
+    room_nrs = sorted({m.group(1) for m in (ROOM_NR_PATTERN.search(p.get('title') or '') for p in pois['pois']) if m})
+    scaled_pois, scaled_events = [], []
+    counter = 0
+    for copy in range(factor):
+        # Map every room number to a unique one of the form xx-yyyy
+        mapping = {}
+        for room_nr in room_nrs:
+            mapping[room_nr] = f"{10 + counter // 9000:02d}-{1000 + counter % 9000}"
+            counter += 1
+        for poi in pois['pois']:
+            poi = dict(poi, poiId=poi['poiId'] + copy*10_000_000)
+            title = poi.get('title') or ''
+            match = ROOM_NR_PATTERN.search(title)
+            if match:
+                poi['title'] = title.replace(match.group(1), mapping[match.group(1)])
+            scaled_pois.append(poi)
+        for event in events:
+            if event.get('location') in mapping:
+                scaled_events.append(dict(event, location=mapping[event['location']]))
+    return {'pois': scaled_pois}, scaled_events
+
+
+def events_for_date(events, date):
+    """Fills the '{date}' placeholders of event templates with the specified date ('%Y-%m-%d')."""
+    return [dict(e, startTime=e['startTime'].replace('{date}', date), endTime=e['endTime'].replace('{date}', date)) for e in events]
@@ -0,0 +1,311 @@
+"""Load test for the Flask routes.
+
+Runs the app (create_app()) on a local threaded WSGI server against the stub upstream (MazeMap, EventDates and the seatfinder
+website, with configurable latency and jitter) and drives mixed read/booking traffic from simulated users at increasing
+concurrency. Reports throughput and p50/p95/p99 latency per route. Results are written as JSON and can be compared across revisions.
+
+Each simulated user keeps its own session: it applies a filter first (POST /, which /map relies on) and then picks routes
+at random according to the traffic mix, without think time. Clients and server share one process, so absolute numbers
+are lower than on a production server; use the results to compare revisions and to find where latency breaks down.
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --users 1,4,16,64 --duration 20 --latency 0.05 --jitter 0.05 --output load.json
+    python benchmarks/load_test.py --users 1,4,16,64 --compare load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --users 8   # against a running server
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime as dt
+from datetime import timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+from API_calls import normalize_rooms
+from room_filters import LECTURE_ROOMS, RoomFilterIndex
+from scraper import ZONES
+from timetable import slot_grid
+from fixtures import load_fixtures, scale_fixtures
+from stub_upstream import StubUpstream
+
+# Routes and their share of the traffic (weights) unless configured with --mix
+ROUTES = {
+    'home': 'GET /',
+    'filter': 'POST /',
+    'map': 'GET /map',
+    'seatfinder': 'GET /seatfinder',
+    'book_room': 'POST /book_room',
+}
+DEFAULT_MIX = 'home=30,filter=20,map=25,seatfinder=15,book_room=10'
+
+
+def percentile(sorted_values, q):
+    """Returns the q-th percentile (0-100, nearest rank) of a sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q/100*len(sorted_values))) - 1))]
+
+
+def summarize(samples, duration):
+    """Returns request counts, errors, throughput and latency statistics (ms) of a list of (seconds, ok) samples."""
+    timings = sorted(seconds*1000 for seconds, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'rps': round(len(samples) / duration, 2) if duration else None,
+        'p50_ms': round(percentile(timings, 50), 2) if timings else None,
+        'p95_ms': round(percentile(timings, 95), 2) if timings else None,
+        'p99_ms': round(percentile(timings, 99), 2) if timings else None,
+        'mean_ms': round(statistics.mean(timings), 2) if timings else None,
+        'max_ms': round(timings[-1], 2) if timings else None,
+    }
+
+
+class VirtualUser:
+    """Simulated visitor with its own cookie session, issuing one request per call of step()."""
+
+    def __init__(self, base_url, room_nrs, dates, time_slots, mix, rng, timeout=60):
+        self.base_url = base_url
+        self.room_nrs = room_nrs
+        self.dates = dates
+        self.time_slots = time_slots
+        self.routes, self.weights = zip(*mix.items())
+        self.rng = rng
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.date = None
+
+    def request(self, route):
+        """Issues one request of the given route and returns (seconds, ok)."""
+        rng = self.rng
+        if route == 'home':
+            call = lambda: self.session.get(self.base_url + '/', timeout=self.timeout)
+        elif route == 'filter':
+            start = rng.randrange(8, 20)
+            self.date = rng.choice(self.dates)
+            data = {'filter_date': self.date, 'filter_time': f'{start:02d}:00', 'filter_end_time': f'{start + rng.choice([1, 2]):02d}:00',
+                    'filter_size': rng.choice(['', '', '40', '100']), 'start_location': rng.choice(self.room_nrs)}
+            call = lambda: self.session.post(self.base_url + '/', data=data, timeout=self.timeout)
+        elif route == 'map':
+            call = lambda: self.session.get(self.base_url + '/map', params={'room_nr': rng.choice(self.room_nrs)}, timeout=self.timeout)
+        elif route == 'seatfinder':
+            call = lambda: self.session.get(self.base_url + '/seatfinder', timeout=self.timeout)
+        elif route == 'book_room':
+            data = {'room_nr': rng.choice(self.room_nrs), 'time_slot': rng.choice(self.time_slots), 'date': self.date}
+            call = lambda: self.session.post(self.base_url + '/book_room', data=data, allow_redirects=False, timeout=self.timeout)
+        else:
+            raise ValueError(f"Unknown route: {route}")
+
+        start = time.perf_counter()
+        try:
+            response = call()
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    def step(self):
+        # The first request applies a filter, so the session holds the date used by /map and /book_room
+        route = 'filter' if self.date is None else self.rng.choices(self.routes, self.weights)[0]
+        return route, self.request(route)
+
+
+def run_level(users, duration, make_user):
+    """Runs `users` simulated users concurrently for `duration` seconds. Returns {route: [(seconds, ok), ...]} and the elapsed time."""
+    samples = {route: [] for route in ROUTES}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(i):
+        user = make_user(i)
+        while time.perf_counter() < deadline:
+            route, sample = user.step()
+            with lock:
+                samples[route].append(sample)
+        user.session.close()
+
+    threads = [threading.Thread(target=run, args=(i,), name=f'user-{i}', daemon=True) for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without the per-request access log, which would flood the output under load."""
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+def start_app(stub, args, instance_path):
+    """Creates the app with its upstreams pointed at the stub and serves it on a local threaded WSGI server. Returns (server, base URL)."""
+    from app import create_app
+
+    config = {
+        'API_TOKEN': 'load-test',
+        'SECRET_KEY': 'load-test',
+        'MAZEMAP_URL': f"{stub.base_url}/api/pois/?campusid=710&srid=900913",
+        'EVENT_API_URL': f"{stub.base_url}/eventapi",
+        'SEATFINDER_URL': f"{stub.base_url}/seatfinder/",
+        'SEATFINDER_POLL': True,
+        'SEATFINDER_INTERVAL': args.seat_interval,
+        'WARM_START': False,
+        'BOOKINGS_COMPACTION': False,
+        'HTTP_RETRIES': 0,
+    }
+    if args.schedule_ttl is not None:
+        config['SCHEDULE_TTL'] = args.schedule_ttl
+    app = create_app(config, instance_path=instance_path)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_level(result):
+    print(f"\n{result['users']} users: {result['throughput_rps']} req/s, {result['errors']} errors, {result['upstream_requests']} upstream requests", file=sys.stderr)
+    print(f"{'route':<18} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for route, stats in result['routes'].items():
+        if stats['requests']:
+            print(f"{ROUTES[route]:<18} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>8} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}", file=sys.stderr)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report):
+    """Prints the p95 latency of each route and the throughput in the baseline and the current report per number of users, and their ratio."""
+    print(f"{'users':>6} {'route':<18} {'baseline p95':>13} {'current p95':>12} {'ratio':>7} {'baseline req/s':>15} {'current req/s':>14}")
+    base_levels = {level['users']: level for level in baseline['levels']}
+    for level in report['levels']:
+        base = base_levels.get(level['users'], {'routes': {}})
+        for route, stats in level['routes'].items():
+            base_stats = base['routes'].get(route)
+            if not stats['requests']:
+                continue
+            if not base_stats or not base_stats['requests']:
+                print(f"{level['users']:>6} {ROUTES[route]:<18} {'-':>13} {stats['p95_ms']:>12} {'-':>7} {'-':>15} {stats['rps']:>14}")
+            else:
+                ratio = stats['p95_ms'] / base_stats['p95_ms'] if base_stats['p95_ms'] else float('inf')
+                print(f"{level['users']:>6} {ROUTES[route]:<18} {base_stats['p95_ms']:>13} {stats['p95_ms']:>12} {ratio:>7.2f} {base_stats['rps']:>15} {stats['rps']:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', default='1,4,16,64', help="comma-separated numbers of concurrent users, run in order (default: 1,4,16,64)")
+    parser.add_argument('--duration', type=float, default=20, help="seconds per concurrency level (default: 20)")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds of single-user traffic before the first level, not recorded (default: 5; 0 measures a cold start)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"traffic mix as route=weight pairs (routes: {', '.join(ROUTES)}; default: {DEFAULT_MIX})")
+    parser.add_argument('--latency', type=float, default=0.0, help="artificial latency of the stub upstream in seconds (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="additional uniform random latency of the stub upstream in seconds (default: 0)")
+    parser.add_argument('--scale', type=int, default=1, help="multiple of the campus size served by the stub (default: 1)")
+    parser.add_argument('--days', type=int, default=3, help="number of dates from today on that users filter for (default: 3)")
+    parser.add_argument('--schedule-ttl', type=float, help="SCHEDULE_TTL of the app in seconds, e.g., to include schedule refreshes (default: app default)")
+    parser.add_argument('--seat-interval', type=float, default=30, help="seconds between two seatfinder scrapes of the stub (default: 30)")
+    parser.add_argument('--max-p95', type=float, help="stop increasing the concurrency once the p95 latency over all routes exceeds this many ms")
+    parser.add_argument('--url', help="base URL of a running server to test instead of starting the app and the stub upstream")
+    parser.add_argument('--seed', type=int, default=710, help="random seed of the simulated users (default: 710)")
+    parser.add_argument('--output', help="path of the JSON report (default: print to stdout)")
+    parser.add_argument('--compare', help="JSON report of a previous run to compare against")
+    args = parser.parse_args()
+
+    # pandas deprecation warnings would be repeated for every request
+    warnings.simplefilter('ignore', FutureWarning)
+
+    mix = {route: float(weight) for route, weight in (pair.split('=') for pair in args.mix.split(','))}
+    unknown = set(mix) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes in --mix: {', '.join(sorted(unknown))}")
+
+    # Rooms requested by the users: the lecture rooms listed on the landing page
+    pois, events, source = load_fixtures()
+    pois, events = scale_fixtures(pois, events, args.scale)
+    rooms = normalize_rooms(pois.get('pois', [])).frame()
+    room_nrs = sorted(set(rooms.loc[RoomFilterIndex(rooms).mask(LECTURE_ROOMS), 'room_nr']))
+    today = dt.now()
+    dates = [(today + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(args.days)]
+    time_slots = [start.strftime('%H:%M') for start, _ in slot_grid()]
+
+    stub, server, instance_path = None, None, None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        rng = random.Random(args.seed)
+        seats = {zone: (rng.randrange(0, 150), rng.randrange(0, 150)) for zone in ZONES}
+        stub = StubUpstream(pois, events, seats=seats, latency=args.latency, jitter=args.jitter).start()
+        instance_path = tempfile.mkdtemp(prefix='load-test-')
+        server, base_url = start_app(stub, args, instance_path)
+
+    def make_user(i, level=0):
+        return VirtualUser(base_url, room_nrs, dates, time_slots, mix, random.Random(f'{args.seed}-{level}-{i}'))
+
+    report = {
+        'meta': {'revision': git_revision(), 'timestamp': dt.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'fixtures': source, 'scale': args.scale, 'rooms': len(room_nrs), 'mix': mix,
+                 'duration_s': args.duration, 'latency_s': args.latency, 'jitter_s': args.jitter, 'url': args.url},
+        'levels': [],
+    }
+    try:
+        if args.warmup > 0:
+            print(f"Warming up for {args.warmup}s ...", file=sys.stderr)
+            run_level(1, args.warmup, lambda i: make_user(i, level='warmup'))
+
+        for users in (int(n) for n in args.users.split(',')):
+            print(f"Running {users} users for {args.duration}s ...", file=sys.stderr)
+            upstream_before = stub.requests if stub is not None else None
+            samples, elapsed = run_level(users, args.duration, lambda i: make_user(i, level=users))
+
+            overall = summarize([sample for route_samples in samples.values() for sample in route_samples], elapsed)
+            result = {'users': users, 'elapsed_s': round(elapsed, 2), 'requests': overall['requests'], 'errors': overall['errors'],
+                      'throughput_rps': overall['rps'], 'p50_ms': overall['p50_ms'], 'p95_ms': overall['p95_ms'], 'p99_ms': overall['p99_ms'],
+                      'upstream_requests': stub.requests - upstream_before if stub is not None else None,
+                      'routes': {route: summarize(route_samples, elapsed) for route, route_samples in samples.items()}}
+            report['levels'].append(result)
+            print_level(result)
+
+            if args.max_p95 is not None and overall['p95_ms'] is not None and overall['p95_ms'] > args.max_p95:
+                print(f"p95 of {overall['p95_ms']}ms exceeds {args.max_p95}ms, stopping", file=sys.stderr)
+                break
+    finally:
+        if server is not None:
+            server.shutdown()
+        if stub is not None:
+            stub.stop()
+        if instance_path is not None:
+            shutil.rmtree(instance_path, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
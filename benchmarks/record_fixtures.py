@@ -0,0 +1,47 @@
+"""Records the MazeMap POI payload and one day of the EventDates payload as benchmark fixtures.
+
+Requires network access and a config.py with API_TOKEN in the repository root.
+
+Usage (from the repository root):
+    python benchmarks/record_fixtures.py --date 2024-10-14
+"""
+import argparse
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from API_calls import API
+from fixtures import FIXTURES_DIR, POIS_FILE, EVENTS_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--date', required=True, help="a weekday with lectures, format '%%Y-%%m-%%d'")
+    args = parser.parse_args()
+
+    from config import API_TOKEN
+    api = API(API_TOKEN)
+
+    pois = api.http.get_json(api.MAZEMAP_URL, endpoint='mazemap')
+    events = api.fetch_events(args.date)
+
+    # Replace the recorded date by a placeholder, so the events can be replayed for any date
+    for event in events:
+        event['startTime'] = event['startTime'].replace(args.date, '{date}')
+        event['endTime'] = event['endTime'].replace(args.date, '{date}')
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(POIS_FILE, 'w') as f:
+        json.dump(pois, f)
+    with open(EVENTS_FILE, 'w') as f:
+        json.dump(events, f)
+    print(f"Recorded {len(pois.get('pois', []))} POIs and {len(events)} events to {FIXTURES_DIR}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
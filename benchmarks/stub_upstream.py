@@ -0,0 +1,106 @@
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime as dt
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from fixtures import events_for_date
+
+EVENTS_PATH = re.compile(r"/eventapi/EventDates/(?:permitted/)?byStartDate/([\d-]+)/byEndDate/([\d-]+)")
+
+
+class StubUpstream:
+    """Local stand-in for the MazeMap POI API, the EventDates API and the seatfinder website.
+    Serves fixture payloads on 127.0.0.1 with an optional artificial latency (seconds, plus uniform jitter)."""
+
+    def __init__(self, pois, events, seats=None, latency=0.0, jitter=0.0, port=0):
+        self.pois_body = json.dumps(pois).encode('utf-8')
+        self.events = events
+        self.seats = seats
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._events_bodies = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def configure(self, api):
+        """Points an API instance at the stub."""
+        api.MAZEMAP_URL = f"{self.base_url}/api/pois/?campusid=710&srid=900913"
+        api.EVENT_API_URL = f"{self.base_url}/eventapi"
+        return api
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='stub-upstream', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def events_body(self, start, end):
+        with self._lock:
+            body = self._events_bodies.get((start, end))
+        if body is None:
+            payload = []
+            day = dt.strptime(start, '%Y-%m-%d')
+            while day.strftime('%Y-%m-%d') < end:
+                payload.extend(events_for_date(self.events, day.strftime('%Y-%m-%d')))
+                day += timedelta(days=1)
+            body = json.dumps(payload).encode('utf-8')
+            with self._lock:
+                self._events_bodies[(start, end)] = body
+        return body
+
+    def seats_body(self):
+        """Renders the seatfinder page with one bar graph table per zone."""
+        zones = self.seats if self.seats is not None else {}
+        # parse_seatfinder() reads the free seats from the second and the occupied seats from the seventh word of the summary
+        tables = "".join(f'<table class="seatfinder-bar-graph" summary="Free {free} seats of {free + occupied}, occupied {occupied} seats in {zone}"><tbody><tr><td></td></tr></tbody></table>'
+                         for zone, (free, occupied) in zones.items())
+        return f"<html><body>{tables}</body></html>".encode('utf-8')
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency or stub.jitter:
+                    time.sleep(stub.latency + random.random()*stub.jitter)
+
+                path = urlparse(self.path).path
+                match = EVENTS_PATH.match(path)
+                if path.startswith('/api/pois'):
+                    self._send(stub.pois_body, 'application/json')
+                elif match:
+                    self._send(stub.events_body(match.group(1), match.group(2)), 'application/json')
+                elif path.startswith('/seatfinder'):
+                    self._send(stub.seats_body(), 'text/html')
+                else:
+                    self._send(b'{}', 'application/json', status=404)
+
+            def _send(self, body, content_type, status=200):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,185 @@
+import logging
+import threading
+from datetime import datetime as dt
+from datetime import timedelta
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from cache import TTLCache
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+def configure_sqlite(engine, busy_timeout=5000):
+    """Switches the sqlite database to WAL mode and sets a busy timeout (ms) on every connection of the engine.
+    With WAL, readers don't block the writer and vice versa; concurrent writers wait for the lock instead of failing with 'database is locked'."""
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        # Safe in WAL mode (a power loss may only drop the last commits) and avoids an fsync per booking
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+
+class BookingRepository:
+    """Reads and writes booking counts of the Booking model, keyed by room_nr, date ('%Y-%m-%d') and time_slot ('%H:%M').
+    Counts are fetched with one grouped query per lookup (for one or many rooms) and kept in a small write-through cache keyed by (room_nr, date).
+    The cache TTL bounds how long bookings made by other workers may be missing."""
+
+    def __init__(self, db, model, ttl=30, retention_days=30):
+        self.db = db
+        self.model = model
+        self.retention_days = retention_days
+        self.cache = TTLCache(self._load_room, ttl=ttl, stale_ttl=0, name='bookings')
+        self._write_lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def archive_table(self):
+        return f'{self.model.__tablename__}_archive'
+
+    def migrate(self):
+        """Moves a booking table without a date column (created by earlier versions) aside as 'booking_legacy', so create_all() can create the new table.
+        The legacy counts have no date and can't be assigned to a day; they are kept for reference but no longer shown. Must run in an app context."""
+        table = self.model.__tablename__
+        inspector = inspect(self.db.engine)
+        if not inspector.has_table(table) or 'date' in {column['name'] for column in inspector.get_columns(table)}:
+            return
+        indexes = [index['name'] for index in inspector.get_indexes(table)]
+        with self.db.engine.begin() as con:
+            con.execute(text(f'DROP TABLE IF EXISTS {table}_legacy'))
+            con.execute(text(f'ALTER TABLE {table} RENAME TO {table}_legacy'))
+            # Indexes keep their names when the table is renamed, so drop them to let create_all() recreate them on the new table
+            for name in indexes:
+                con.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+    @timed('bookings.query_counts')
+    def _query_counts(self, room_nrs, date):
+        """Returns {room_nr: {time_slot: count}} for the given rooms on a date in a single grouped query."""
+        Booking = self.model
+        rows = (self.db.session.query(Booking.room_nr, Booking.time_slot, func.sum(Booking.booking_count))
+                .filter(Booking.date == date, Booking.room_nr.in_(room_nrs))
+                .group_by(Booking.room_nr, Booking.time_slot)
+                .all())
+        counts = {room_nr: {} for room_nr in room_nrs}
+        for room_nr, time_slot, count in rows:
+            counts[room_nr][time_slot] = int(count or 0)
+        return counts
+
+    def _load_room(self, room_nr, date):
+        return self._query_counts([room_nr], date)[room_nr]
+
+    def counts_for_room(self, room_nr, date):
+        """Returns a dict mapping time slots ('%H:%M') to the number of bookings of the specified room on a date."""
+        return self.cache.get(room_nr, date)
+
+    def counts_for_rooms(self, room_nrs, date):
+        """Returns {room_nr: {time_slot: count}} for a set of rooms on a date; rooms not in the cache are fetched with a single query."""
+        room_nrs = list(dict.fromkeys(room_nrs))
+        counts, missing = {}, []
+        for room_nr in room_nrs:
+            if self.cache.is_fresh(room_nr, date):
+                counts[room_nr] = self.cache.peek(room_nr, date)
+            else:
+                missing.append(room_nr)
+        if missing:
+            for room_nr, room_counts in self._query_counts(missing, date).items():
+                self.cache.set(room_nr, date, value=room_counts)
+                counts[room_nr] = room_counts
+        return counts
+
+    def totals_for_rooms(self, room_nrs, date):
+        """Returns {room_nr: total number of bookings} for a set of rooms on a date, e.g., for a "most-booked rooms" overlay."""
+        return {room_nr: sum(room_counts.values()) for room_nr, room_counts in self.counts_for_rooms(room_nrs, date).items()}
+
+    @timed('bookings.increment')
+    def increment(self, room_nr, date, time_slot):
+        """Adds one booking for the specified room, date and time slot and returns the new count.
+        The counter is updated with a single INSERT ... ON CONFLICT DO UPDATE (SQLite >= 3.24), so concurrent bookings neither get lost nor create duplicate rows.
+        The new count is returned by the same statement (RETURNING, SQLite >= 3.35) or, on older SQLite versions, read back within the same transaction."""
+        Booking = self.model
+        statement = (sqlite_insert(Booking)
+                     .values(room_nr=room_nr, date=date, time_slot=time_slot, booking_count=1)
+                     .on_conflict_do_update(index_elements=['room_nr', 'date', 'time_slot'],
+                                            set_={'booking_count': Booking.booking_count + 1}))
+        if self.db.engine.dialect.insert_returning:
+            count = self.db.session.execute(statement.returning(Booking.booking_count)).scalar_one()
+        else:
+            # The upsert holds the database's write lock until the commit, so no other booking can change the count in between
+            self.db.session.execute(statement)
+            count = (self.db.session.query(Booking.booking_count)
+                     .filter(Booking.room_nr == room_nr, Booking.date == date, Booking.time_slot == time_slot)
+                     .scalar())
+        self.db.session.commit()
+
+        # Write-through: keep a cached entry of the room in sync instead of dropping it
+        # Concurrent increments may get here in any order; counts only grow, so the larger one is the newer
+        with self._write_lock:
+            cached = self.cache.peek(room_nr, date)
+            if cached is not None:
+                updated = dict(cached)
+                updated[time_slot] = max(cached.get(time_slot, 0), count)
+                self.cache.set(room_nr, date, value=updated, loaded_at=self.cache.loaded_at(room_nr, date))
+        return count
+
+    def window(self, today=None):
+        """Returns the first and last date ('%Y-%m-%d') that can be booked: `retention_days` before and after today."""
+        today = today or dt.now()
+        return ((today - timedelta(days=self.retention_days)).strftime('%Y-%m-%d'),
+                (today + timedelta(days=self.retention_days)).strftime('%Y-%m-%d'))
+
+    @timed('bookings.compact')
+    def compact(self, today=None, archive=True, vacuum=True):
+        """Removes the bookings of all days before the booking window in one bulk delete and returns the number of removed rows.
+        With `archive`, the removed counts are first added to the archive table (one row per room, date and slot).
+        Afterwards the query planner statistics are updated (ANALYZE) and, if rows were removed and `vacuum` is set, the file is compacted (VACUUM).
+        Must run in an app context."""
+        table = self.model.__tablename__
+        cutoff, _ = self.window(today)
+        with self.db.engine.begin() as con:
+            if archive:
+                con.execute(text(f"""CREATE TABLE IF NOT EXISTS {self.archive_table} (
+                                         date TEXT NOT NULL, room_nr TEXT NOT NULL, time_slot TEXT NOT NULL, booking_count INTEGER NOT NULL,
+                                         PRIMARY KEY (date, room_nr, time_slot)) WITHOUT ROWID"""))
+                con.execute(text(f"""INSERT INTO {self.archive_table} (date, room_nr, time_slot, booking_count)
+                                     SELECT date, room_nr, time_slot, booking_count FROM {table} WHERE date < :cutoff
+                                     ON CONFLICT (date, room_nr, time_slot) DO UPDATE SET booking_count = booking_count + excluded.booking_count"""),
+                            {'cutoff': cutoff})
+            removed = con.execute(text(f"DELETE FROM {table} WHERE date < :cutoff"), {'cutoff': cutoff}).rowcount
+
+        # Drop cached counts of expired days, the cache would otherwise grow with every date ever shown
+        for key in self.cache.keys():
+            if key[1] < cutoff:
+                self.cache.invalidate(*key)
+
+        # VACUUM can't run inside a transaction
+        with self.db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as con:
+            con.execute(text(f'ANALYZE {table}'))
+            if removed and vacuum:
+                con.execute(text('VACUUM'))
+        return removed
+
+    def start_compaction(self, app, interval=24*60*60, **kwargs):
+        """Runs compact() once now and then every `interval` seconds in a daemon thread (within an app context of `app`)."""
+        def tick():
+            try:
+                with app.app_context():
+                    removed = self.compact(**kwargs)
+                if removed:
+                    logger.info("Compacted bookings: removed %d expired rows", removed)
+            except Exception as e:
+                logger.exception("Booking compaction failed: %s", e)
+            self._timer = threading.Timer(interval, tick)
+            self._timer.daemon = True
+            self._timer.start()
+
+        self._timer = threading.Timer(0, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_compaction(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
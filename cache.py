@@ -0,0 +1,157 @@
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe, process-wide cache for values produced by a loader function.
+    Entries are keyed by the arguments passed to get() and are considered fresh for `ttl` seconds.
+    After that, the stale value is still served for up to `stale_ttl` seconds while a background thread reloads it (stale-while-revalidate).
+    With `max_entries`, the least recently used entries are evicted once the cache holds more keys."""
+
+    def __init__(self, loader, ttl, stale_ttl=None, name=None, max_entries=None):
+        self.loader = loader
+        self.ttl = ttl
+        # By default, serve stale entries for as long again as the TTL before blocking on a reload
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.name = name or getattr(loader, '__name__', 'cache')
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (value, loaded_at, version), least recently used first
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._timer = None
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, *key):
+        """Returns the cached value for `key`, loading it if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self.max_entries is not None:
+                self._touch(key)
+            age = time.time() - entry[1]
+            if age < self.ttl:
+                self.hits += 1
+                return entry[0]
+            if age < self.ttl + self.stale_ttl:
+                # Serve stale value and trigger a reload in the background
+                self.stale_hits += 1
+                self._refresh_async(key)
+                return entry[0]
+
+        self.misses += 1
+        return self.refresh(*key, fallback=entry)
+
+    def refresh(self, *key, fallback=None):
+        """Loads the value for `key` synchronously and stores it. If loading fails and an older value exists, the older value is returned."""
+        with self._key_lock(key):
+            # Another thread may have loaded the value while we waited for the lock
+            entry = self._entries.get(key)
+            if entry is not None and entry is not fallback and time.time() - entry[1] < self.ttl:
+                return entry[0]
+            try:
+                value = self.loader(*key)
+            except Exception:
+                if entry is not None:
+                    return entry[0]
+                raise
+            self.set(*key, value=value)
+            return value
+
+    def set(self, *key, value, loaded_at=None):
+        """Stores `value` for `key`, e.g., to prime the cache from a snapshot."""
+        with self._lock:
+            self.version += 1
+            self._entries[key] = (value, time.time() if loaded_at is None else loaded_at, self.version)
+            self._entries.move_to_end(key)
+            while self.max_entries is not None and len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+                self.evictions += 1
+
+    def _touch(self, key):
+        """Marks `key` as most recently used."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def peek(self, *key):
+        """Returns the cached value for `key` regardless of its age, or None if there is none. Never triggers a load."""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def loaded_at(self, *key):
+        """Returns the timestamp at which the value for `key` was loaded, or None."""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def is_fresh(self, *key):
+        """Returns True if a value for `key` is cached and younger than the TTL."""
+        entry = self._entries.get(key)
+        return entry is not None and time.time() - entry[1] < self.ttl
+
+    def invalidate(self, *key):
+        """Drops the entry for `key`, or all entries if no key is given."""
+        with self._lock:
+            if key:
+                self._entries.pop(key, None)
+                self._key_locks.pop(key, None)
+            else:
+                self._entries.clear()
+                self._key_locks.clear()
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def _refresh_async(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.refresh(*key, fallback=self._entries.get(key))
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", self.name, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"{self.name}-refresh", daemon=True).start()
+
+    def start_background_refresh(self, interval=None, keys=None):
+        """Periodically reloads cached keys in a daemon thread, so requests rarely see an expired entry.
+        `keys` is a callable returning the keys to reload on each tick (default: all cached keys)."""
+        interval = self.ttl if interval is None else interval
+        keys = keys or self.keys
+
+        def tick():
+            for key in keys():
+                try:
+                    self.refresh(*key, fallback=self._entries.get(key))
+                except Exception as e:
+                    logger.warning("Background refresh of %s failed: %s", self.name, e)
+            self._timer = threading.Timer(interval, tick)
+            self._timer.daemon = True
+            self._timer.start()
+
+        self._timer = threading.Timer(interval, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_background_refresh(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
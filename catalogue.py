@@ -0,0 +1,157 @@
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+# Room numbers (pattern: xx-xxx(x)) are extracted from the POI title
+ROOM_NR_PATTERN = re.compile(r"(?<!\w)(\d{2}-\d{3,4})\b")
+
+# Columns of the dataframe returned by RoomCatalogue.frame() (and API.get_rooms())
+FRAME_COLUMNS = ['poiId', 'room_nr', 'title', 'name', 'buildingName', 'floorName', 'infoUrlText', 'seats', 'x', 'y', 'z']
+
+# POI fields only needed for single rooms; they are kept serialized per room and decoded on demand (see details())
+HEAVY_FIELDS = ['description', 'infoUrl', 'geometry', 'images']
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class RoomCatalogue:
+    """Compact, array-backed room catalogue built from the MazeMap POIs.
+    Rooms are stored column-wise: integer POI ids, interned strings (room numbers, types and floors), building codes into a list of building names,
+    float32 seats and float32 coordinates relative to the catalogue's origin (MazeMap coordinates are in the order of 1e6, where float32 would lose precision).
+    Heavy fields (description, geometry, ...) are kept as serialized JSON per room and only decoded by details()."""
+
+    __slots__ = ('poi_ids', 'room_nrs', 'titles', 'names', 'info_url_texts', 'floors', 'buildings', 'building_codes',
+                 'seats', 'origin', 'coords', 'index', 'created_at', '_heavy', '_frame', '_digest', '_lock')
+
+    def __init__(self, pois):
+        poi_ids, room_nrs, titles, names, info_url_texts, floors, building_codes, seats, points, heavy = [], [], [], [], [], [], [], [], [], []
+        buildings = {}
+        for poi in pois:
+            title = poi.get('title')
+            match = ROOM_NR_PATTERN.search(title) if isinstance(title, str) else None
+            if match is None:
+                # Exclude rooms that don't fit room_nr pattern
+                continue
+
+            # Only the first entry of the 'types' list is used
+            types = poi.get('types') or [{}]
+            point = (poi.get('point') or {}).get('coordinates')
+            if not (isinstance(point, (list, tuple)) and len(point) == 2):
+                point = (np.nan, np.nan)
+            capacity = poi.get('peopleCapacity')
+            z = poi.get('z')
+
+            poi_ids.append(poi.get('poiId', -1))
+            room_nrs.append(sys.intern(match.group(1)))
+            titles.append(title)
+            names.append(_intern(types[0].get('name')))
+            info_url_texts.append(_intern(poi.get('infoUrlText')))
+            floors.append(_intern(poi.get('floorName')))
+            building_codes.append(buildings.setdefault(_intern(poi.get('buildingName')), len(buildings)))
+            seats.append(np.nan if capacity is None else capacity)
+            points.append((point[0], point[1], np.nan if z is None else z))
+            heavy.append(json.dumps({field: poi.get(field) for field in HEAVY_FIELDS}, separators=(',', ':')).encode('utf-8'))
+
+        self.poi_ids = np.array(poi_ids, dtype=np.int64)
+        self.room_nrs = np.array(room_nrs, dtype=object)
+        self.titles = np.array(titles, dtype=object)
+        self.names = np.array(names, dtype=object)
+        self.info_url_texts = np.array(info_url_texts, dtype=object)
+        self.floors = np.array(floors, dtype=object)
+        self.buildings = np.array(list(buildings), dtype=object)
+        self.building_codes = np.array(building_codes, dtype=np.int16 if len(buildings) < 2**15 else np.int32)
+        self.seats = np.array(seats, dtype=np.float32)
+
+        # Coordinates are stored relative to the first valid point, so float32 keeps centimeter precision
+        points = np.array(points, dtype=np.float64).reshape(-1, 3)
+        valid = ~np.isnan(points).any(axis=1)
+        self.origin = points[np.argmax(valid)].copy() if valid.any() else np.zeros(3)
+        self.origin[2] = 0
+        self.coords = (points - self.origin).astype(np.float32)
+
+        # Row of the first entry of each room_nr (some rooms have multiple IDs)
+        self.index = {}
+        for i, room_nr in enumerate(self.room_nrs):
+            self.index.setdefault(room_nr, i)
+
+        self.created_at = time.time()
+        self._heavy = heavy
+        self._frame = None
+        self._digest = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Pickled for the warm-start snapshot (see warm_start.py); the dataframe view and the lock are recreated on load
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ('_frame', '_lock')}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.room_nrs)
+
+    def __contains__(self, room_nr):
+        return room_nr in self.index
+
+    def frame(self):
+        """Returns the catalogue as a dataframe with the columns in FRAME_COLUMNS, built once and shared, so it must not be modified in place."""
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    self._frame = pd.DataFrame({
+                        'poiId': self.poi_ids,
+                        'room_nr': self.room_nrs,
+                        'title': self.titles,
+                        'name': self.names,
+                        'buildingName': self.buildings[self.building_codes] if len(self) else np.empty(0, dtype=object),
+                        'floorName': self.floors,
+                        'infoUrlText': self.info_url_texts,
+                        'seats': self.seats,
+                        'x': self.coords[:, 0],
+                        'y': self.coords[:, 1],
+                        'z': self.coords[:, 2],
+                    }, columns=FRAME_COLUMNS)
+        return self._frame
+
+    @property
+    def digest(self):
+        """Content hash of the catalogue, e.g., for ETags; equal for catalogues built from the same rooms."""
+        if self._digest is None:
+            h = hashlib.sha1(self.poi_ids.tobytes())
+            for column in (self.room_nrs, self.titles, self.names, self.info_url_texts, self.floors, self.buildings[self.building_codes] if len(self) else []):
+                h.update('\x1f'.join(map(str, column)).encode('utf-8'))
+            h.update(self.seats.tobytes())
+            h.update(self.origin.tobytes())
+            h.update(self.coords.tobytes())
+            for heavy in self._heavy:
+                h.update(heavy)
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def row(self, room_nr):
+        """Returns the catalogue row of the specified room (first entry for rooms with multiple IDs), or None."""
+        return self.index.get(room_nr)
+
+    def poi_id(self, room_nr):
+        i = self.row(room_nr)
+        return int(self.poi_ids[i]) if i is not None else None
+
+    def details(self, room_nr):
+        """Returns a dict with all fields of the specified room, including the heavy fields (see HEAVY_FIELDS), or None for unknown rooms."""
+        i = self.row(room_nr)
+        if i is None:
+            return None
+        details = {column: self.frame()[column].iat[i] for column in FRAME_COLUMNS}
+        details.update(json.loads(self._heavy[i]))
+        return details
@@ -0,0 +1,4 @@
+# Copy this file to config.py and fill in your own values (config.py is not committed)
+API_TOKEN = ''       # API key access token for the API of the University of St.Gallen (not shareable)
+SECRET_KEY = ''      # A random encryption key for the flask session cache, e.g., secrets.token_hex()
+DRIVER_PATH = ''     # Path to the browser-driver used by Selenium; leave empty to look up `chromedriver` on the PATH
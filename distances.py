@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class DistanceMatrix:
+    """Precomputed pairwise euclidean distances between all rooms of a room catalogue (dataframe returned by get_rooms(), usually filtered), keyed by room_nr.
+    Height differences are weighted by `z_scale`, as floors are further apart than their z values suggest.
+    For catalogues larger than `max_rooms`, the quadratic matrix isn't stored and rows are computed on demand instead."""
+
+    def __init__(self, rooms_df, z_scale=5, max_rooms=4000):
+        # Keep the first entry for rooms with multiple IDs
+        rooms_df = rooms_df.drop_duplicates(subset='room_nr')
+        self.room_nrs = rooms_df['room_nr'].to_numpy()
+        self.index = {room_nr: i for i, room_nr in enumerate(self.room_nrs)}
+
+        # Points as (x, y, z * z_scale); rooms without coordinates get NaN distances
+        xy = rooms_df[['x', 'y']].to_numpy(dtype=np.float64)
+        z = rooms_df['z'].to_numpy(dtype=np.float64) * z_scale
+        self.points = np.column_stack([xy, z])
+
+        # Differences are computed in float64, distances are stored as float32
+        self.matrix = None
+        if len(self.points) <= max_rooms:
+            diff = self.points[:, None, :] - self.points[None, :, :]
+            self.matrix = np.sqrt((diff**2).sum(axis=-1)).astype(np.float32)
+
+    def __contains__(self, room_nr):
+        return room_nr in self.index
+
+    def row(self, i):
+        """Returns the distances from the room at index i to all rooms."""
+        if self.matrix is not None:
+            return self.matrix[i]
+        diff = self.points - self.points[i]
+        return np.sqrt((diff**2).sum(axis=-1)).astype(np.float32)
+
+    def indices(self, room_nrs):
+        """Returns the matrix indices of the given rooms (-1 for unknown rooms)."""
+        return np.fromiter((self.index.get(room_nr, -1) for room_nr in room_nrs), dtype=np.int64, count=len(room_nrs))
+
+    def distances_from(self, origin, room_nrs):
+        """Returns an array of distances from room `origin` to each of the given rooms (NaN for unknown rooms)."""
+        idx = self.indices(room_nrs)
+        known = idx >= 0
+        distances = np.full(len(idx), np.nan, dtype=np.float32)
+        if origin in self.index:
+            distances[known] = self.row(self.index[origin])[idx[known]]
+        return distances
+
+    def sort_by_distance(self, rooms_df, origin):
+        """Returns a copy of rooms_df with an additional 'distance' column, sorted by distance from room `origin`."""
+        rooms_df = rooms_df.copy()
+        distances = self.distances_from(origin, rooms_df['room_nr'])
+        rooms_df['distance'] = distances
+        return rooms_df.iloc[np.argsort(distances, kind='stable')]
+
+    def nearest(self, origin, k=5, candidates=None):
+        """Returns a list of (room_nr, distance) tuples for the k rooms closest to room `origin`, optionally restricted to `candidates`. The origin itself is excluded."""
+        if origin not in self.index:
+            return []
+        row = self.row(self.index[origin])
+        if candidates is None:
+            idx = np.arange(len(self.room_nrs))
+        else:
+            idx = self.indices(list(candidates))
+            idx = np.unique(idx[idx >= 0])
+        idx = idx[(idx != self.index[origin]) & ~np.isnan(row[idx])]
+        if len(idx) > k:
+            idx = idx[np.argpartition(row[idx], k)[:k]]
+        idx = idx[np.argsort(row[idx], kind='stable')]
+        return [(self.room_nrs[i], float(row[i])) for i in idx]
@@ -0,0 +1,66 @@
+import numpy as np
+from occupancy import DAY, to_seconds
+
+
+class FreeSlotSnapshot:
+    """Occupancy of all rooms of the catalogue on one date, materialized per time slot (15 minutes by default).
+    For every slot, the rooms occupied at any time within the slot are stored as a bitset over the catalogue rows (one bit per row).
+    A window query ORs the bitsets of the slots it overlaps; only rooms whose events touch a partially covered slot at the edges are checked exactly in the OccupancyIndex."""
+
+    def __init__(self, rooms, index, slot_minutes=15, catalogue_version=None):
+        self.rooms = rooms
+        self.room_nrs = rooms['room_nr'].to_numpy()
+        self.index = index
+        self.slot = slot_minutes*60
+        self.n_slots = -(-DAY // self.slot)
+        self.catalogue_version = catalogue_version
+
+        codes = index.keys // DAY
+        starts, ends = index.starts, index.ends
+        n_codes = len(index.room_codes)
+
+        # Events ending before they start (e.g., past midnight) don't cover a contiguous range of slots, their rooms are always checked exactly
+        regular = ends > starts
+        irregular_codes = np.zeros(n_codes + 1, dtype=bool)
+        irregular_codes[codes[~regular]] = True
+
+        # Mark the slots covered by each event with +1 at its first and -1 after its last slot, then accumulate along the slots
+        first = starts[regular] // self.slot
+        last = (ends[regular] - 1) // self.slot
+        coverage = np.zeros((self.n_slots + 1, n_codes + 1), dtype=np.int32)
+        np.add.at(coverage, (first, codes[regular]), 1)
+        np.add.at(coverage, (last + 1, codes[regular]), -1)
+        covered = np.cumsum(coverage, axis=0)[:self.n_slots] > 0
+
+        # Columns per catalogue row; rooms without events map to the extra all-free column
+        row_codes = index.codes_for(self.room_nrs)
+        row_codes[row_codes < 0] = n_codes
+        self.bits = np.packbits(covered[:, row_codes], axis=1)
+        self.irregular = irregular_codes[row_codes]
+
+    def __len__(self):
+        return len(self.room_nrs)
+
+    def _union(self, first, last):
+        """Returns a boolean array over the catalogue rows of the rooms occupied in any of the slots first..last."""
+        if last < first:
+            return np.zeros(len(self), dtype=bool)
+        bits = np.bitwise_or.reduce(self.bits[first:last + 1], axis=0)
+        return np.unpackbits(bits, count=len(self)).astype(bool)
+
+    def occupied_mask(self, start, end=None):
+        """Returns a boolean array indicating for each row of the catalogue whether the room is occupied at any time within [start, end).
+        Same semantics as OccupancyIndex.occupied_mask() with the room_nr column of the catalogue."""
+        start_s = to_seconds(start)
+        end_s = start_s + 1 if end is None else to_seconds(end)
+        if end_s <= start_s:
+            # Inverted windows don't map to a range of slots
+            return self.index.occupied_mask(self.room_nrs, start, end)
+
+        # An event in a slot fully covered by the window overlaps the window; one in an edge slot may or may not
+        touched = self._union(start_s // self.slot, (end_s - 1) // self.slot)
+        occupied = self._union(-(-start_s // self.slot), end_s // self.slot - 1)
+        uncertain = (touched | self.irregular) & ~occupied
+        if uncertain.any():
+            occupied[uncertain] = self.index.occupied_mask(self.room_nrs[uncertain], start, end)
+        return occupied
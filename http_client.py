@@ -0,0 +1,196 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+
+
+##### ERRORS ###############################################################################
+
+class APIError(Exception):
+    """Base class for errors raised when calling one of the upstream APIs."""
+
+    def __init__(self, endpoint, message):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+
+
+class UpstreamHTTPError(APIError):
+    """The upstream API answered with an error status code."""
+
+    def __init__(self, endpoint, status_code):
+        super().__init__(endpoint, f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(APIError):
+    """The upstream API could not be reached (timeout, connection error or retries exhausted)."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """Calls to the upstream API are suspended after repeated failures."""
+
+
+##### CIRCUIT BREAKER ######################################################################
+
+class CircuitBreaker:
+    """Stops calling an endpoint after `failure_threshold` consecutive failures. After `reset_timeout` seconds, a single trial call is let through."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Returns True if a call may be made."""
+        with self._lock:
+            state = self.state
+            if state == 'half-open':
+                # Let one trial call through and re-open the circuit until it reports back
+                self.opened_at = time.time()
+                return True
+            return state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+
+
+##### RETRIES ##############################################################################
+
+class DeadlineRetry(Retry):
+    """Retry policy that gives up once the deadline of the current request has passed; backoff and Retry-After waits are cut short at the deadline.
+    urllib3 retries within the calling thread, so HTTPClient.get() sets the deadline per thread in `deadlines` (a threading.local)."""
+
+    def __init__(self, *args, deadlines=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deadlines = deadlines
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.deadlines = self.deadlines
+        return retry
+
+    def remaining(self):
+        """Returns the seconds left until the deadline of the current request, or None without a deadline."""
+        deadline = getattr(self.deadlines, 'value', None)
+        return None if deadline is None else deadline - time.monotonic()
+
+    def increment(self, *args, **kwargs):
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            # No attempts left: raises MaxRetryError (or returns the last response if raise_on_status is False)
+            return super(DeadlineRetry, self.new(total=0)).increment(*args, **kwargs)
+        return super().increment(*args, **kwargs)
+
+    def sleep(self, response=None):
+        wait = self.get_retry_after(response) if self.respect_retry_after_header and response else None
+        if wait is None:
+            wait = self.get_backoff_time()
+        remaining = self.remaining()
+        if remaining is not None:
+            wait = min(wait, max(remaining, 0))
+        if wait > 0:
+            time.sleep(wait)
+
+
+##### HTTP CLIENT ##########################################################################
+
+# Default (connect, read) timeouts in seconds per endpoint
+DEFAULT_TIMEOUTS = {
+    'mazemap': (3.05, 15),
+    'events': (3.05, 20),
+    'rooms': (3.05, 20),
+    'default': (3.05, 10),
+}
+
+
+class HTTPClient:
+    """Pooled HTTP session shared by all API calls, with per-endpoint timeouts, bounded exponential-backoff retries and a circuit breaker per endpoint.
+    No retry is started once `deadline` seconds have passed since the first attempt, so a call takes at most about `deadline` plus one attempt's timeouts."""
+
+    def __init__(self, pool_size=10, retries=3, backoff_factor=0.5, timeouts=None, failure_threshold=5, reset_timeout=30, deadline=10):
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.deadline = deadline
+        self.breakers = {}
+        self._lock = threading.Lock()
+        self._deadlines = threading.local()
+
+        # Retry idempotent requests on connection errors and transient status codes, waiting backoff_factor * 2^n seconds in between
+        # Read timeouts aren't retried: a slow upstream is unlikely to answer faster on the next attempt
+        retry = DeadlineRetry(total=retries, connect=retries, read=0, status=retries, backoff_factor=backoff_factor,
+                              status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET']), raise_on_status=False,
+                              deadlines=self._deadlines)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def breaker(self, endpoint):
+        with self._lock:
+            return self.breakers.setdefault(endpoint, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+
+    def get(self, url, endpoint='default', headers=None):
+        """Sends a GET request and returns the response. Raises an APIError if the request fails."""
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            UPSTREAM_REQUESTS.inc(endpoint=endpoint, outcome='circuit_open')
+            raise CircuitOpenError(endpoint, "circuit open after repeated failures")
+
+        start = time.perf_counter()
+        self._deadlines.value = None if self.deadline is None else time.monotonic() + self.deadline
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeouts.get(endpoint, self.timeouts['default']))
+        except requests.RequestException as e:
+            breaker.record_failure()
+            self._record(endpoint, 'unavailable', start)
+            raise UpstreamUnavailable(endpoint, str(e)) from e
+        finally:
+            self._deadlines.value = None
+
+        if not response.ok:
+            # Only server-side errors count towards opening the circuit
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            self._record(endpoint, 'http_error', start)
+            raise UpstreamHTTPError(endpoint, response.status_code)
+
+        breaker.record_success()
+        self._record(endpoint, 'ok', start)
+        return response
+
+    @staticmethod
+    def _record(endpoint, outcome, start):
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, outcome=outcome)
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, outcome=outcome)
+
+    def get_json(self, url, endpoint='default', headers=None):
+        """Sends a GET request and returns the decoded JSON body. Raises an APIError if the request fails or the body isn't valid JSON."""
+        response = self.get(url, endpoint=endpoint, headers=headers)
+        try:
+            return response.json()
+        except ValueError as e:
+            UPSTREAM_REQUESTS.inc(endpoint=endpoint, outcome='invalid')
+            raise APIError(endpoint, "invalid JSON in response") from e
@@ -0,0 +1,166 @@
+from datetime import datetime as dt
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Queue of server-sent event messages for one connected client."""
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False # Set if the client fell too far behind; it should reconnect to get a fresh snapshot
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.closed = True
+
+
+class LiveFeed:
+    """Single shared producer for the server-sent event stream (see route: /stream).
+    One daemon thread checks the seat snapshot and the occupancy of the (filtered) rooms once per minute, or right away when the poller publishes new seats,
+    and broadcasts only the changes. Messages are serialized once and shared by all subscribers, so N clients cost one computation rather than N."""
+
+    def __init__(self, api, seat_poller, interval=60, heartbeat=15, max_queue=100):
+        self.api = api
+        self.seat_poller = seat_poller
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_queue = max_queue
+        self.subscribers = set()
+        self._seats = None        # zone -> (free, occupied, total) of the last broadcast
+        self._seats_at = None
+        self._free = None         # (date, set of free room_nrs) of the last broadcast
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        # New scrapes are pushed right away instead of at the next tick
+        seat_poller.listeners.append(lambda seatfinder_df, scraped_at: self._wake.set())
+
+    ##### SUBSCRIBERS #####################################################################
+
+    def subscribe(self):
+        """Registers a client and returns its Subscription, primed with a full snapshot of seats and rooms."""
+        self.start()
+        subscription = Subscription(self.max_queue)
+        with self._lock:
+            for message in self._snapshot_messages():
+                subscription.put(message)
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def stream(self, subscription):
+        """Generator of server-sent event messages for a subscription; sends a comment as heartbeat when idle."""
+        try:
+            while not subscription.closed:
+                try:
+                    yield subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+    def _message(self, event, data):
+        return f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def _broadcast(self, event, data):
+        message = self._message(event, data)
+        with self._lock:
+            for subscription in list(self.subscribers):
+                subscription.put(message)
+                if subscription.closed:
+                    self.subscribers.discard(subscription)
+
+    def _snapshot_messages(self):
+        """Messages with the full current state, sent to new subscribers (caller holds the lock)."""
+        messages = []
+        if self._seats is not None:
+            messages.append(self._message('seats', self._seats_data(self._seats, self._seats_at, snapshot=True)))
+        if self._free is not None:
+            date, free = self._free
+            messages.append(self._message('rooms', {'date': date, 'time': dt.now().strftime('%H:%M'), 'snapshot': True,
+                                                    'freed': sorted(free), 'occupied': []}))
+        return messages
+
+    ##### PRODUCER ########################################################################
+
+    def start(self):
+        """Starts the producer thread (once); it runs the first check right away."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.tick()
+            # Wake up at the next full minute (room transitions) or when new seats were scraped
+            self._wake.wait(self.interval - time.time() % self.interval)
+            self._wake.clear()
+
+    def tick(self):
+        """Checks seats and rooms once and broadcasts what changed since the last tick."""
+        try:
+            self._check_seats()
+        except Exception as e:
+            logger.exception("Live feed seat update failed: %s", e)
+        try:
+            self._check_rooms()
+        except Exception as e:
+            logger.exception("Live feed room update failed: %s", e)
+
+    @staticmethod
+    def _seats_data(seats, scraped_at, snapshot=False):
+        return {'scraped_at': None if scraped_at is None else dt.fromtimestamp(scraped_at).isoformat(timespec='seconds'), 'snapshot': snapshot,
+                'zones': {zone: {'free': free, 'occupied': occupied, 'total': total} for zone, (free, occupied, total) in seats.items()}}
+
+    def _check_seats(self):
+        seatfinder_df, scraped_at = self.seat_poller.latest_snapshot()
+        # Nothing is broadcast until the website was scraped successfully (scraped_at is None for the placeholder dataframe)
+        if scraped_at is None or scraped_at == self._seats_at:
+            return
+
+        def count(value):
+            return None if value == '-' or pd.isna(value) else int(value)
+
+        seats = {zone: (count(row['free']), count(row['occupied']), count(row['total'])) for zone, row in seatfinder_df.iterrows()}
+        previous = self._seats or {}
+        changed = {zone: value for zone, value in seats.items() if previous.get(zone) != value}
+        with self._lock:
+            self._seats, self._seats_at = seats, scraped_at
+        if changed:
+            self._broadcast('seats', self._seats_data(changed, scraped_at, snapshot=not previous))
+
+    def _check_rooms(self):
+        now = dt.now()
+        date = now.strftime('%Y-%m-%d')
+        snapshot = self.api.get_free_slots(date)
+
+        # Only lecture rooms shown on the landing page (see filter_rooms())
+        shown = self.api.room_mask(snapshot.rooms)
+        occupied = snapshot.occupied_mask(now.time().replace(second=0, microsecond=0))
+        free = set(snapshot.room_nrs[shown & ~occupied])
+
+        previous_date, previous = self._free if self._free is not None else (None, None)
+        with self._lock:
+            self._free = (date, free)
+        if previous is None or previous_date != date:
+            self._broadcast('rooms', {'date': date, 'time': now.strftime('%H:%M'), 'snapshot': True, 'freed': sorted(free), 'occupied': []})
+        elif free != previous:
+            self._broadcast('rooms', {'date': date, 'time': now.strftime('%H:%M'), 'snapshot': False,
+                                      'freed': sorted(free - previous), 'occupied': sorted(previous - free)})
@@ -0,0 +1,202 @@
+from contextlib import contextmanager
+import functools
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Distribution of observed values (e.g., durations in seconds) in cumulative buckets per combination of label values."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._values = {} # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0]*len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    samples.append((self.name + '_bucket', _labels(self.labels, key, [('le', _number(bound))]), cumulative))
+                samples.append((self.name + '_sum', _labels(self.labels, key), total))
+                samples.append((self.name + '_count', _labels(self.labels, key), count))
+        return samples
+
+
+class Collected:
+    """Metric whose samples are read from a callback at scrape time, e.g., the hit counters of a cache.
+    The callback returns a list of (label values, value) tuples."""
+
+    def __init__(self, name, help, type, labels, callback):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def samples(self):
+        return [(self.name, _labels(self.labels, key), value) for key, value in self.callback()]
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text exposition format (see route: /metrics)."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collect(self, name, help, type, labels, callback):
+        """Registers (or replaces) a metric read from `callback` at scrape time."""
+        metric = Collected(name, help, type, labels, callback)
+        with self._lock:
+            self.metrics[name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.exception("Collecting metric %s failed: %s", metric.name, e)
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the metrics shared by all modules
+REGISTRY = Registry()
+SPANS = REGISTRY.histogram('app_span_seconds', 'Duration of instrumented code spans (API methods, DB queries, template rendering).', labels=('span',))
+UPSTREAM_SECONDS = REGISTRY.histogram('upstream_request_seconds', 'Duration of upstream HTTP requests, including retries.', labels=('endpoint', 'outcome'))
+UPSTREAM_REQUESTS = REGISTRY.counter('upstream_requests_total', 'Upstream HTTP requests by outcome (ok, http_error, unavailable, circuit_open, invalid).', labels=('endpoint', 'outcome'))
+CACHES = {} # name -> cache with hits/misses (and stale_hits) counters, see register_cache()
+REGISTRY.collect('cache_requests_total', 'Cache lookups by result.', 'counter', ('cache', 'result'),
+                 lambda: [((name, result), getattr(cache, attr)) for name, cache in sorted(CACHES.items())
+                          for result, attr in (('hit', 'hits'), ('stale', 'stale_hits'), ('miss', 'misses')) if hasattr(cache, attr)])
+
+
+@contextmanager
+def span(name):
+    """Records the duration of the enclosed block in the span histogram under `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPANS.observe(time.perf_counter() - start, span=name)
+
+
+def timed(name=None):
+    """Decorator recording the duration of each call in the span histogram (named after the function's qualified name by default)."""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_cache(name, cache):
+    """Exports the hit/miss counters of a TTLCache or ResponseCache as cache_requests_total{cache=name, result=hit|stale|miss}."""
+    CACHES[name] = cache
+
+
+def instrument_engine(engine, registry=REGISTRY):
+    """Records the duration of every SQL statement executed by a SQLAlchemy engine in db_query_seconds{statement=SELECT|INSERT|...}."""
+    from sqlalchemy import event
+    histogram = registry.histogram('db_query_seconds', 'Duration of SQL statements (SQLAlchemy).', labels=('statement',))
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['query_start'].pop()
+        histogram.observe(time.perf_counter() - start, statement=statement.lstrip().split(' ', 1)[0].upper())
+
+    @event.listens_for(engine, 'handle_error')
+    def failed(context):
+        if context.connection is not None and context.connection.info.get('query_start'):
+            context.connection.info['query_start'].pop()
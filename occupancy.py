@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+# Number of seconds per day, used to build one sorted search key per (room, start time)
+DAY = 24*60*60
+
+
+def to_seconds(t):
+    """Converts a datetime.time object to seconds since midnight."""
+    return t.hour*3600 + t.minute*60 + t.second
+
+
+def seconds_of_day(series):
+    """Converts a datetime series to an array of seconds since midnight."""
+    return (series.dt.hour*3600 + series.dt.minute*60 + series.dt.second).to_numpy(dtype=np.int64)
+
+
+class OccupancyIndex:
+    """Index over a day's events (dataframe returned by get_courses()) for fast free-room and next-event lookups.
+    Events are grouped by room and sorted by start time; all lookups are binary searches over the sorted arrays."""
+
+    def __init__(self, courses):
+        valid = (courses['room_nr'].notna() & courses['start_time'].notna() & courses['end_time'].notna()).to_numpy()
+        events = courses.loc[valid]
+
+        # Integer code per room and times of day in seconds (comparisons are made on times only, like the previous query)
+        codes, room_nrs = pd.factorize(events['room_nr'])
+        starts = seconds_of_day(events['start_time'])
+        ends = seconds_of_day(events['end_time'])
+
+        # Sort events by room, then by start time
+        order = np.lexsort((starts, codes))
+        codes = codes[order].astype(np.int64)
+        self.room_codes = {room_nr: i for i, room_nr in enumerate(room_nrs)}
+        self.keys = codes*DAY + starts[order]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.positions = np.flatnonzero(valid)[order] # Row positions of the events in the courses dataframe
+
+        # Boundaries of each room's events within the sorted arrays
+        bounds = np.searchsorted(codes, np.arange(len(room_nrs) + 1))
+        self.lo = bounds[:-1]
+        self.hi = bounds[1:]
+
+        # Running maximum of end times within each room, so that an overlap check only needs the last event starting before the window ends
+        self.max_ends = pd.Series(self.ends).groupby(codes).cummax().to_numpy(dtype=np.int64) if len(codes) else self.ends
+
+    def codes_for(self, room_nrs):
+        """Returns the integer codes of the given rooms (-1 for rooms without any events)."""
+        return np.fromiter((self.room_codes.get(room_nr, -1) for room_nr in room_nrs), dtype=np.int64, count=len(room_nrs))
+
+    def occupied_mask(self, room_nrs, start, end=None):
+        """Returns a boolean array indicating for each room whether it is occupied at any time within [start, end).
+        Times are datetime.time objects; without an end, rooms are checked for the moment `start`."""
+        start = to_seconds(start)
+        end = start + 1 if end is None else to_seconds(end)
+        codes = self.codes_for(room_nrs)
+        known = codes >= 0
+        mask = np.zeros(len(codes), dtype=bool)
+        if not known.any():
+            return mask
+
+        codes = codes[known]
+        # Number of events per room starting before the window ends
+        k = np.searchsorted(self.keys, codes*DAY + end, side='left')
+        has_events = k > self.lo[codes]
+        latest_end = self.max_ends[np.maximum(k - 1, 0)]
+        mask[known] = has_events & (latest_end > start)
+        return mask
+
+    def next_events(self, room_nrs, after):
+        """Returns the row position (in the courses dataframe) of the first event starting after `after` for each of the given rooms, with -1 for rooms with no more events."""
+        codes = self.codes_for(room_nrs)
+        known = codes >= 0
+        positions = np.full(len(codes), -1, dtype=np.int64)
+        if not known.any():
+            return positions
+
+        codes = codes[known]
+        p = np.searchsorted(self.keys, codes*DAY + to_seconds(after), side='right')
+        found = p < self.hi[codes]
+        positions[np.flatnonzero(known)[found]] = self.positions[p[found]]
+        return positions
+
+    def first_gap(self, room_nr, duration, earliest, latest):
+        """Returns the earliest start time (seconds since midnight) of a free period of `duration` seconds in a room within [earliest, latest), or None.
+        Times are datetime.time objects; a free period either starts at `earliest` or when an event ends."""
+        earliest, latest = to_seconds(earliest), to_seconds(latest)
+        code = self.room_codes.get(room_nr)
+        if code is None:
+            return earliest if earliest + duration <= latest else None
+
+        lo, hi = self.lo[code], self.hi[code]
+        candidates = np.unique(np.concatenate([[earliest], self.max_ends[lo:hi]]))
+        candidates = candidates[(candidates >= earliest) & (candidates + duration <= latest)]
+        if not len(candidates):
+            return None
+
+        # Same overlap check as occupied_mask(): the last event starting before the period ends must have ended by its start
+        k = np.searchsorted(self.starts[lo:hi], candidates + duration, side='left')
+        occupied = (k > 0) & (self.max_ends[lo:hi][np.maximum(k - 1, 0)] > candidates)
+        free = np.flatnonzero(~occupied)
+        return int(candidates[free[0]]) if len(free) else None
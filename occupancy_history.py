@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+
+# Rollup resolutions in seconds
+RESOLUTIONS = {'5min': 5*60, 'hour': 60*60, 'day': 24*60*60}
+
+# Longest period (in hours) a history query may span
+MAX_HISTORY_HOURS = 366*24
+
+# Days for which the buckets of each rollup resolution are kept (queries over longer periods use coarser resolutions by default)
+ROLLUP_RETENTION_DAYS = {'5min': 31, 'hour': 366, 'day': 366}
+
+
+class OccupancyHistory:
+    """Time series of seat occupancy per study zone, stored in SQLite.
+    Each poll is appended to a compact raw sample table and aggregated into 5-minute, hourly and daily rollups in the same transaction,
+    so history queries read a bounded number of rollup rows instead of scanning raw samples. Raw samples are pruned after `raw_retention_days`,
+    rollup buckets after the days given per resolution in `rollup_retention_days` (see ROLLUP_RETENTION_DAYS)."""
+
+    def __init__(self, db_path, raw_retention_days=7, rollup_retention_days=None):
+        self.db_path = db_path
+        self.raw_retention_days = raw_retention_days
+        self.rollup_retention_days = {**ROLLUP_RETENTION_DAYS, **(rollup_retention_days or {})}
+        self.zone_ids = {}
+        self._lock = threading.Lock()
+        self._appends = 0
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _init_db(self):
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS seat_zone (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)")
+            con.execute("CREATE TABLE IF NOT EXISTS seat_sample (ts INTEGER NOT NULL, zone_id INTEGER NOT NULL, free INTEGER NOT NULL, occupied INTEGER NOT NULL, PRIMARY KEY (zone_id, ts)) WITHOUT ROWID")
+            con.execute("""CREATE TABLE IF NOT EXISTS seat_rollup (
+                               resolution INTEGER NOT NULL, zone_id INTEGER NOT NULL, bucket INTEGER NOT NULL,
+                               samples INTEGER NOT NULL, free_sum INTEGER NOT NULL, occupied_sum INTEGER NOT NULL,
+                               occupied_min INTEGER NOT NULL, occupied_max INTEGER NOT NULL,
+                               PRIMARY KEY (resolution, zone_id, bucket)) WITHOUT ROWID""")
+            self.zone_ids = dict(con.execute("SELECT name, id FROM seat_zone").fetchall())
+
+    def _zone_id(self, con, zone):
+        zone_id = self.zone_ids.get(zone)
+        if zone_id is None:
+            con.execute("INSERT OR IGNORE INTO seat_zone (name) VALUES (?)", (zone,))
+            zone_id = con.execute("SELECT id FROM seat_zone WHERE name = ?", (zone,)).fetchone()[0]
+            self.zone_ids[zone] = zone_id
+        return zone_id
+
+    def append(self, seatfinder_df, scraped_at=None):
+        """Appends one poll (dataframe returned by the seatfinder scraper) to the raw samples and updates all rollups. Zones without data are skipped.
+        A sample that was already recorded for the same time and zone (e.g., a retried poll) is ignored, so it isn't counted twice in the rollups."""
+        ts = int(time.time() if scraped_at is None else scraped_at)
+        samples = [(zone, int(row['free']), int(row['occupied'])) for zone, row in seatfinder_df.iterrows()
+                   if row['free'] != '-' and row['occupied'] != '-' and pd.notna(row['free']) and pd.notna(row['occupied'])]
+
+        with self._lock, self._connect() as con:
+            for zone, free, occupied in samples:
+                zone_id = self._zone_id(con, zone)
+                inserted = con.execute("INSERT OR IGNORE INTO seat_sample (ts, zone_id, free, occupied) VALUES (?, ?, ?, ?)", (ts, zone_id, free, occupied)).rowcount
+                if not inserted:
+                    continue
+                for resolution in RESOLUTIONS.values():
+                    con.execute("""INSERT INTO seat_rollup (resolution, zone_id, bucket, samples, free_sum, occupied_sum, occupied_min, occupied_max)
+                                   VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+                                   ON CONFLICT (resolution, zone_id, bucket) DO UPDATE SET
+                                       samples = samples + 1, free_sum = free_sum + excluded.free_sum, occupied_sum = occupied_sum + excluded.occupied_sum,
+                                       occupied_min = MIN(occupied_min, excluded.occupied_min), occupied_max = MAX(occupied_max, excluded.occupied_max)""",
+                                (resolution, zone_id, ts - ts % resolution, free, occupied, occupied, occupied))
+
+            # Prune raw samples and expired rollup buckets from time to time
+            self._appends += 1
+            if self._appends % 100 == 1:
+                self._prune(con, ts)
+
+    def _prune(self, con, now):
+        """Deletes raw samples and rollup buckets older than their retention periods."""
+        con.execute("DELETE FROM seat_sample WHERE ts < ?", (now - self.raw_retention_days*24*60*60,))
+        for name, resolution in RESOLUTIONS.items():
+            con.execute("DELETE FROM seat_rollup WHERE resolution = ? AND bucket < ?", (resolution, now - self.rollup_retention_days[name]*24*60*60))
+
+    def history(self, zone, hours=24, resolution=None, now=None):
+        """Returns a dataframe with the average free, occupied and total seats and the occupancy rate of a zone over the last `hours` hours, one row per bucket.
+        The resolution ('5min', 'hour' or 'day') defaults to the finest one that keeps the result below ~300 rows. Times are in UTC.
+        Raises a ValueError unless 0 < hours <= MAX_HISTORY_HOURS."""
+        if not 0 < hours <= MAX_HISTORY_HOURS: # Also rejects NaN
+            raise ValueError(f"hours must be within (0, {MAX_HISTORY_HOURS}]")
+        if resolution is None:
+            resolution = '5min' if hours <= 24 else 'hour' if hours <= 14*24 else 'day'
+        step = RESOLUTIONS[resolution]
+        now = int(time.time() if now is None else now)
+        since = now - int(hours*60*60)
+
+        columns = ['time', 'free', 'occupied', 'total', 'occupancy', 'occupied_min', 'occupied_max']
+        with self._connect() as con:
+            # Zones may have been added by the poller of another worker
+            zone_id = self.zone_ids.get(zone)
+            if zone_id is None:
+                row = con.execute("SELECT id FROM seat_zone WHERE name = ?", (zone,)).fetchone()
+                if row is None:
+                    return pd.DataFrame(columns=columns)
+                zone_id = self.zone_ids[zone] = row[0]
+
+            rows = con.execute("""SELECT bucket, free_sum * 1.0 / samples, occupied_sum * 1.0 / samples, occupied_min, occupied_max
+                                  FROM seat_rollup WHERE resolution = ? AND zone_id = ? AND bucket >= ? ORDER BY bucket""",
+                               (step, zone_id, since - since % step)).fetchall()
+
+        history_df = pd.DataFrame(rows, columns=['time', 'free', 'occupied', 'occupied_min', 'occupied_max'])
+        history_df['time'] = pd.to_datetime(history_df['time'], unit='s')
+        history_df['total'] = history_df['free'] + history_df['occupied']
+        history_df['occupancy'] = (history_df['occupied'] / history_df['total']).where(history_df['total'] > 0)
+        return history_df[columns]
+
+    def zones(self):
+        return list(self.zone_ids)
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+from flask import Response, request
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of serialized JSON response bodies.
+    Keys are built from the normalized request parameters and the versions of the data the response depends on,
+    so an entry never has to be invalidated: once the data changes, requests map to a new key and old entries age out."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, builder):
+        """Returns the body for `key`, serializing `builder()` to JSON on a miss."""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        body = json.dumps(builder(), separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def etag_for(key):
+    """Returns a (strong) ETag for a response cache key."""
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def conditional_json(cache, key, builder):
+    """Returns a JSON response for the current request with an ETag header.
+    Answers with 304 Not Modified (without building the body) if the client's If-None-Match header matches.
+    Responses depend on the request parameters and the current time (e.g., the default start of a window), so they are validated by the ETag
+    of the full cache key only; there is no Last-Modified header and If-Modified-Since is ignored.
+    Args: key -> hashable tuple of normalized parameters and data versions; builder -> callable returning the JSON-serializable data."""
+    etag = etag_for(key)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(cache.get(key, builder), mimetype='application/json')
+
+    response.set_etag(etag)
+    # Clients may store the response but must revalidate it (cheap thanks to the ETag)
+    response.cache_control.no_cache = True
+    return response
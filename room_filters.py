@@ -0,0 +1,123 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+
+class RoomFilter(namedtuple('RoomFilter', ['names', 'buildings', 'exclude_types', 'exclude_buildings', 'min_seats', 'max_seats'],
+                            defaults=(None, None, frozenset(), frozenset(), None, None))):
+    """Immutable description of a room filter, resolved by RoomFilterIndex.
+    names/buildings -> room types ('name' column) resp. buildings to include (None: all); exclude_types/exclude_buildings -> 'infoUrlText' values resp. buildings to exclude;
+    min_seats/max_seats -> inclusive capacity range (None: unbounded; rooms without capacity only match filters without a range).
+    Filters are combined with `&`, e.g., LECTURE_ROOMS & RoomFilter(max_seats=40)."""
+
+    __slots__ = ()
+
+    def __new__(cls, names=None, buildings=None, exclude_types=(), exclude_buildings=(), min_seats=None, max_seats=None):
+        return super().__new__(cls, None if names is None else frozenset(names), None if buildings is None else frozenset(buildings),
+                               frozenset(exclude_types), frozenset(exclude_buildings),
+                               None if min_seats is None or min_seats == -np.inf else float(min_seats),
+                               None if max_seats is None or max_seats == np.inf else float(max_seats))
+
+    def __and__(self, other):
+        def intersect(a, b):
+            return b if a is None else a if b is None else a & b
+
+        def bound(a, b, pick):
+            return b if a is None else a if b is None else pick(a, b)
+
+        return RoomFilter(intersect(self.names, other.names), intersect(self.buildings, other.buildings),
+                          self.exclude_types | other.exclude_types, self.exclude_buildings | other.exclude_buildings,
+                          bound(self.min_seats, other.min_seats, max), bound(self.max_seats, other.max_seats, min))
+
+    def with_seats(self, min_seats=None, max_seats=None):
+        """Returns this filter restricted to a capacity range (e.g., the "Max. Room Size" filter of the landing page)."""
+        return self & RoomFilter(min_seats=min_seats, max_seats=max_seats)
+
+
+# Lecture rooms shown on the landing page: no lounges or event spaces, and no buildings without visibility on individual rooms from the HSG API (e.g., Square)
+LECTURE_ROOMS = RoomFilter(names=['Unterrichtsraum'],
+                           exclude_types=['Dozierenden Lounge', 'theCo', 'theStage'],
+                           exclude_buildings=['A 10 Sporthalle', 'D 14 WBZ Holzweid', 'D 15 Hans Ulrich Auditorium', 'A 11 Square'])
+
+
+class RoomFilterIndex:
+    """Boolean masks over the rows of a room catalogue (dataframe returned by get_rooms()), built once per catalogue version.
+    The 'name', 'infoUrlText' and 'buildingName' columns are stored as categorical codes, so a filter over any of them is a lookup table indexed by the codes;
+    seats are kept sorted, so a capacity range is two binary searches. The masks of a filter are intersected and cached (without the capacity range).
+    Other dataframes derived from the catalogue (e.g., free rooms) are matched to catalogue rows by their poiId."""
+
+    def __init__(self, rooms_df, max_cached=64):
+        self.rooms = rooms_df
+        self.max_cached = max_cached
+        self._columns = {}
+        for column in ('name', 'infoUrlText', 'buildingName'):
+            codes, uniques = pd.factorize(rooms_df[column])
+            self._columns[column] = (codes, {value: code for code, value in enumerate(uniques)})
+
+        seats = rooms_df['seats'].to_numpy(dtype=np.float64)
+        self._seat_order = np.argsort(seats, kind='stable') # Rooms without capacity (NaN) sort last
+        self._sorted_seats = seats[self._seat_order]
+
+        poi_ids = rooms_df['poiId'].to_numpy(dtype=np.int64)
+        self._poi_order = np.argsort(poi_ids, kind='stable')
+        self._sorted_poi_ids = poi_ids[self._poi_order]
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def _values_mask(self, column, values):
+        """Returns a boolean array over the catalogue rows whose `column` takes one of `values`."""
+        codes, lookup = self._columns[column]
+        table = np.zeros(len(lookup) + 1, dtype=bool) # The last entry catches missing values (code -1)
+        table[[lookup[value] for value in values if value in lookup]] = True
+        return table[codes]
+
+    def _attribute_mask(self, room_filter):
+        key = room_filter._replace(min_seats=None, max_seats=None)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+            if key.names is not None:
+                mask &= self._values_mask('name', key.names)
+            if key.buildings is not None:
+                mask &= self._values_mask('buildingName', key.buildings)
+            if key.exclude_types:
+                mask &= ~self._values_mask('infoUrlText', key.exclude_types)
+            if key.exclude_buildings:
+                mask &= ~self._values_mask('buildingName', key.exclude_buildings)
+            if len(self._masks) >= self.max_cached:
+                self._masks.clear()
+            self._masks[key] = mask
+        return mask
+
+    def seats_mask(self, min_seats=None, max_seats=None):
+        """Returns a boolean array over the catalogue rows with min_seats <= seats <= max_seats (binary search over the sorted seats)."""
+        first = 0 if min_seats is None else np.searchsorted(self._sorted_seats, min_seats, side='left')
+        last = np.count_nonzero(~np.isnan(self._sorted_seats)) if max_seats is None else np.searchsorted(self._sorted_seats, max_seats, side='right')
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self._seat_order[first:last]] = True
+        return mask
+
+    def mask(self, room_filter):
+        """Returns a boolean array over the catalogue rows matching `room_filter`."""
+        mask = self._attribute_mask(room_filter)
+        if room_filter.min_seats is not None or room_filter.max_seats is not None:
+            mask = mask & self.seats_mask(room_filter.min_seats, room_filter.max_seats)
+        return mask
+
+    def rows_of(self, rooms_df):
+        """Returns the catalogue row of each row of rooms_df (matched by poiId), or -1 for rooms that aren't in the catalogue."""
+        poi_ids = rooms_df['poiId'].to_numpy(dtype=np.int64)
+        if not len(self):
+            return np.full(len(poi_ids), -1)
+        positions = np.searchsorted(self._sorted_poi_ids, poi_ids).clip(max=len(self) - 1)
+        return np.where(self._sorted_poi_ids[positions] == poi_ids, self._poi_order[positions], -1)
+
+    def mask_for(self, rooms_df, room_filter):
+        """Returns a boolean array over the rows of rooms_df (the catalogue itself or a dataframe derived from it) matching `room_filter`."""
+        mask = self.mask(room_filter)
+        if rooms_df is self.rooms:
+            return mask
+        rows = self.rows_of(rooms_df)
+        return (rows >= 0) & mask[rows] if len(self) else np.zeros(len(rooms_df), dtype=bool)
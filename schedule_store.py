@@ -0,0 +1,181 @@
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime as dt
+from datetime import timedelta
+import json
+import sqlite3
+import threading
+import time
+import pandas as pd
+from cache import TTLCache
+
+
+# Columns kept from the EventDates payload
+EVENT_COLUMNS = ['location', 'room', 'startTime', 'endTime', 'description']
+
+
+class DaySchedule:
+    """All events taking place on one date, as returned by the EventDates API.
+    Derived data (e.g., the courses dataframe) can be memoized in `derived` and is kept for as long as the payload doesn't change."""
+
+    def __init__(self, date, payload, digest=None):
+        self.date = date
+        self.digest = digest or payload_digest(payload)
+        self.created_at = time.time() # Time at which this version of the day's schedule was loaded
+        self.events = pd.DataFrame(payload, columns=EVENT_COLUMNS)
+        self.derived = {}
+        self._lock = threading.RLock() # Builders may memoize other derived data of the same day
+
+    def memo(self, name, builder):
+        """Returns derived data `name` for this day, building it with `builder(self)` on first use."""
+        value = self.derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self.derived.get(name)
+                if value is None:
+                    value = builder(self)
+                    self.derived[name] = value
+        return value
+
+    def __getstate__(self):
+        # Pickled for the warm-start snapshot (see warm_start.py) without derived data, which may depend on the catalogue version of this process
+        state = self.__dict__.copy()
+        state['derived'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def room_events(self, room_nr):
+        """Returns the events taking place in the specified room."""
+        return self.events.loc[self.events['location'] == room_nr, ['location', 'startTime', 'endTime', 'description']].copy()
+
+
+def payload_digest(payload):
+    """Returns a stable hash of an EventDates payload, used to detect changes between refreshes."""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ScheduleStore:
+    """Per-date store for EventDates payloads. Each day is fetched once and held in memory (and optionally in SQLite) until its TTL expires.
+    If a refreshed payload is unchanged, the existing DaySchedule (including memoized derived data) is kept.
+    At most `max_days` days are held in memory (least recently used are evicted); the background refresh only reloads days within `refresh_days` from today.
+    Persisted days more than `retention_days` before today are deleted at startup and whenever a day is written."""
+
+    def __init__(self, fetch_events, ttl=15*60, stale_ttl=60*60, db_path=None, max_days=64, refresh_days=7, retention_days=30):
+        self.fetch_events = fetch_events # Callable taking a date string ('%Y-%m-%d') and returning the list of events
+        self.ttl = ttl
+        self.db_path = db_path
+        self.refresh_days = refresh_days # Today and the following days are kept warm by the background refresh
+        self.retention_days = retention_days
+        self.cache = TTLCache(self._load, ttl=ttl, stale_ttl=stale_ttl, name='schedule', max_entries=max_days)
+        self._db_lock = threading.Lock()
+        if db_path is not None:
+            self._init_db()
+
+    def get_day(self, date):
+        """Returns the DaySchedule for the specified date string ('%Y-%m-%d')."""
+        return self.cache.get(date)
+
+    def put_day(self, date, payload):
+        """Stores a payload fetched elsewhere (e.g., as part of a multi-day request) as the schedule of a date and returns the DaySchedule.
+        If the payload is unchanged, the existing DaySchedule (including memoized derived data) is kept."""
+        digest = payload_digest(payload)
+        self._write_db(date, digest, payload)
+        previous = self.cache.peek(date)
+        day = previous if previous is not None and previous.digest == digest else DaySchedule(date, payload, digest=digest)
+        self.cache.set(date, value=day)
+        return day
+
+    def refresh_window(self, today=None):
+        """Returns the dates ('%Y-%m-%d') reloaded by the background refresh: today and the following refresh_days - 1 days."""
+        first = (today or dt.now()).date()
+        return {(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(self.refresh_days)}
+
+    def _refresh_keys(self):
+        """Called on every tick of the background refresh: evicts expired days outside the refresh window and returns the cached days within it."""
+        window = self.refresh_window()
+        keys = []
+        for key in self.cache.keys():
+            if key[0] in window:
+                keys.append(key)
+            elif not self.cache.is_fresh(*key):
+                self.cache.invalidate(*key)
+        return keys
+
+    def start_background_refresh(self, interval=None):
+        """Periodically reloads the cached days within the refresh window in a daemon thread (other days are loaded on demand)."""
+        self.cache.start_background_refresh(interval, keys=self._refresh_keys)
+
+    def stop_background_refresh(self):
+        self.cache.stop_background_refresh()
+
+    def version(self, date):
+        """Returns the content digest of the cached schedule for a date, or None if it isn't loaded."""
+        day = self.cache.peek(date)
+        return day.digest if day is not None else None
+
+    def _load(self, date):
+        previous = self.cache.peek(date)
+
+        # On a cold start, a recently persisted payload is as good as a fresh one
+        if previous is None:
+            persisted = self._read_db(date)
+            if persisted is not None and time.time() - persisted[0] < self.ttl:
+                return DaySchedule(date, persisted[2], digest=persisted[1])
+
+        try:
+            payload = self.fetch_events(date)
+        except Exception:
+            # Fall back to the last persisted payload if the upstream is unavailable
+            persisted = self._read_db(date) if previous is None else None
+            if persisted is not None:
+                return DaySchedule(date, persisted[2], digest=persisted[1])
+            raise
+
+        digest = payload_digest(payload)
+        self._write_db(date, digest, payload)
+        if previous is not None and previous.digest == digest:
+            return previous
+        return DaySchedule(date, payload, digest=digest)
+
+    ##### SQLITE PERSISTENCE ##################################################################
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _init_db(self):
+        with self._db_lock, self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS event_day (date TEXT PRIMARY KEY, fetched_at REAL NOT NULL, digest TEXT NOT NULL, payload TEXT NOT NULL)")
+            self._prune(con)
+
+    def _prune(self, con):
+        """Deletes persisted days more than retention_days before today (caller holds the lock); a range delete on the primary key."""
+        cutoff = (dt.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        con.execute("DELETE FROM event_day WHERE date < ?", (cutoff,))
+
+    def _read_db(self, date):
+        """Returns (fetched_at, digest, payload) for a persisted date, or None."""
+        if self.db_path is None:
+            return None
+        with self._db_lock, self._connect() as con:
+            row = con.execute("SELECT fetched_at, digest, payload FROM event_day WHERE date = ?", (date,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def _write_db(self, date, digest, payload):
+        if self.db_path is None:
+            return
+        with self._db_lock, self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO event_day (date, fetched_at, digest, payload) VALUES (?, ?, ?, ?)",
+                        (date, time.time(), digest, json.dumps(payload)))
+            self._prune(con)
@@ -1,73 +1,254 @@
-from bs4 import BeautifulSoup
+import logging
 import requests
-from selenium import webdriver
-import selenium.common.exceptions as exceptions
+from contextlib import contextmanager
+import sqlite3
+import threading
 import time
 import pandas as pd
 import numpy as np
-from config import DRIVER_PATH
+
+logger = logging.getLogger(__name__)
 
 # Scraper based on tutorial by Brandon Jacobson: <How to Scrape Dynamically Loaded Websites with Selenium and BeautifulSoup>
 
-def seatfinder():
-    """Returns a dataframe containing the number of free, occupied and total seats for all studyzones listed on <https://seatfinder.unisg.ch>"""
-    # URL to access
-    url = "https://seatfinder.unisg.ch/"
+# URL to access
+URL = "https://seatfinder.unisg.ch/"
 
-    try:
-        # Initialize driver and configuration
-        global driver
-        options = webdriver.ChromeOptions()
-        options.add_argument('start-maximized')
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("detach", True)
-        options.add_experimental_option("useAutomationExtension", False)
+# Study zones in the order in which they are listed on the website
+ZONES = ['Library Ground Floor', 'Library Upper Floor', 'Main Building - Learning Zone 2nd floor', 'Main Building - Learning Zone 3rd floor', 'theCo', 'theStage', 'GYM area at Unisport']
+
+
+def parse_seatfinder(page_source):
+    """Returns a dataframe containing the number of free, occupied and total seats for all studyzones given the html of <https://seatfinder.unisg.ch>, or None if the page contains no seat data."""
+    # Imported on first use, so starting the app doesn't pay for the parser
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page_source, 'lxml')
+    tables = soup.find_all('table', class_='seatfinder-bar-graph')
+    if not tables:
+        return None
+
+    # Set up dataframe to fill with scraped data
+    seatfinder_df = pd.DataFrame(index=ZONES, columns=['free', 'occupied', 'total', 'occupancy'])
 
+    # Loop through each location and corresponding table element and assign scraped values
+    for location, table in zip(seatfinder_df.index, tables):
+        summary = table['summary'].split(' ') # Extract summay tag, containing relevant information and split into list
         try:
-            driver = webdriver.Chrome(chrome_options=options, executable_path=DRIVER_PATH)
-            driver.get(url)
-            time.sleep(5)
-            page_source = driver.page_source
-            soup = BeautifulSoup(page_source, 'lxml')
-
-            # Set up dataframe to fill with scraped data
-            seatfinder_df = pd.DataFrame(index=['Library Ground Floor', 'Library Upper Floor', 'Main Building - Learning Zone 2nd floor', 'Main Building - Learning Zone 3rd floor', 'theCo', 'theStage', 'GYM area at Unisport'], columns=['free', 'occupied', 'total', 'occupancy'])
-            free_seats = soup.find('table', class_='seatfinder-bar-graph').tbody.tr.td.next_sibling.next_sibling['title'].split(' ')[1]
-            
-            # Loop through each location and corresponding table element and assign scraped values
-            for location, table in zip(seatfinder_df.index, soup.find_all('table', class_='seatfinder-bar-graph')):
-                summary = table['summary'].split(' ') # Extract summay tag, containing relevant information and split into list
-                free = summary[1]
-                try:
-                    free = int(free)
-                except: 
-                    free = '-'
-                seatfinder_df.loc[location, 'free'] = free
-
-                try:
-                    occupied = int(summary[6])
-                except:
-                    occupied = '-'
-                seatfinder_df.loc[location, 'occupied'] = occupied
-
-                if type(free) == int and type(occupied) == int:
-                    total = free + occupied
-                else:
-                    total = '-'
-                seatfinder_df.loc[location, 'total'] = total
-                seatfinder_df.loc[location, 'occupancy'] = np.nan
-
-            driver.close()
-            return seatfinder_df
-    
+            free = int(summary[1])
+        except (IndexError, ValueError):
+            free = '-'
+        seatfinder_df.loc[location, 'free'] = free
+
+        try:
+            occupied = int(summary[6])
+        except (IndexError, ValueError):
+            occupied = '-'
+        seatfinder_df.loc[location, 'occupied'] = occupied
+
+        if type(free) == int and type(occupied) == int:
+            total = free + occupied
+        else:
+            total = '-'
+        seatfinder_df.loc[location, 'total'] = total
+        seatfinder_df.loc[location, 'occupancy'] = occupied / total if type(total) == int and total > 0 else np.nan
+
+    return seatfinder_df
+
+
+def dummy_seatfinder():
+    """Returns a dummy dataframe, used in case the website was never scraped successfully."""
+    seatfinder_df = pd.DataFrame(index=ZONES, columns=['free', 'occupied', 'total'])
+    seatfinder_df['free'] = [50 for i in range(len(ZONES))]
+    seatfinder_df['occupied'] = [20 for i in range(len(ZONES))]
+    seatfinder_df['total'] = [70 for i in range(len(ZONES))]
+    return seatfinder_df
+
+
+class SeatfinderPoller:
+    """Scrapes <https://seatfinder.unisg.ch> on a fixed interval in a background thread and publishes the latest snapshot.
+    The page is first fetched with a plain HTTP request; only if it contains no seat data (i.e., it is rendered by JavaScript), a single, reused headless Chrome is used.
+    Snapshots are kept in memory and, if a database path is given, in SQLite so that other workers can read them."""
+
+    def __init__(self, interval=120, db_path=None, driver_path=None, timeout=10, url=URL):
+        self.interval = interval
+        self.url = url
+        self.db_path = db_path
+        self.driver_path = driver_path
+        self.timeout = timeout
+        self.driver = None
+        self.snapshot = None     # Last successfully scraped dataframe
+        self.scraped_at = None   # Timestamp of the last successful scrape
+        self.listeners = []      # Callables notified with (snapshot, scraped_at) after each successful scrape
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if db_path is not None:
+            self._init_db()
+
+    ##### SCRAPING ########################################################################
+
+    def _fetch_plain(self):
+        try:
+            response = requests.get(self.url, timeout=self.timeout)
+        except requests.RequestException:
+            return None
+        return parse_seatfinder(response.text) if response.ok else None
+
+    def _get_driver(self):
+        if self.driver is None:
+            # Selenium is only imported once a page needs to be rendered by a browser
+            from selenium import webdriver
+            options = webdriver.ChromeOptions()
+            options.add_argument('--headless')
+            options.add_argument('--no-sandbox')
+            options.add_argument('--disable-dev-shm-usage')
+            options.add_experimental_option("excludeSwitches", ["enable-automation"])
+            options.add_experimental_option("useAutomationExtension", False)
+            # Without a configured DRIVER_PATH, chromedriver is looked up on the PATH
+            self.driver = webdriver.Chrome(chrome_options=options, executable_path=self.driver_path or 'chromedriver')
+        return self.driver
+
+    def _fetch_selenium(self):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        import selenium.common.exceptions as exceptions
+        driver = self._get_driver()
+        try:
+            driver.get(self.url)
+            # Wait until the dynamically loaded tables are present instead of sleeping a fixed time
+            WebDriverWait(driver, self.timeout).until(EC.presence_of_element_located((By.CLASS_NAME, 'seatfinder-bar-graph')))
+            return parse_seatfinder(driver.page_source)
         except exceptions.WebDriverException:
-            print('You need to update your ChromeDriver')
-            return ''
-    
+            # Discard the browser, a new one is started on the next poll
+            self.close()
+            raise
+
+    def scrape(self):
+        """Scrapes the website once and publishes the result. Returns the new snapshot, or None if scraping failed."""
+        try:
+            seatfinder_df = self._fetch_plain()
+            if seatfinder_df is None:
+                seatfinder_df = self._fetch_selenium()
+        except Exception as e:
+            # Selenium errors (selenium is imported lazily, see _fetch_selenium()) usually mean a missing or outdated driver
+            if type(e).__module__.startswith('selenium'):
+                logger.warning("Seatfinder scrape failed (is your ChromeDriver up to date?): %s", e)
+            else:
+                logger.warning("Seatfinder scrape failed: %s", e)
+            return None
+
+        if seatfinder_df is None:
+            return None
+        self.publish(seatfinder_df)
+        return seatfinder_df
+
+    def publish(self, seatfinder_df, scraped_at=None):
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        with self._lock:
+            self.snapshot = seatfinder_df
+            self.scraped_at = scraped_at
+        self._write_db(seatfinder_df, scraped_at)
+        for listener in self.listeners:
+            try:
+                listener(seatfinder_df, scraped_at)
+            except Exception as e:
+                logger.exception("Seatfinder listener failed: %s", e)
+
+    ##### READING #########################################################################
+
+    def latest(self):
+        """Returns the last good snapshot (from memory, else from SQLite), or the dummy dataframe if the website was never scraped successfully."""
+        return self.latest_snapshot()[0]
+
+    def latest_snapshot(self):
+        """Returns (snapshot, scraped_at) like latest(); scraped_at is None for the dummy dataframe."""
+        with self._lock:
+            if self.snapshot is not None:
+                return self.snapshot, self.scraped_at
+        persisted = self._read_db()
+        if persisted is not None:
+            return persisted
+        return dummy_seatfinder(), None
+
+    ##### BACKGROUND THREAD ###############################################################
+
+    def start(self):
+        """Starts polling in a daemon thread (scraping immediately, then every `interval` seconds)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self.scrape()
+                self._stop.wait(self.interval)
+            self.close()
+
+        self._thread = threading.Thread(target=run, name='seatfinder-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    ##### SQLITE PERSISTENCE ##############################################################
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _init_db(self):
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS seat_snapshot (zone TEXT PRIMARY KEY, position INTEGER NOT NULL, free INTEGER, occupied INTEGER, scraped_at REAL NOT NULL)")
+
+    def _write_db(self, seatfinder_df, scraped_at):
+        if self.db_path is None:
+            return
+        rows = [(zone, i, row['free'] if row['free'] != '-' else None, row['occupied'] if row['occupied'] != '-' else None, scraped_at)
+                for i, (zone, row) in enumerate(seatfinder_df.iterrows())]
+        with self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO seat_snapshot (zone, position, free, occupied, scraped_at) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _read_db(self):
+        """Returns (snapshot, scraped_at) from SQLite, or None if nothing was persisted."""
+        if self.db_path is None:
+            return None
+        with self._connect() as con:
+            rows = con.execute("SELECT zone, free, occupied, scraped_at FROM seat_snapshot ORDER BY position").fetchall()
+        if not rows:
+            return None
+
+        seatfinder_df = pd.DataFrame(index=[row[0] for row in rows], columns=['free', 'occupied', 'total', 'occupancy'])
+        for zone, free, occupied, _ in rows:
+            seatfinder_df.loc[zone, 'free'] = free if free is not None else '-'
+            seatfinder_df.loc[zone, 'occupied'] = occupied if occupied is not None else '-'
+            seatfinder_df.loc[zone, 'total'] = free + occupied if free is not None and occupied is not None else '-'
+            seatfinder_df.loc[zone, 'occupancy'] = occupied / (free + occupied) if free is not None and occupied is not None and free + occupied > 0 else np.nan
+        return seatfinder_df, max(row[3] for row in rows)
+
+
+def seatfinder():
+    """Returns a dataframe containing the number of free, occupied and total seats for all studyzones listed on <https://seatfinder.unisg.ch>.
+    Scrapes the website once; prefer reading SeatfinderPoller.latest() in request handlers."""
+    poller = SeatfinderPoller()
+    try:
+        seatfinder_df = poller.scrape()
+    finally:
+        poller.close()
+
     # Returns dummy dataframe in case scraper doesn't work or website is inaccessible
-    except:
-        seatfinder_df = pd.DataFrame(index=['Library Ground Floor', 'Library Upper Floor', 'Main Building - Learning Zone 2nd floor', 'Main Building - Learning Zone 3rd floor', 'theCo', 'theStage', 'GYM area at Unisport'], columns=['free', 'occupied', 'total'])
-        seatfinder_df['free'] = [50 for i in range(7)]
-        seatfinder_df['occupied'] = [20 for i in range(7)]
-        seatfinder_df['total'] = [70 for i in range(7)]
-        return seatfinder_df
\ No newline at end of file
+    return seatfinder_df if seatfinder_df is not None else dummy_seatfinder()
@@ -0,0 +1,123 @@
+from datetime import time
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+# The modules live at the repository root (no package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from API_calls import API, build_courses, normalize_rooms
+from occupancy import OccupancyIndex
+from schedule_store import DaySchedule
+
+
+DATE = '2024-10-14'
+BUILDINGS = ['01 Hauptgebäude', '09 Bibliothek', '23 Tellstrasse', 'A 10 Sporthalle', 'A 11 Square', 'D 14 WBZ Holzweid']
+ROOM_TYPES = [('Unterrichtsraum', 'Hörsaal'), ('Unterrichtsraum', 'Group meeting room'), ('Unterrichtsraum', 'Dozierenden Lounge'), ('Büro', 'Büro')]
+
+
+def make_pois(n_rooms=120, seed=710):
+    """Returns a list of MazeMap POIs with room numbers; every 10th room appears twice (rooms with several POIs exist on campus)."""
+    rng = random.Random(seed)
+    pois = []
+    for i in range(n_rooms):
+        building = BUILDINGS[i % len(BUILDINGS)]
+        room_nr = f"{10 + i % len(BUILDINGS):02d}-{100 + i:03d}"
+        name, info = rng.choice(ROOM_TYPES)
+        x, y = 1046000 + rng.random()*800, 5995000 + rng.random()*800
+        for copy in range(2 if i % 10 == 0 else 1):
+            pois.append({'poiId': 100000 + 2*i + copy, 'kind': 'room', 'point': {'type': 'Point', 'coordinates': [x, y]},
+                         'floorName': str(i % 5), 'buildingName': building, 'title': f"Raum {room_nr}", 'z': i % 5,
+                         'infoUrl': f"https://www.unisg.ch/rooms/{room_nr}", 'infoUrlText': info, 'description': None,
+                         'peopleCapacity': rng.choice([None, 12, 24, 40, 60, 120]), 'types': [{'name': name}]})
+    return pois
+
+
+def make_events(room_nrs, date=DATE, per_room=4, seed=710):
+    """Returns an EventDates payload with events at arbitrary minutes (overlapping ones included) and a few events past midnight.
+    A quarter of the rooms has no events; '99-999' is a room that isn't in the catalogue."""
+    rng = random.Random(seed)
+    events = []
+
+    def add(room_nr, start, end, end_date=date):
+        events.append({'location': room_nr, 'room': {'seats': 40},
+                       'startTime': f"{date}T{start // 60:02d}:{start % 60:02d}:00", 'endTime': f"{end_date}T{end // 60:02d}:{end % 60:02d}:00",
+                       'description': f"Course {len(events)}"})
+
+    for i, room_nr in enumerate(list(room_nrs) + ['99-999']):
+        if i % 4 == 3:
+            continue
+        for _ in range(rng.randint(1, per_room)):
+            start = rng.randrange(7*60, 22*60)
+            add(room_nr, start, min(start + rng.choice([15, 45, 60, 90, 105, 180]) + rng.randrange(0, 3), 24*60 - 1))
+        if i % 17 == 0:
+            add(room_nr, 23*60 + 30, 30, end_date='2024-10-15') # Ends after midnight
+    return events
+
+
+def make_day(events, date=DATE):
+    """DaySchedule with events given as (room_nr, 'HH:MM', 'HH:MM')."""
+    return DaySchedule(date, [{'location': room_nr, 'room': {'seats': 20}, 'startTime': f"{date}T{start}:00", 'endTime': f"{date}T{end}:00",
+                               'description': f"{room_nr} {start}"} for room_nr, start, end in events])
+
+
+def minutes(m):
+    """datetime.time of `m` minutes since midnight (wrapping around at midnight)."""
+    return time(m // 60 % 24, m % 60)
+
+
+def random_windows(n, seed=710):
+    """Returns n random (start, end) windows; every 5th one on average has no end."""
+    rng = random.Random(seed)
+    windows = []
+    for _ in range(n):
+        start = rng.randrange(0, 24*60)
+        windows.append((minutes(start), None if rng.random() < 0.2 else minutes(rng.randrange(0, 24*60))))
+    return windows
+
+
+def occupied_reference(courses, room_nrs, start, end=None):
+    """Rooms occupied within [start, end) (at `start` without an end), as queried by the former get_free_rooms()."""
+    if end is None:
+        occupied = courses.query("(start_time.dt.time <= @start) and (end_time.dt.time > @start)").room_nr.unique()
+    else:
+        occupied = courses.query("(start_time.dt.time < @end) and (end_time.dt.time > @start)").room_nr.unique()
+    return np.isin(np.asarray(room_nrs, dtype=object), occupied)
+
+
+@pytest.fixture(scope='session')
+def catalogue():
+    return normalize_rooms(make_pois())
+
+
+@pytest.fixture(scope='session')
+def rooms(catalogue):
+    return catalogue.frame()
+
+
+@pytest.fixture(scope='session')
+def day(catalogue):
+    return DaySchedule(DATE, make_events(catalogue.frame()['room_nr'].unique()))
+
+
+@pytest.fixture(scope='session')
+def courses(day):
+    return build_courses(day)
+
+
+@pytest.fixture(scope='session')
+def index(courses):
+    return OccupancyIndex(courses)
+
+
+@pytest.fixture
+def api(catalogue, day):
+    """API instance whose caches are primed with the test catalogue and day, so no upstream is called."""
+    api = API('test')
+    api.rooms_cache.set(value=catalogue)
+    api.schedule.cache.set(DATE, value=day)
+    yield api
+    api.executor.shutdown(wait=False)
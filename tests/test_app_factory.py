@@ -0,0 +1,11 @@
+"""Background workers started by create_app()."""
+import threading
+
+from app import create_app
+
+
+def test_no_background_threads_without_background(tmp_path):
+    # All background options left at their defaults (on), e.g., in the watcher process of the reloader
+    before = set(threading.enumerate())
+    create_app({'API_TOKEN': 'test', 'SECRET_KEY': 'test', 'PRELOAD': True}, instance_path=str(tmp_path), background=False)
+    assert [thread.name for thread in set(threading.enumerate()) - before] == []
@@ -0,0 +1,100 @@
+"""Booking counts of BookingRepository: atomic increments (with and without RETURNING support of the SQLite library) and the compaction of expired days."""
+from datetime import datetime as dt
+import threading
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app import Booking, create_app, db
+from bookings import BookingRepository
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app({'API_TOKEN': 'test', 'SECRET_KEY': 'test', 'BACKGROUND_REFRESH': False, 'WARM_START': False,
+                       'SEATFINDER_POLL': False, 'BOOKINGS_COMPACTION': False}, instance_path=str(tmp_path))
+
+
+def archived(bookings):
+    with db.engine.connect() as con:
+        return [tuple(row) for row in con.execute(text(f"SELECT date, room_nr, time_slot, booking_count FROM {bookings.archive_table} ORDER BY date, room_nr"))]
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_concurrent_increments(app, monkeypatch, returning):
+    bookings = BookingRepository(db, Booking)
+    with app.app_context():
+        # SQLite < 3.35 has no RETURNING, the count is then read back within the upsert's transaction
+        monkeypatch.setattr(db.engine.dialect, 'insert_returning', returning)
+
+    counts = []
+
+    def book():
+        with app.app_context():
+            for _ in range(20):
+                counts.append(bookings.increment('01-101', '2024-10-14', '10:15'))
+
+    threads = [threading.Thread(target=book) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every booking is counted once and every caller saw a distinct count
+    assert sorted(counts) == list(range(1, 81))
+    with app.app_context():
+        assert Booking.query.count() == 1
+        assert bookings.counts_for_room('01-101', '2024-10-14') == {'10:15': 80}
+
+
+def test_compaction_archives_and_deletes_expired_days(app):
+    bookings = BookingRepository(db, Booking, retention_days=30)
+    today = dt(2024, 10, 14) # Booking window from 2024-09-14
+    booked = [('01-101', '2024-09-01', '10:15'), ('01-101', '2024-09-01', '10:15'), ('01-102', '2024-09-13', '08:15'),
+              ('01-101', '2024-09-14', '10:15'), ('01-101', '2024-10-14', '10:15')]
+    with app.app_context():
+        for room_nr, date, time_slot in booked:
+            bookings.increment(room_nr, date, time_slot)
+        assert bookings.counts_for_room('01-101', '2024-09-01') == {'10:15': 2}
+
+        assert bookings.compact(today=today) == 2
+        assert sorted((b.room_nr, b.date, b.time_slot, b.booking_count) for b in Booking.query.all()) == \
+               [('01-101', '2024-09-14', '10:15', 1), ('01-101', '2024-10-14', '10:15', 1)]
+        assert archived(bookings) == [('2024-09-01', '01-101', '10:15', 2), ('2024-09-13', '01-102', '08:15', 1)]
+        # Cached counts of expired days are dropped
+        assert ('01-101', '2024-09-01') not in set(bookings.cache.keys())
+
+        # Archived counts of a day add up over several compactions
+        bookings.increment('01-101', '2024-09-01', '10:15')
+        assert bookings.compact(today=today) == 1
+        assert archived(bookings) == [('2024-09-01', '01-101', '10:15', 3), ('2024-09-13', '01-102', '08:15', 1)]
+
+        # Nothing to remove
+        assert bookings.compact(today=today) == 0
+        assert Booking.query.count() == 2
+
+
+def test_compaction_without_archive(app):
+    bookings = BookingRepository(db, Booking, retention_days=30)
+    with app.app_context():
+        bookings.increment('01-101', '2024-09-01', '10:15')
+        assert bookings.compact(today=dt(2024, 10, 14), archive=False, vacuum=False) == 1
+        assert Booking.query.count() == 0
+        assert not inspect(db.engine).has_table(bookings.archive_table)
+
+
+
+def test_cached_count_never_goes_backwards(app):
+    bookings = BookingRepository(db, Booking)
+    with app.app_context():
+        bookings.increment('01-101', '2024-10-14', '10:15')
+        assert bookings.counts_for_room('01-101', '2024-10-14') == {'10:15': 1}
+
+        # A concurrent increment already wrote a larger count to the cache before this one updates it
+        bookings.cache.set('01-101', '2024-10-14', value={'10:15': 5})
+        assert bookings.increment('01-101', '2024-10-14', '10:15') == 2
+        assert bookings.counts_for_room('01-101', '2024-10-14') == {'10:15': 5}
+
+        # New slots are added to the cached entry
+        bookings.increment('01-101', '2024-10-14', '11:15')
+        assert bookings.counts_for_room('01-101', '2024-10-14') == {'10:15': 5, '11:15': 1}
@@ -0,0 +1,61 @@
+"""Multi-day free-room queries (get_free_rooms_range) and the first-fit search (OccupancyIndex.first_gap, API.first_free_slot)."""
+from datetime import datetime as dt
+from datetime import time
+import random
+
+from API_calls import build_courses
+from occupancy import OccupancyIndex
+from conftest import DATE, make_day, minutes
+
+
+def first_gap_reference(courses, room_nr, duration, earliest, latest):
+    """Earliest start (seconds since midnight) of a free period found by scanning minute by minute, or None."""
+    events = courses.loc[courses['room_nr'] == room_nr]
+    starts = (events['start_time'].dt.hour*60 + events['start_time'].dt.minute).to_numpy()
+    ends = (events['end_time'].dt.hour*60 + events['end_time'].dt.minute).to_numpy()
+    first, last = earliest.hour*60 + earliest.minute, latest.hour*60 + latest.minute
+    for t in range(first, last - duration + 1):
+        if not ((starts < t + duration) & (ends > t)).any():
+            return t*60
+    return None
+
+
+def test_first_gap_matches_reference(courses, rooms, index):
+    rng = random.Random(710)
+    room_nrs = list(rooms['room_nr'].unique()) + ['00-000']
+    for _ in range(200):
+        room_nr = rng.choice(room_nrs)
+        duration = rng.choice([15, 45, 60, 90, 180])
+        earliest = minutes(rng.randrange(6*60, 20*60))
+        latest = minutes(rng.randrange(earliest.hour*60 + earliest.minute, 24*60))
+        assert index.first_gap(room_nr, duration*60, earliest, latest) == first_gap_reference(courses, room_nr, duration, earliest, latest), (room_nr, duration, earliest, latest)
+
+
+def test_first_gap_on_empty_day_and_unknown_room(index):
+    empty = OccupancyIndex(build_courses(make_day([])))
+    assert empty.first_gap('01-101', 60*60, time(8, 0), time(22, 0)) == 8*60*60
+    assert index.first_gap('00-000', 60*60, time(8, 0), time(10, 0)) == 8*60*60
+    assert index.first_gap('00-000', 3*60*60, time(8, 0), time(10, 0)) is None
+
+
+def test_first_free_slot(api, courses, index):
+    room_nr = courses['room_nr'].iat[0]
+    start = index.first_gap(room_nr, 90*60, time(8, 0), time(22, 0))
+    slot = api.first_free_slot(room_nr, duration=90, start_date=dt.strptime(DATE, '%Y-%m-%d'), days=1)
+    assert slot == {'date': DATE, 'start': minutes(start // 60).strftime('%H:%M'), 'end': minutes(start // 60 + 90).strftime('%H:%M')}
+
+    # Booked out within the day
+    api.schedule.cache.set(DATE, value=make_day([(room_nr, '08:00', '21:00')]))
+    assert api.first_free_slot(room_nr, duration=90, start_date=dt.strptime(DATE, '%Y-%m-%d'), days=1) is None
+
+
+def test_get_free_rooms_range_is_intersection_of_days(api, rooms):
+    api.schedule.cache.set('2024-10-15', value=make_day([(room_nr, '10:30', '11:30') for room_nr in rooms['room_nr'].unique()[::3]], date='2024-10-15'))
+    dates = [DATE, '2024-10-15']
+    result = api.get_free_rooms_range(dates, '10:00', '11:00')
+
+    free_on_all = set(rooms['room_nr'])
+    for date in dates:
+        free_on_all &= set(api.get_free_rooms('10:00', '11:00', date)['room_nr'])
+    assert set(result['room_nr']) == free_on_all
+    assert len(result) < len(api.get_free_rooms('10:00', '11:00', DATE))
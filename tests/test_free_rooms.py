@@ -0,0 +1,76 @@
+"""Free-room lookups (OccupancyIndex and API.get_free_rooms) compared against the former pandas queries."""
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+from API_calls import build_courses
+from occupancy import OccupancyIndex
+from conftest import DATE, make_day, occupied_reference, random_windows
+
+
+def next_event_rows_reference(df, room_nr, filter_end):
+    """Next event of a room as a one-row dataframe (without event times if there is none), as returned by the former per-room next_event()."""
+    room_events = df.query("room_nr == @room_nr and start_time.dt.time > @filter_end")
+    if not room_events.empty:
+        return room_events.sort_values(by='start_time').head(1)
+    no_event_row = df.loc[df['room_nr'] == room_nr].head(1).copy()
+    no_event_row[['start_time', 'end_time', 'start_time_only', 'end_time_only']] = None
+    no_event_row['subject'] = 'No more events planned for today'
+    return no_event_row
+
+
+def test_occupied_mask_matches_reference(courses, rooms, index):
+    room_nrs = rooms['room_nr'].to_numpy()
+    for start, end in random_windows(300):
+        assert (index.occupied_mask(room_nrs, start, end) == occupied_reference(courses, room_nrs, start, end)).all(), (start, end)
+
+
+def test_interval_edges():
+    # Events touching the window only at its edges don't occupy the room
+    courses = build_courses(make_day([('01-101', '09:00', '10:00'), ('01-102', '10:00', '11:00'), ('01-103', '10:59', '11:30'), ('01-104', '11:00', '12:00')]))
+    room_nrs = np.array(['01-101', '01-102', '01-103', '01-104'], dtype=object)
+    index = OccupancyIndex(courses)
+
+    cases = [((time(10, 0), time(11, 0)), [False, True, True, False]),
+             ((time(10, 0), None), [False, True, False, False]),
+             ((time(9, 59), None), [True, False, False, False]),
+             ((time(11, 0), time(11, 15)), [False, False, True, True]),
+             ((time(8, 0), time(9, 0)), [False, False, False, False])]
+    for (start, end), expected in cases:
+        assert list(index.occupied_mask(room_nrs, start, end)) == expected, (start, end)
+        assert list(occupied_reference(courses, room_nrs, start, end)) == expected, (start, end)
+
+
+def test_empty_day(rooms):
+    index = OccupancyIndex(build_courses(make_day([])))
+    room_nrs = rooms['room_nr'].to_numpy()
+    assert not index.occupied_mask(room_nrs, time(10, 0), time(12, 0)).any()
+    assert not index.occupied_mask(room_nrs, time(10, 0)).any()
+
+
+def test_unknown_room(index):
+    # '99-999' has events but isn't in the catalogue, '00-000' is neither
+    assert list(index.occupied_mask(['00-000'], time(0, 0), time(23, 59))) == [False]
+    assert '99-999' in index.room_codes
+
+
+def test_get_free_rooms_matches_former_implementation(api, courses, rooms):
+    merged_df = rooms.merge(courses, on='room_nr', how='left')
+    for start, end in [('10:00', '11:00'), ('08:00', '08:15'), ('09:45', '10:15'), ('12:30', None), ('20:00', '23:00'), ('23:45', None)]:
+        filter_start = pd.Timestamp(start).time()
+        filter_end = None if end is None else pd.Timestamp(end).time()
+        occupied = occupied_reference(courses, rooms['room_nr'], filter_start, filter_end)
+        expected = pd.concat([next_event_rows_reference(merged_df, room_nr, filter_end or filter_start) for room_nr in rooms.loc[~occupied, 'room_nr']])
+        expected['start_time'] = expected['start_time'].fillna(pd.Timestamp('1970-01-01'))
+
+        result = api.get_free_rooms(start, end, DATE)
+        assert sorted(zip(result['room_nr'], result['subject'], result['start_time'].astype(str))) == \
+               sorted(zip(expected['room_nr'], expected['subject'], expected['start_time'].astype(str))), (start, end)
+
+
+def test_get_free_rooms_on_empty_day(api, rooms):
+    api.schedule.cache.set(DATE, value=make_day([]))
+    result = api.get_free_rooms('10:00', '11:00', DATE)
+    assert len(result) == len(rooms)
+    assert (result['subject'] == 'No more events planned for today').all()
@@ -0,0 +1,59 @@
+"""Per-slot occupancy snapshots (FreeSlotSnapshot) compared against the occupancy index and the former pandas query."""
+from datetime import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from API_calls import build_courses
+from free_slots import FreeSlotSnapshot
+from occupancy import OccupancyIndex
+from conftest import make_day, minutes, occupied_reference, random_windows
+
+
+@pytest.fixture(scope='module')
+def snapshot(rooms, index):
+    return FreeSlotSnapshot(rooms, index)
+
+
+def test_occupied_mask_matches_reference(courses, rooms, snapshot):
+    room_nrs = rooms['room_nr'].to_numpy()
+    for start, end in random_windows(300):
+        assert (snapshot.occupied_mask(start, end) == occupied_reference(courses, room_nrs, start, end)).all(), (start, end)
+
+
+def test_matches_index_at_slot_edges(rooms, index, snapshot):
+    # Windows starting and ending on, just before and just after the 15-minute slot boundaries
+    room_nrs = rooms['room_nr'].to_numpy()
+    for boundary in range(0, 24*60, 15):
+        for start in (boundary - 1, boundary, boundary + 1):
+            for duration in (None, 1, 14, 15, 16, 30, 61):
+                end = None if duration is None else minutes(min(start + duration, 24*60 - 1))
+                start_time = minutes(max(start, 0))
+                assert (snapshot.occupied_mask(start_time, end) == index.occupied_mask(room_nrs, start_time, end)).all(), (start_time, end)
+
+
+def test_interval_edges():
+    # Events touching the window only at its edges don't occupy the room
+    courses = build_courses(make_day([('01-101', '09:00', '10:00'), ('01-102', '10:00', '11:00'), ('01-103', '10:59', '11:30'), ('01-104', '11:00', '12:00')]))
+    room_nrs = np.array(['01-101', '01-102', '01-103', '01-104'], dtype=object)
+    snapshot = FreeSlotSnapshot(pd.DataFrame({'room_nr': room_nrs}), OccupancyIndex(courses))
+
+    cases = [((time(10, 0), time(11, 0)), [False, True, True, False]),
+             ((time(10, 0), None), [False, True, False, False]),
+             ((time(9, 59), None), [True, False, False, False]),
+             ((time(11, 0), time(11, 15)), [False, False, True, True]),
+             ((time(8, 0), time(9, 0)), [False, False, False, False])]
+    for (start, end), expected in cases:
+        assert list(snapshot.occupied_mask(start, end)) == expected, (start, end)
+
+
+def test_empty_day(rooms):
+    snapshot = FreeSlotSnapshot(rooms, OccupancyIndex(build_courses(make_day([]))))
+    assert not snapshot.occupied_mask(time(10, 0), time(12, 0)).any()
+    assert not snapshot.occupied_mask(time(10, 0)).any()
+
+
+def test_rooms_outside_the_catalogue(snapshot):
+    # '99-999' has events but isn't in the catalogue
+    assert '99-999' not in set(snapshot.room_nrs)
@@ -0,0 +1,125 @@
+"""Retries, deadline and circuit breaking of HTTPClient against a local server."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import pytest
+
+from http_client import CircuitBreaker, CircuitOpenError, HTTPClient, UpstreamHTTPError, UpstreamUnavailable
+
+
+class Upstream:
+    """Local HTTP server answering GET requests with the scripted (status, delay) responses in turn (the last one repeats)."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.hits = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, delay = upstream.responses[min(upstream.hits, len(upstream.responses) - 1)]
+                upstream.hits += 1
+                time.sleep(delay)
+                body = b'{"ok": true}'
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass # The client gave up (read timeout)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    servers = []
+
+    def start(*responses):
+        servers.append(Upstream(responses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_transient_errors_are_retried(upstream):
+    server = upstream((503, 0), (502, 0), (200, 0))
+    client = HTTPClient(retries=3, backoff_factor=0.01)
+    assert client.get_json(server.url) == {'ok': True}
+    assert server.hits == 3
+    assert client.breaker('default').state == 'closed'
+
+
+def test_read_timeouts_are_not_retried(upstream):
+    server = upstream((200, 0.5))
+    client = HTTPClient(retries=3, backoff_factor=0.01, timeouts={'default': (1, 0.1)})
+    with pytest.raises(UpstreamUnavailable):
+        client.get(server.url)
+    assert server.hits == 1
+
+
+def test_retries_stop_at_the_deadline(upstream):
+    server = upstream((503, 0))
+    client = HTTPClient(retries=10, backoff_factor=0.2, deadline=0.5)
+    start = time.monotonic()
+    with pytest.raises(UpstreamHTTPError) as error:
+        client.get(server.url)
+    assert error.value.status_code == 503
+    # Without the deadline, the backoff alone would take 0.4 + 0.8 + ... + 102.4 seconds
+    assert time.monotonic() - start < 1.5
+    assert 1 < server.hits < 11
+
+
+def test_circuit_breaker_transitions():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    assert breaker.state == 'closed' and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    # After reset_timeout, a single trial call is let through
+    breaker.opened_at -= 30
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    # A failed trial keeps the circuit open, a successful one closes it
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0 and breaker.allow()
+
+
+def test_open_circuit_skips_the_upstream(upstream):
+    server = upstream((500, 0), (500, 0), (404, 0))
+    client = HTTPClient(retries=0, failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(UpstreamHTTPError):
+            client.get(server.url, endpoint='events')
+    with pytest.raises(CircuitOpenError):
+        client.get(server.url, endpoint='events')
+    assert server.hits == 2
+
+    # Other endpoints have their own circuit; client errors don't count as failures
+    for _ in range(3):
+        with pytest.raises(UpstreamHTTPError):
+            client.get(server.url, endpoint='mazemap')
+    assert client.breaker('mazemap').state == 'closed'
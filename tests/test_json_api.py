@@ -0,0 +1,73 @@
+"""Conditional GET of the JSON API: responses are validated by the ETag of their parameters and data versions only."""
+from datetime import datetime as dt
+
+import pytest
+
+from API_calls import API, normalize_rooms
+from app import create_app
+from schedule_store import DaySchedule
+from conftest import DATE, make_events, make_pois
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Upstream calls are answered from the synthetic fixtures
+    catalogue = normalize_rooms(make_pois())
+    room_nrs = catalogue.frame()['room_nr'].unique()
+    monkeypatch.setattr(API, 'fetch_rooms', lambda self: catalogue)
+    monkeypatch.setattr(API, 'fetch_event_range', lambda self, start_date, end_date: make_events(room_nrs, date=start_date))
+    app = create_app({'API_TOKEN': 'test', 'SECRET_KEY': 'test', 'BACKGROUND_REFRESH': False, 'WARM_START': False,
+                      'SEATFINDER_POLL': False, 'BOOKINGS_COMPACTION': False}, instance_path=str(tmp_path))
+    return app.test_client()
+
+
+def free_rooms(client, headers=None, **params):
+    return client.get('/api/free_rooms', query_string={'date': dt.now().strftime('%Y-%m-%d'), 'start': '10:00', 'end': '11:00', **params}, headers=headers)
+
+
+def test_etag_revalidation(client):
+    response = free_rooms(client)
+    assert response.status_code == 200
+    assert response.get_json()['rooms']
+    assert response.headers.get('Last-Modified') is None
+    etag = response.headers['ETag']
+
+    # Same parameters and data: 304 without a body, with the same ETag
+    revalidated = free_rooms(client, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+    # Other parameters map to another ETag
+    for params in ({'end': '12:00'}, {'start': '09:45'}, {'size': '40'}, {'filtered': '0'}):
+        changed = free_rooms(client, headers={'If-None-Match': etag}, **params)
+        assert changed.status_code == 200, params
+        assert changed.headers['ETag'] != etag, params
+
+
+def test_if_modified_since_is_ignored(client):
+    # A date far in the future would match any Last-Modified, but responses depend on their parameters
+    future = 'Fri, 01 Jan 2100 00:00:00 GMT'
+    assert free_rooms(client).status_code == 200
+    assert free_rooms(client, headers={'If-Modified-Since': future}).status_code == 200
+    assert free_rooms(client, headers={'If-Modified-Since': future}, end='12:00').status_code == 200
+
+
+def test_invalid_parameters(client):
+    assert free_rooms(client, date='2100-01-01').status_code == 400
+    assert free_rooms(client, start='25:00').status_code == 400
+
+
+def test_free_rooms_from_keyed_day(api, rooms):
+    # The body is built from the DaySchedule the key was derived from, even if the store holds another version by then
+    keyed = api.get_day(DATE)
+    api.schedule.cache.set(DATE, value=DaySchedule(DATE, []))
+    assert len(api.get_free_rooms('10:00', '11:00', day=keyed)) < len(rooms)
+    assert len(api.get_free_rooms('10:00', '11:00', DATE)) == len(rooms)
+
+
+def test_seats_before_first_scrape(client):
+    # Nothing was scraped yet: no placeholder counts
+    data = client.get('/api/seats').get_json()
+    assert data['stale'] is True and data['scraped_at'] is None
+    assert data['zones'] and all(zone['free'] is None and zone['occupied'] is None and zone['total'] is None for zone in data['zones'])
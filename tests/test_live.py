@@ -0,0 +1,27 @@
+"""Seat updates of the live stream (LiveFeed)."""
+from scraper import SeatfinderPoller, dummy_seatfinder
+from live import LiveFeed, Subscription
+
+
+def messages(subscription):
+    return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+
+def test_placeholder_seats_are_never_broadcast():
+    poller = SeatfinderPoller()
+    feed = LiveFeed(None, poller)
+    subscription = Subscription(max_queue=10)
+    feed.subscribers.add(subscription)
+
+    # Nothing was scraped yet: latest_snapshot() returns the placeholder dataframe
+    feed._check_seats()
+    assert messages(subscription) == []
+    assert feed._snapshot_messages() == []
+
+    # The first real sample is broadcast as a snapshot
+    seats = dummy_seatfinder()
+    seats['free'] = 3
+    poller.publish(seats, scraped_at=1_000_000)
+    feed._check_seats()
+    sent = messages(subscription)
+    assert len(sent) == 1 and 'event: seats' in sent[0] and '"free":3' in sent[0] and '"snapshot":true' in sent[0]
@@ -0,0 +1,56 @@
+"""Next events of many rooms at once (OccupancyIndex.next_events and API.next_events) compared against the former per-room query."""
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+from API_calls import build_courses
+from occupancy import OccupancyIndex
+from conftest import make_day
+
+
+def next_event_reference(courses, room_nr, after):
+    """Row position of the first event in a room starting after `after` (-1 if there is none), as queried by the former next_event()."""
+    events = courses.loc[(courses['room_nr'] == room_nr) & (courses['start_time'].dt.time > after)]
+    return -1 if events.empty else int(events.sort_values(by='start_time', kind='stable').index[0])
+
+
+def after_times(courses):
+    # Including times at which events start (those events don't count as next events)
+    return [time(0, 0), time(7, 59), time(10, 0), time(12, 17), time(21, 59), time(23, 59)] + list(courses['start_time_only'][::25])
+
+
+def test_index_matches_reference(courses, rooms, index):
+    room_nrs = list(rooms['room_nr'].unique()) + ['99-999', '00-000']
+    for after in after_times(courses):
+        expected = [next_event_reference(courses, room_nr, after) for room_nr in room_nrs]
+        assert list(index.next_events(room_nrs, after)) == expected, after
+
+
+def test_api_matches_reference(api, courses, rooms):
+    merged_df = rooms.merge(courses, on='room_nr', how='left')
+    room_nrs = list(rooms['room_nr'].unique()[::-1]) + ['00-000']
+    for after in after_times(courses):
+        result = api.next_events(merged_df, room_nrs, after)
+        # Rooms keep the given order; rooms that aren't in the dataframe are left out
+        assert list(result['room_nr']) == room_nrs[:-1], after
+        for room_nr, subject, start in zip(result['room_nr'], result['subject'], result['start_time']):
+            position = next_event_reference(courses, room_nr, after)
+            if position < 0:
+                assert subject == 'No more events planned for today' and pd.isna(start), (room_nr, after)
+            else:
+                assert (subject, start) == (courses['subject'].iat[position], courses['start_time'].iat[position]), (room_nr, after)
+
+
+def test_next_events_start_strictly_after():
+    courses = build_courses(make_day([('01-101', '09:00', '10:00'), ('01-102', '10:00', '11:00'), ('01-103', '10:59', '11:30'), ('01-104', '11:00', '12:00')]))
+    room_nrs = np.array(['01-101', '01-102', '01-103', '01-104'], dtype=object)
+    index = OccupancyIndex(courses)
+    assert list(index.next_events(room_nrs, time(10, 0))) == [-1, -1, 2, 3]
+    assert list(index.next_events(room_nrs, time(9, 59))) == [-1, 1, 2, 3]
+
+
+def test_empty_day_and_unknown_room(rooms, index):
+    empty = OccupancyIndex(build_courses(make_day([])))
+    assert (empty.next_events(rooms['room_nr'].to_numpy(), time(10, 0)) == -1).all()
+    assert list(index.next_events(['00-000'], time(0, 0))) == [-1]
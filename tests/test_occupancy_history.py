@@ -0,0 +1,46 @@
+"""Seat occupancy rollups of OccupancyHistory."""
+import os
+import sqlite3
+
+import pandas as pd
+
+from occupancy_history import OccupancyHistory
+
+
+def rollups(db_path):
+    with sqlite3.connect(db_path) as con:
+        return con.execute("SELECT resolution, samples, free_sum, occupied_sum FROM seat_rollup ORDER BY resolution").fetchall()
+
+
+def test_repeated_sample_is_counted_once(tmp_path):
+    db_path = os.path.join(tmp_path, 'history.db')
+    history = OccupancyHistory(db_path)
+    seats = pd.DataFrame({'free': [10, '-'], 'occupied': [5, '-']}, index=['theCo', 'theStage'])
+
+    # The same poll appended twice (e.g., a retry) and one later poll
+    history.append(seats, scraped_at=1_000_000)
+    history.append(seats, scraped_at=1_000_000)
+    history.append(seats, scraped_at=1_000_060)
+
+    assert rollups(db_path) == [(300, 2, 20, 10), (3600, 2, 20, 10), (86400, 2, 20, 10)]
+    assert len(history.history('theCo', hours=1, now=1_000_100)) == 1
+
+
+def test_pruning_drops_expired_samples_and_rollups(tmp_path):
+    db_path = os.path.join(tmp_path, 'history.db')
+    history = OccupancyHistory(db_path, raw_retention_days=1, rollup_retention_days={'5min': 2, 'hour': 10})
+    seats = pd.DataFrame({'free': [10], 'occupied': [5]}, index=['theCo'])
+    day = 24*60*60
+    start = 1_000_000*day # Midnight, so daily buckets start at the samples
+
+    # Pruning runs with the first append and every 100th after it
+    history.append(seats, scraped_at=start - 400*day)
+    for i in range(99):
+        history.append(seats, scraped_at=start - 5*day + i*60)
+    history.append(seats, scraped_at=start)
+
+    with sqlite3.connect(db_path) as con:
+        assert con.execute("SELECT MIN(ts), COUNT(*) FROM seat_sample").fetchone() == (start, 1)
+        oldest = dict(con.execute("SELECT resolution, MIN(bucket) FROM seat_rollup GROUP BY resolution").fetchall())
+    # 5-minute buckets are kept for 2 days, hourly ones for 10 days and daily ones for 366 days (default)
+    assert oldest == {300: start, 3600: start - 5*day, 86400: start - 5*day}
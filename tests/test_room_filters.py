@@ -0,0 +1,84 @@
+"""RoomFilterIndex masks compared against the former pandas queries of filter_rooms() and the size filter of the landing page."""
+import random
+
+import numpy as np
+import pandas as pd
+
+from room_filters import LECTURE_ROOMS, RoomFilter, RoomFilterIndex
+from conftest import DATE
+
+
+def filter_rooms_reference(rooms_df):
+    """Former API.filter_rooms()."""
+    included_name = ['Unterrichtsraum']
+    excluded_infoUrlText = ['Dozierenden Lounge', 'theCo', 'theStage']
+    excluded_buildingName = ['A 10 Sporthalle', 'D 14 WBZ Holzweid', 'D 15 Hans Ulrich Auditorium', 'A 11 Square']
+    return rooms_df.query("name in @included_name and not (infoUrlText in @excluded_infoUrlText or buildingName in @excluded_buildingName)")
+
+
+def mask_reference(rooms_df, room_filter):
+    seats = pd.to_numeric(rooms_df['seats'])
+    mask = np.ones(len(rooms_df), dtype=bool)
+    if room_filter.names is not None:
+        mask &= rooms_df['name'].isin(room_filter.names).to_numpy()
+    if room_filter.buildings is not None:
+        mask &= rooms_df['buildingName'].isin(room_filter.buildings).to_numpy()
+    mask &= ~rooms_df['infoUrlText'].isin(room_filter.exclude_types).to_numpy()
+    mask &= ~rooms_df['buildingName'].isin(room_filter.exclude_buildings).to_numpy()
+    if room_filter.min_seats is not None:
+        mask &= (seats >= room_filter.min_seats).to_numpy()
+    if room_filter.max_seats is not None:
+        mask &= (seats <= room_filter.max_seats).to_numpy()
+    return mask
+
+
+def test_lecture_rooms_match_former_filter(api, rooms):
+    expected = filter_rooms_reference(rooms)
+    assert api.filter_rooms(rooms).equals(expected)
+
+    # Derived frames (free rooms, with duplicate room numbers) are matched to catalogue rows by poiId
+    free_rooms = api.get_free_rooms('10:00', '11:00', DATE)
+    assert api.filter_rooms(free_rooms).equals(filter_rooms_reference(free_rooms))
+
+    # Size filter of the landing page
+    for size in [0, 12, 40, 100, np.inf]:
+        expected = filter_rooms_reference(free_rooms)
+        if size != np.inf:
+            expected = expected.query(f'seats <= {size}')
+        assert api.filter_rooms(free_rooms, LECTURE_ROOMS.with_seats(max_seats=size)).equals(expected), size
+
+
+def test_random_filters_match_reference(api, rooms):
+    rng = random.Random(710)
+    free_rooms = api.get_free_rooms('10:00', '11:00', DATE)
+    buildings = list(rooms['buildingName'].dropna().unique())
+    names = list(rooms['name'].dropna().unique())
+    types = list(rooms['infoUrlText'].dropna().unique())
+    for _ in range(300):
+        room_filter = RoomFilter(names=rng.sample(names, rng.randint(1, len(names))) if rng.random() < 0.5 else None,
+                                 buildings=rng.sample(buildings, rng.randint(1, len(buildings))) if rng.random() < 0.5 else None,
+                                 exclude_types=rng.sample(types, rng.randint(0, 2)), exclude_buildings=rng.sample(buildings, rng.randint(0, 2)),
+                                 min_seats=rng.choice([None, 10, 24, 50]), max_seats=rng.choice([None, 24, 60, np.inf]))
+        for rooms_df in (rooms, free_rooms):
+            assert (api.room_mask(rooms_df, room_filter) == mask_reference(rooms_df, room_filter)).all(), room_filter
+
+        # Combined filters select the intersection
+        combined = room_filter & LECTURE_ROOMS
+        assert (api.room_mask(rooms, combined) == (api.room_mask(rooms, room_filter) & api.room_mask(rooms, LECTURE_ROOMS))).all(), room_filter
+
+
+def test_unknown_values_and_rooms(rooms):
+    index = RoomFilterIndex(rooms)
+    assert not index.mask(RoomFilter(names=['Turnhalle'])).any()
+    assert index.mask(RoomFilter(exclude_buildings=['Z 99 Unknown'])).all()
+    assert not index.mask(RoomFilter(min_seats=1000)).any()
+
+    # Rooms that aren't in the catalogue never match
+    others = pd.DataFrame({'poiId': [1, int(rooms['poiId'].iat[0])]})
+    assert list(index.mask_for(others, RoomFilter())) == [False, True]
+
+
+def test_empty_catalogue(rooms):
+    index = RoomFilterIndex(rooms.iloc[:0])
+    assert len(index.mask(LECTURE_ROOMS.with_seats(max_seats=40))) == 0
+    assert list(index.mask_for(rooms.iloc[:2], LECTURE_ROOMS)) == [False, False]
@@ -0,0 +1,32 @@
+"""Persistence of ScheduleStore: days before the retention window are deleted from SQLite."""
+from datetime import datetime as dt
+from datetime import timedelta
+import os
+import sqlite3
+
+from schedule_store import ScheduleStore
+
+
+def day(offset):
+    return (dt.now() + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+def persisted_dates(path):
+    with sqlite3.connect(path) as con:
+        return sorted(date for (date,) in con.execute("SELECT date FROM event_day"))
+
+
+def test_old_days_are_pruned_on_write(tmp_path):
+    store = ScheduleStore(lambda date: [], db_path=os.path.join(tmp_path, 'schedule.db'), retention_days=30)
+    for offset in (-40, -31, -30, 0, 5):
+        store.get_day(day(offset))
+    assert persisted_dates(store.db_path) == [day(-30), day(0), day(5)]
+
+
+def test_old_days_are_pruned_at_startup(tmp_path):
+    path = os.path.join(tmp_path, 'schedule.db')
+    ScheduleStore(lambda date: [], db_path=path, retention_days=30)
+    with sqlite3.connect(path) as con:
+        con.executemany("INSERT INTO event_day (date, fetched_at, digest, payload) VALUES (?, 0, '', '[]')", [(day(-60),), (day(-1),)])
+    ScheduleStore(lambda date: [], db_path=path, retention_days=30)
+    assert persisted_dates(path) == [day(-1)]
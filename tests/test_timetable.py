@@ -0,0 +1,75 @@
+"""Room timetable of /map (build_timetable) compared against the former nested loop of map()."""
+from datetime import datetime as dt
+import random
+
+import pandas as pd
+
+from timetable import DEFAULT_SLOTS, build_timetable, build_week_timetable, slot_grid
+from conftest import DATE
+
+
+def timetable_reference(events):
+    """Timetable as built by the former loop of map() on its fixed grid of 45min blocks (08:15 - 22:00)."""
+    schedule = pd.DataFrame({'endTime': ['09:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00', '16:00', '17:00', '18:00', '19:00', '20:00', '21:00', '22:00'],
+                             'course': ['-' for i in range(14)],
+                             'startTime': ['08:15', '09:15', '10:15', '11:15', '12:15', '13:15', '14:15', '15:15', '16:15', '17:15', '18:15', '19:15', '20:15', '21:15']},
+                            columns=['startTime', 'endTime', 'course'])
+    schedule['endTime'] = schedule['endTime'].apply(lambda x: dt.strptime(x, '%H:%M').time())
+    schedule['startTime'] = schedule['startTime'].apply(lambda x: dt.strptime(x, '%H:%M').time())
+
+    starts = [dt.strptime(x, '%Y-%m-%dT%H:%M:%S').time() for x in events['startTime']]
+    ends = [dt.strptime(x, '%Y-%m-%dT%H:%M:%S').time() for x in events['endTime']]
+    course = list(schedule['course'])
+    for i in range(len(schedule)):
+        for k in range(len(events)):
+            if ends[k] > schedule['startTime'].iloc[i] and starts[k] < schedule['endTime'].iloc[i]:
+                course[i] = events['description'].iloc[k]
+    schedule['course'] = course
+
+    schedule['group'] = ((schedule['course'] != schedule['course'].shift()) | (schedule['course'] == '-')).cumsum()
+    aggregated_schedule = schedule.groupby(['group', 'course'], as_index=False).agg({'startTime': 'first', 'endTime': 'last'}).reset_index(drop=True)
+    return aggregated_schedule.drop(columns=['group'])
+
+
+def random_events(rng, date=DATE, min_events=0):
+    """Events at arbitrary minutes between 07:00 and 23:59, overlapping ones and repeated courses included."""
+    events = []
+    for _ in range(rng.randint(min_events, 8)):
+        start = rng.randrange(7*60, 23*60)
+        end = min(start + rng.choice([1, 15, 45, 60, 90, 180, 300]), 24*60 - 1)
+        events.append({'startTime': f"{date}T{start // 60:02d}:{start % 60:02d}:00", 'endTime': f"{date}T{end // 60:02d}:{end % 60:02d}:00",
+                       'description': rng.choice(['Course A', 'Course B', 'Course C'])})
+    return pd.DataFrame(events, columns=['startTime', 'endTime', 'description'])
+
+
+def test_default_grid_matches_former_grid():
+    reference = timetable_reference(pd.DataFrame(columns=['startTime', 'endTime', 'description']))
+    assert DEFAULT_SLOTS == list(zip(reference['startTime'], reference['endTime']))
+
+
+def test_matches_former_loop():
+    rng = random.Random(710)
+    for _ in range(200):
+        events = random_events(rng)
+        pd.testing.assert_frame_equal(build_timetable(events), timetable_reference(events), check_dtype=False)
+
+
+def test_slot_edges():
+    # Events ending exactly at the start of a slot or starting exactly at its end don't occupy it; the last overlapping event wins
+    events = pd.DataFrame({'startTime': [f'{DATE}T08:00:00', f'{DATE}T10:00:00', f'{DATE}T10:30:00'],
+                           'endTime': [f'{DATE}T08:15:00', f'{DATE}T11:15:00', f'{DATE}T10:45:00'],
+                           'description': ['Early', 'Long', 'Short']})
+    timetable = build_timetable(events)
+    assert list(timetable['course'][:4]) == ['-', '-', 'Short', '-']
+    pd.testing.assert_frame_equal(timetable, timetable_reference(events), check_dtype=False)
+
+
+def test_week_timetable():
+    rng = random.Random(710)
+    days = {date: random_events(rng, date, min_events=1) for date in ['2024-10-14', '2024-10-16']}
+    week = build_week_timetable(pd.concat(days.values(), ignore_index=True), slots=slot_grid(first='08:00', last='18:00', length=60, step=60))
+    for date, events in days.items():
+        expected = build_timetable(events, slots=slot_grid(first='08:00', last='18:00', length=60, step=60))
+        day = week.loc[week['date'] == date, ['course', 'startTime', 'endTime']].reset_index(drop=True)
+        pd.testing.assert_frame_equal(day, expected[['course', 'startTime', 'endTime']])
+    assert len(build_week_timetable(pd.DataFrame(columns=['startTime', 'endTime', 'description']))) == 0
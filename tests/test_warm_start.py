@@ -0,0 +1,116 @@
+"""Warm-start snapshot (WarmStartSnapshot): round trip of the room catalogue and the recent schedules through the pickle on disk."""
+from datetime import datetime as dt
+import os
+import pickle
+import time
+
+import pytest
+
+from API_calls import API
+from schedule_store import DaySchedule
+from warm_start import SCHEMA_VERSION, WarmStartSnapshot
+from conftest import make_events
+
+
+def offline_api():
+    """API instance whose upstream calls fail, so everything it serves comes from the caches."""
+    api = API('test')
+
+    def unavailable(*args):
+        raise AssertionError("upstream called")
+
+    api.rooms_cache.loader = unavailable
+    api.schedule.cache.loader = unavailable
+    return api
+
+
+@pytest.fixture
+def today():
+    return dt.now().strftime('%Y-%m-%d')
+
+
+@pytest.fixture
+def saved(tmp_path, catalogue, today):
+    """Path of a snapshot saved from an API with the test catalogue, today's schedule (with derived data) and a day outside the snapshot window."""
+    api = offline_api()
+    api.rooms_cache.set(value=catalogue)
+    api.schedule.cache.set(today, value=DaySchedule(today, make_events(catalogue.frame()['room_nr'].unique(), date=today)))
+    api.schedule.cache.set('2000-01-01', value=DaySchedule('2000-01-01', []))
+    api.get_free_rooms('10:00', '11:00', today)
+    assert api.get_day(today).derived
+
+    path = os.path.join(tmp_path, 'warm_start.pickle')
+    snapshot = WarmStartSnapshot(api, path)
+    assert snapshot.save()
+    assert not snapshot.save() # Unchanged data isn't written again
+    yield path, api
+    api.executor.shutdown(wait=False)
+
+
+def test_round_trip(saved, today):
+    path, source = saved
+    api = offline_api()
+    assert WarmStartSnapshot(api, path).load(revalidate=False) == 2
+
+    catalogue, day = api.rooms_cache.peek(), api.schedule.cache.peek(today)
+    assert catalogue.digest == source.rooms_cache.peek().digest
+    assert catalogue.frame().equals(source.rooms_cache.peek().frame())
+    assert day.digest == source.get_day(today).digest and day.events.equals(source.get_day(today).events)
+    # Derived data isn't pickled, days outside the window aren't included
+    assert day.derived == {}
+    assert api.schedule.cache.peek('2000-01-01') is None
+
+    # Requests are answered from the loaded entries without calling the upstream APIs
+    expected = source.get_free_rooms('10:00', '11:00', today)
+    assert api.get_free_rooms('10:00', '11:00', today)[['room_nr', 'subject']].equals(expected[['room_nr', 'subject']])
+    api.executor.shutdown(wait=False)
+
+
+def test_loaded_entries_are_at_most_just_expired(saved, today):
+    path, _ = saved
+    with open(path, 'rb') as f:
+        content = pickle.load(f)
+    content['catalogue'] = (content['catalogue'][0], 0)
+    content['days'][today] = (content['days'][today][0], 0)
+    with open(path, 'wb') as f:
+        pickle.dump(content, f)
+
+    api = offline_api()
+    start = time.time()
+    WarmStartSnapshot(api, path).load(revalidate=False)
+    assert api.rooms_cache.loaded_at() >= start - api.rooms_cache.ttl
+    assert api.schedule.cache.loaded_at(today) >= start - api.schedule.cache.ttl
+
+
+def test_cached_entries_are_kept(saved, today):
+    path, _ = saved
+    api = offline_api()
+    day = DaySchedule(today, [])
+    api.schedule.cache.set(today, value=day)
+    assert WarmStartSnapshot(api, path).load(revalidate=False) == 1
+    assert api.schedule.cache.peek(today) is day
+
+
+@pytest.mark.parametrize('change', ['schema', 'age', 'corrupt'])
+def test_invalid_snapshots_are_ignored(saved, change):
+    path, _ = saved
+    if change == 'corrupt':
+        with open(path, 'wb') as f:
+            f.write(b'not a pickle')
+    else:
+        with open(path, 'rb') as f:
+            content = pickle.load(f)
+        if change == 'schema':
+            content['schema'] = SCHEMA_VERSION + 1
+        else:
+            content['saved_at'] -= 8*24*60*60
+        with open(path, 'wb') as f:
+            pickle.dump(content, f)
+
+    api = offline_api()
+    assert WarmStartSnapshot(api, path).load(revalidate=False) == 0
+    assert api.rooms_cache.peek() is None
+
+
+def test_missing_snapshot(tmp_path):
+    assert WarmStartSnapshot(offline_api(), os.path.join(tmp_path, 'missing.pickle')).load() == 0
@@ -0,0 +1,61 @@
+from datetime import datetime as dt
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from occupancy import seconds_of_day, to_seconds
+
+
+def slot_grid(first='08:15', last='21:15', length=45, step=60):
+    """Returns a list of (start, end) datetime.time tuples for slots of `length` minutes starting every `step` minutes from `first` to `last`."""
+    start = dt.strptime(first, '%H:%M')
+    last = dt.strptime(last, '%H:%M')
+    slots = []
+    while start <= last:
+        slots.append((start.time(), (start + timedelta(minutes=length)).time()))
+        start += timedelta(minutes=step)
+    return slots
+
+
+# Base schedule of 45min blocks throughout the day (08:15 - 22:00)
+DEFAULT_SLOTS = slot_grid()
+
+
+def build_timetable(events, slots=DEFAULT_SLOTS):
+    """Assigns events to the slots of the grid and aggregates consecutive slots with the same course.
+    Args: events -> dataframe with 'startTime', 'endTime' (strings in the format '%Y-%m-%dT%H:%M:%S') and 'description', e.g., returned by get_schedule();
+    slots -> list of (start, end) datetime.time tuples.
+    Returns a dataframe with columns 'course', 'startTime' and 'endTime' (datetime.time); free slots have the course '-' and are kept as separate rows for booking."""
+    slot_starts = np.array([to_seconds(start) for start, _ in slots], dtype=np.int64)
+    slot_ends = np.array([to_seconds(end) for _, end in slots], dtype=np.int64)
+
+    course = np.full(len(slots), '-', dtype=object)
+    if len(events):
+        starts = seconds_of_day(pd.to_datetime(events['startTime'], format='%Y-%m-%dT%H:%M:%S'))
+        ends = seconds_of_day(pd.to_datetime(events['endTime'], format='%Y-%m-%dT%H:%M:%S'))
+
+        # Overlap of every slot (rows) with every event (columns)
+        overlap = (ends[None, :] > slot_starts[:, None]) & (starts[None, :] < slot_ends[:, None])
+
+        # If several events overlap a slot, the last one in the list is shown
+        occupied = overlap.any(axis=1)
+        last = overlap.shape[1] - 1 - np.argmax(overlap[:, ::-1], axis=1)
+        course[occupied] = events['description'].to_numpy()[last[occupied]]
+
+    schedule = pd.DataFrame({'startTime': [start for start, _ in slots], 'endTime': [end for _, end in slots], 'course': course})
+
+    # Create a column to help identify consecutive blocks with the same course
+    schedule['group'] = ((schedule['course'] != schedule['course'].shift()) | (schedule['course'] == '-')).cumsum()
+
+    # Aggregate the blocks by grouping according to the same course to simplify table
+    # but maintain hourly slots where rooms are empty for easier booking (by the hour)
+    aggregated_schedule = schedule.groupby(['group', 'course'], as_index=False, sort=False).agg({'startTime': 'first', 'endTime': 'last'}).reset_index(drop=True)
+    return aggregated_schedule.drop(columns=['group'])
+
+
+def build_week_timetable(events, slots=DEFAULT_SLOTS):
+    """Builds the timetable for every date on which the events take place. Returns a dataframe like build_timetable() with an additional 'date' column."""
+    if not len(events):
+        return pd.DataFrame(columns=['date', 'course', 'startTime', 'endTime'])
+    dates = events['startTime'].str[:10]
+    timetables = [build_timetable(day_events, slots).assign(date=date) for date, day_events in events.groupby(dates, sort=True)]
+    return pd.concat(timetables, ignore_index=True)[['date', 'course', 'startTime', 'endTime']]
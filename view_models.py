@@ -0,0 +1,44 @@
+from collections import namedtuple
+import math
+import pandas as pd
+from markupsafe import Markup, escape
+
+
+# Placeholder of get_free_rooms() for rooms without a next event
+NO_EVENT = pd.Timestamp('1970-01-01 00:00:00')
+
+# Fields of a room card on the landing page; times are strings ('%H:%M') or None if the room has no further event
+RoomCard = namedtuple('RoomCard', ['room_nr', 'room_type', 'is_group_room', 'seats', 'free_until', 'subject', 'event_end'])
+
+# One page of a list: the items on the page, the page number (from 1), the number of pages and the total number of items
+Page = namedtuple('Page', ['items', 'number', 'pages', 'total'])
+
+
+def room_cards(rooms_df):
+    """Projects a dataframe returned by get_free_rooms() onto the fields displayed on the room cards, as a list of RoomCard tuples.
+    Only the page being displayed is projected (see room_page()), so templates don't touch the dataframe or any catalogue column they don't display."""
+    cards = []
+    columns = (rooms_df[column].tolist() for column in ('room_nr', 'name', 'infoUrlText', 'seats', 'start_time', 'end_time', 'subject'))
+    for room_nr, name, info_url_text, seats, start_time, end_time, subject in zip(*columns):
+        is_group_room = info_url_text == 'Group meeting room'
+        has_event = start_time is not None and not pd.isna(start_time) and start_time != NO_EVENT
+        cards.append(RoomCard(room_nr, info_url_text if is_group_room else name, is_group_room,
+                              None if seats is None or pd.isna(seats) else int(seats),
+                              start_time.strftime('%H:%M') if has_event else None, subject,
+                              end_time.strftime('%H:%M') if has_event else None))
+    return cards
+
+
+def room_page(rooms_df, page=1, per_page=20):
+    """Returns the Page of room cards with number `page` (clamped to the available pages); only the rows of that page are projected."""
+    total = len(rooms_df)
+    pages = max(1, math.ceil(total / per_page))
+    number = min(max(1, page), pages)
+    first = (number - 1) * per_page
+    return Page(room_cards(rooms_df.iloc[first:first + per_page]), number, pages, total)
+
+
+def start_location_options(room_nrs):
+    """Returns the <option> elements of the "My location" dropdown for the given room numbers (sorted, without duplicates) as safe markup.
+    The fragment only depends on the room catalogue, so it is built once per catalogue version (see API.catalogue_memo())."""
+    return Markup(''.join(f'<option value="{escape(room_nr)}">{escape(room_nr)}</option>' for room_nr in sorted(set(room_nrs))))
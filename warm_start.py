@@ -0,0 +1,131 @@
+from datetime import datetime as dt
+from datetime import timedelta
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Bump whenever the pickled classes (RoomCatalogue, DaySchedule) or the layout below change; snapshots of other versions are ignored
+SCHEMA_VERSION = 1
+
+
+class WarmStartSnapshot:
+    """Versioned on-disk snapshot of the room catalogue and the schedules of the recent days, so restarted (or additional) workers start warm.
+    The snapshot is a pickle of the normalized RoomCatalogue and the parsed DaySchedules (without memoized derived data) and loads in milliseconds.
+    Loaded entries keep their original load time (at most as old as just expired), so requests are served from the snapshot while it is revalidated in the background.
+    The file lives in the instance folder and is only written by the app itself; never point `path` at untrusted files (pickle)."""
+
+    def __init__(self, api, path, days=14, max_age=7*24*60*60):
+        self.api = api
+        self.path = path
+        self.days = days         # Number of days from yesterday onwards whose schedules are included
+        self.max_age = max_age   # Snapshots older than this (in seconds) are ignored
+        self._signature = None   # Content of the last snapshot written or loaded, to skip unchanged saves
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _dates(self, today=None):
+        first = (today or dt.now()).date() - timedelta(days=1)
+        return {(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(self.days + 1)}
+
+    def _capture(self):
+        """Returns the snapshot content of the currently cached catalogue and recent days, and its signature."""
+        rooms_cache, schedule_cache = self.api.rooms_cache, self.api.schedule.cache
+        catalogue = rooms_cache.peek()
+        catalogue_entry = (catalogue, rooms_cache.loaded_at()) if catalogue is not None else None
+
+        days = {}
+        for date in sorted(self._dates()):
+            day = schedule_cache.peek(date)
+            if day is not None:
+                days[date] = (day, schedule_cache.loaded_at(date))
+
+        signature = (catalogue.digest if catalogue is not None else None, tuple((date, day.digest) for date, (day, _) in days.items()))
+        return {'catalogue': catalogue_entry, 'days': days}, signature
+
+    def save(self):
+        """Writes the snapshot if the cached data changed since the last save. Returns True if a file was written."""
+        with self._lock:
+            content, signature = self._capture()
+            if signature == self._signature or (content['catalogue'] is None and not content['days']):
+                return False
+
+            snapshot = {'schema': SCHEMA_VERSION, 'saved_at': time.time(), **content}
+            # Write to a temporary file and swap it in, so concurrent workers never read a partial snapshot
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._signature = signature
+            return True
+
+    def load(self, revalidate=True):
+        """Primes the room and schedule caches from the snapshot, unless it is missing, of another schema version or too old.
+        Entries already in the caches are not replaced; expired ones are reloaded in a background thread if `revalidate` is set. Returns the number of entries loaded."""
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.warning("Loading warm-start snapshot failed: %s", e)
+            return 0
+
+        if not isinstance(snapshot, dict) or snapshot.get('schema') != SCHEMA_VERSION or time.time() - snapshot['saved_at'] > self.max_age:
+            return 0
+
+        # Entries are at most as old as just expired, so they are served right away (stale) while being revalidated
+        now = time.time()
+        loaded = []
+        rooms_cache, schedule_cache = self.api.rooms_cache, self.api.schedule.cache
+        if snapshot['catalogue'] is not None and rooms_cache.peek() is None:
+            catalogue, loaded_at = snapshot['catalogue']
+            rooms_cache.set(value=catalogue, loaded_at=max(loaded_at, now - rooms_cache.ttl))
+            loaded.append((rooms_cache, ()))
+
+        dates = self._dates()
+        for date, (day, loaded_at) in snapshot['days'].items():
+            if date in dates and schedule_cache.peek(date) is None:
+                schedule_cache.set(date, value=day, loaded_at=max(loaded_at, now - schedule_cache.ttl))
+                loaded.append((schedule_cache, (date,)))
+
+        with self._lock:
+            self._signature = self._capture()[1]
+
+        if revalidate and loaded:
+            threading.Thread(target=self._revalidate, args=(loaded,), name='warm-start-revalidate', daemon=True).start()
+        return len(loaded)
+
+    @staticmethod
+    def _revalidate(entries):
+        """Reloads expired entries from the upstream APIs; if an upstream is unavailable, the snapshot value stays in place."""
+        for cache, key in entries:
+            if not cache.is_fresh(*key):
+                try:
+                    cache.refresh(*key)
+                except Exception as e:
+                    logger.warning("Revalidating warm-start entry of %s failed: %s", cache.name, e)
+
+    def start(self, interval=10*60):
+        """Saves the snapshot every `interval` seconds in a daemon thread (only if the cached data changed)."""
+        def tick():
+            try:
+                self.save()
+            except Exception as e:
+                logger.exception("Saving warm-start snapshot failed: %s", e)
+            self._timer = threading.Timer(interval, tick)
+            self._timer.daemon = True
+            self._timer.start()
+
+        self._timer = threading.Timer(interval, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None